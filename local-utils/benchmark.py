@@ -0,0 +1,249 @@
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from threading import Event
+from time import perf_counter_ns
+from typing import Callable, Sequence
+import importlib
+import importlib.util
+import io
+import json
+import os
+import random
+import sys
+import tracemalloc
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+from synthetic_corpus import SyntheticEntry, generate_corpus
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+@dataclass
+class _BenchmarkResult:
+    name: str
+    n_ops: int
+    """How many timed operations each run performs, e.g., lookups"""
+    ops_per_second: float
+    p50_us: float
+    p90_us: float
+    p99_us: float
+    max_us: float
+    peak_bytes: int
+    """Most memory allocated at once during one run, per `tracemalloc`"""
+
+    def __str__(self):
+        return f"{self.name:<36} {self.n_ops:>8,} ops  {self.ops_per_second:>12,.1f} ops/s  p50 {_format_us(self.p50_us):>10}  p90 {_format_us(self.p90_us):>10}  p99 {_format_us(self.p99_us):>10}  peak {self.peak_bytes / 1e6:>9,.1f} MB"
+
+
+def _format_us(duration_us: float):
+    if duration_us >= 1e6:
+        return f"{duration_us / 1e6:,.2f} s"
+    if duration_us >= 1e3:
+        return f"{duration_us / 1e3:,.2f} ms"
+    return f"{duration_us:,.1f} µs"
+
+def _percentile(sorted_durations: Sequence[int], fraction: float):
+    return sorted_durations[min(len(sorted_durations) - 1, int(fraction * len(sorted_durations)))]
+
+
+def _run(name: str, make_ops: Callable[[], Sequence[Callable[[], object]]], n_repeats: int):
+    """Times each operation separately over `n_repeats` runs, then measures peak memory over one more traced run.
+    `make_ops` is called before every run, untimed, so that runs start from the same state."""
+
+    durations_ns: list[int] = []
+    total_ns = 0
+    n_ops = 0
+    for _ in range(n_repeats):
+        ops = make_ops()
+        n_ops = len(ops)
+        for op in ops:
+            start = perf_counter_ns()
+            op()
+            duration = perf_counter_ns() - start
+
+            durations_ns.append(duration)
+            total_ns += duration
+
+    ops = make_ops()
+    tracemalloc.start()
+    try:
+        for op in ops:
+            op()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    durations_ns.sort()
+    result = _BenchmarkResult(
+        name,
+        n_ops,
+        len(durations_ns) / (total_ns / 1e9) if total_ns > 0 else 0,
+        _percentile(durations_ns, 0.5) / 1e3,
+        _percentile(durations_ns, 0.9) / 1e3,
+        _percentile(durations_ns, 0.99) / 1e3,
+        durations_ns[-1] / 1e3,
+        peak_bytes,
+    )
+    print(result)
+    return result
+
+
+def _fully_built(build: Callable[[Event], tuple]):
+    """Builds lookups and then every lazily built shard, without leaving a warm-up thread running"""
+
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    def build_all():
+        # Stop the warm-up thread as soon as the build returns, then build the rest of the shards on this thread
+        cancel_event = Event()
+        lookups = build(cancel_event)
+        cancel_event.set()
+
+        sharded_lookup = getattr(lookups[0], "__self__", None)
+        if isinstance(sharded_lookup, ShardedLookup):
+            sharded_lookup.build_all()
+        return lookups
+
+    return build_all
+
+
+def _stroke_stream(corpus: list[SyntheticEntry], n_strokes: int, rng: random.Random):
+    strokes: list[str] = []
+    while len(strokes) < n_strokes:
+        strokes.extend(rng.choice(corpus).outline_steno.split("/"))
+    return strokes[:n_strokes]
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.alignment.match_sophemes import match_sophemes
+    from plover_writeouts.lib.lookup import build_lookup_hatchery, build_lookup_json
+    from plover_writeouts.lib.theory.service import TheoryService
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+    theory.compile()
+
+    corpus = generate_corpus(args.n_entries, args.seed)
+    hatchery_text = "\n".join(entry.sophemes for entry in corpus)
+    json_mappings = {entry.outline_steno: entry.translation for entry in corpus}
+    rng = random.Random(args.seed)
+
+    print(f"Benchmarking {args.theory} over {len(corpus):,} synthetic entries (seed {args.seed}, {args.repeat} runs each)…")
+
+    build_hatchery = _fully_built(lambda cancel_event: build_lookup_hatchery(io.StringIO(hatchery_text), theory, cancel_event=cancel_event))
+    build_json = _fully_built(lambda cancel_event: build_lookup_json(json_mappings, theory, cancel_event=cancel_event))
+
+    results = [
+        _run("build_lookup_hatchery", lambda: (build_hatchery,), args.repeat),
+        _run("build_lookup_json", lambda: (build_json,), args.repeat),
+    ]
+
+    lookup, reverse_lookup = build_hatchery()
+
+    # Plover looks up every suffix of the recent strokes, up to the dictionary's longest key, longest first
+    strokes = _stroke_stream(corpus, args.n_strokes, rng)
+    def suffix_lookups(end: int):
+        for length in range(min(end, args.longest_key), 0, -1):
+            lookup(tuple(strokes[end - length:end]))
+    results.append(_run("suffix lookups per stroke", lambda: [lambda end=end: suffix_lookups(end) for end in range(1, len(strokes) + 1)], args.repeat))
+
+    cycler_steno = theory.mask_to_steno(theory.cycler_mask)
+    cycled_outlines = [
+        (*rng.choice(corpus).outline_steno.split("/"), *(cycler_steno,) * rng.randint(1, 3))
+        for _ in range(args.n_queries)
+    ]
+    results.append(_run("cycler presses", lambda: [lambda outline=outline: lookup(outline) for outline in cycled_outlines], args.repeat))
+
+    translations = [rng.choice(corpus).translation for _ in range(args.n_reverse_queries)]
+    results.append(_run("reverse_lookup", lambda: [lambda translation=translation: reverse_lookup(translation) for translation in translations], args.repeat))
+
+    # Bulk lookups of the same suffixes, one outline at a time and in batches
+    if importlib.util.find_spec("numpy") is not None:
+        from plover_writeouts.lib.lookup.batch import BatchLookupEngine
+        from plover_writeouts.lib.lookup.get_sophemes import get_sopheme_phonemes
+        from plover_writeouts.lib.sopheme.Sopheme import Sopheme
+        from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+
+        batch_engine = BatchLookupEngine.build([
+            (get_sopheme_phonemes(sophemes, theory), Sopheme.get_translation(sophemes))
+            for sophemes in (parse_sopheme_seq(entry.sophemes) for entry in corpus)
+        ], theory)
+        batch_engine.lookup_batch(())
+
+        suffixes = [
+            tuple(strokes[end - length:end])
+            for end in range(1, len(strokes) + 1)
+            for length in range(min(end, args.longest_key), 0, -1)
+        ]
+        batches = [suffixes[i:i + args.batch_size] for i in range(0, len(suffixes), args.batch_size)]
+        results.append(_run(f"{args.batch_size} outlines one at a time", lambda: [lambda batch=batch: [batch_engine.lookup(outline) for outline in batch] for batch in batches], args.repeat))
+        results.append(_run(f"{args.batch_size} outlines batched", lambda: [lambda batch=batch: batch_engine.lookup_batch(batch) for batch in batches], args.repeat))
+    else:
+        print("Skipping batch lookups, since NumPy is not installed")
+
+    aligned_entries = rng.sample(corpus, min(args.n_alignments, len(corpus)))
+    results.append(_run("match_sophemes", lambda: [lambda entry=entry: match_sophemes(entry.translation, entry.transcription, entry.outline_steno) for entry in aligned_entries], args.repeat))
+
+
+    if args.save_baseline is not None:
+        baseline_path = Path(os.getcwd()) / args.save_baseline
+        baseline_path.parent.mkdir(exist_ok=True, parents=True)
+        with open(baseline_path, "w", encoding="utf-8") as file:
+            json.dump({"args": vars(args), "results": [asdict(result) for result in results]}, file, indent=2)
+        print(f"Saved baseline to {baseline_path}")
+
+    if args.baseline is not None:
+        with open(Path(os.getcwd()) / args.baseline, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        baseline_results = {result["name"]: result for result in baseline["results"]}
+
+        changed_args = [
+            name for name, value in vars(args).items()
+            if name not in ("baseline", "save_baseline", "tolerance", "repeat") and baseline["args"].get(name) != value
+        ]
+        if len(changed_args) > 0:
+            print(f"Warning: the baseline was run with different {', '.join(changed_args)}, so results may not be comparable")
+
+        print(f"Compared to {args.baseline} (regressions beyond {args.tolerance:.0%} marked with !):")
+        n_regressions = 0
+        for result in results:
+            baseline_result = baseline_results.get(result.name)
+            if baseline_result is None: continue
+
+            p50_ratio = result.p50_us / baseline_result["p50_us"] if baseline_result["p50_us"] > 0 else 1
+            peak_ratio = result.peak_bytes / baseline_result["peak_bytes"] if baseline_result["peak_bytes"] > 0 else 1
+            is_regression = p50_ratio > 1 + args.tolerance or peak_ratio > 1 + args.tolerance
+            n_regressions += is_regression
+
+            print(f"{'!' if is_regression else ' '} {result.name:<36} p50 ×{p50_ratio:.2f}  peak ×{peak_ratio:.2f}")
+
+        if n_regressions > 0:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Times building, lookups, reverse lookups, and alignment over a seeded synthetic corpus")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to benchmark, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    parser.add_argument("-n", "--n-entries", type=int, default=2_000, help="number of synthetic entries to build")
+    parser.add_argument("--seed", type=int, default=0, help="random seed for the corpus and the workloads")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="number of timed runs of each benchmark")
+    parser.add_argument("--n-strokes", type=int, default=2_000, help="number of strokes in the suffix lookup workload")
+    parser.add_argument("--n-queries", type=int, default=2_000, help="number of cycler queries")
+    parser.add_argument("--n-reverse-queries", type=int, default=200, help="number of reverse lookup queries")
+    parser.add_argument("--batch-size", type=int, default=1_000, help="number of outlines per batch in the batch lookup workload")
+    parser.add_argument("--n-alignments", type=int, default=200, help="number of entries to align with match_sophemes")
+    parser.add_argument("--longest-key", type=int, default=12, help="longest outline looked up per stroke, as in HatcheryDictionary")
+    parser.add_argument("--save-baseline", help="path to save the results to")
+    parser.add_argument("--baseline", help="path of saved results to compare against; exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="fraction by which a result may exceed the baseline before it counts as a regression")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
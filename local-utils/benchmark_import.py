@@ -0,0 +1,71 @@
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+_DEFAULT_MODULES = (
+    "plover_writeouts.lib.theory.default",
+    "plover_writeouts.lib.alignment.match_sophemes",
+    "plover_writeouts.lib.alignment.match_ortho_steno",
+)
+
+_TIMING_SCRIPT = """
+import sys
+from time import perf_counter
+
+from plover import system
+from plover.registry import registry
+
+registry.update()
+system.setup(sys.argv[1])
+
+start = perf_counter()
+for module_name in sys.argv[3:]:
+    __import__(module_name)
+import_duration = perf_counter() - start
+
+start = perf_counter()
+if sys.argv[2] == "compile":
+    from plover_writeouts.lib.theory.service import TheoryService
+    for module in tuple(sys.modules.values()):
+        for value in tuple(vars(module).values()) if module is not None and module.__name__.startswith("plover_writeouts") else ():
+            if isinstance(value, TheoryService):
+                value.compile()
+compile_duration = perf_counter() - start
+
+print(import_duration, compile_duration)
+"""
+
+
+def _time_once(system_name: str, compile_theories: bool, module_names: tuple[str, ...]):
+    result = subprocess.run(
+        (sys.executable, "-c", _TIMING_SCRIPT, system_name, "compile" if compile_theories else "import", *module_names),
+        capture_output=True, text=True, check=True,
+    )
+    import_duration, compile_duration = result.stdout.split()[-2:]
+    return float(import_duration), float(compile_duration)
+
+
+def _main(args: argparse.Namespace):
+    module_names = tuple(args.modules) if args.modules else _DEFAULT_MODULES
+
+    print(f"Timing imports of {', '.join(module_names)} over {args.repeat} fresh interpreters…")
+
+    timings = [_time_once(args.system, args.compile, module_names) for _ in range(args.repeat)]
+    import_durations = [import_duration for import_duration, _ in timings]
+    compile_durations = [compile_duration for _, compile_duration in timings]
+
+    print(f"import: median {statistics.median(import_durations) * 1000:.1f} ms, min {min(import_durations) * 1000:.1f} ms")
+    if args.compile:
+        print(f"theory compilation on first use: median {statistics.median(compile_durations) * 1000:.1f} ms, min {min(compile_durations) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measures how long importing the plugin's modules takes in a fresh interpreter")
+    parser.add_argument("-m", "--modules", nargs="*", help="modules to import (defaults to the theory and alignment modules)")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system to set up before importing")
+    parser.add_argument("-n", "--repeat", type=int, default=10, help="number of fresh interpreters to time")
+    parser.add_argument("-c", "--compile", action="store_true", help="also time compiling every imported theory, as happens on first lookup")
+    args = parser.parse_args()
+
+    _main(args)
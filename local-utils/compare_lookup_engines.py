@@ -0,0 +1,96 @@
+from pathlib import Path
+import importlib
+import json
+import os
+import random
+import sys
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _read_entries(args: argparse.Namespace, theory):
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.sopheme.Sopheme import Sopheme
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes, get_sopheme_phonemes
+
+    if args.in_path is None:
+        from synthetic_corpus import generate_corpus
+
+        sopheme_lines = [entry.sophemes for entry in generate_corpus(args.synthetic, args.seed)]
+
+    elif args.in_path.endswith(".json"):
+        with open(Path(os.getcwd()) / args.in_path, "r", encoding="utf-8") as file:
+            mappings: dict[str, str] = json.load(file)
+
+        entries = []
+        for outline_steno, translation in mappings.items():
+            phonemes = get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), theory)
+            if phonemes is None: continue
+            entries.append((phonemes, translation))
+        return entries
+
+    else:
+        with open(Path(os.getcwd()) / args.in_path, "r", encoding="utf-8") as file:
+            sopheme_lines = [line.rstrip("\r\n") for line in file if not line.isspace()]
+
+    entries = []
+    for line in sopheme_lines:
+        sophemes = parse_sopheme_seq(line)
+        entries.append((get_sopheme_phonemes(sophemes, theory), Sopheme.get_translation(sophemes)))
+    return entries
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.lookup import LOOKUP_ENGINES
+    from plover_writeouts.lib.lookup.differential import compare_engines, sample_outlines
+    from plover_writeouts.lib.theory.service import TheoryService
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+    entries = _read_entries(args, theory)
+    translations = list(dict.fromkeys(translation for _, translation in entries))
+    print(f"Comparing the {args.candidate} engine against the {args.reference} engine over {len(entries):,} entries…")
+
+    reference = LOOKUP_ENGINES[args.reference].build(entries, theory)
+    candidate = LOOKUP_ENGINES[args.candidate].build(entries, theory)
+
+    rng = random.Random(args.seed)
+    if args.n_translations is not None and args.n_translations < len(translations):
+        translations = rng.sample(translations, args.n_translations)
+    outlines = sample_outlines(reference, translations, theory, rng, args.n_random)
+
+    comparison = compare_engines(reference, candidate, outlines, translations)
+    print(comparison.describe(args.max_mismatches))
+    print(f"reference stats: {reference.stats()}")
+    print(f"candidate stats: {candidate.stats()}")
+
+    if len(comparison.mismatches) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checks that two lookup engines agree on the results and rankings of corpus-based and random outlines")
+    parser.add_argument("-i", "--in-path", "--in", help="path to a Hatchery dictionary in the line notation, or a JSON steno dictionary ending in .json (defaults to a synthetic corpus)")
+    parser.add_argument("--synthetic", type=int, default=1_000, help="number of synthetic entries to use if no dictionary is given")
+    parser.add_argument("-a", "--reference", default="trie", help="name of the reference engine")
+    parser.add_argument("-b", "--candidate", default="sharded", help="name of the engine to check")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to build with, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    parser.add_argument("--n-translations", type=int, help="number of translations to sample outlines and reverse lookups from (defaults to all)")
+    parser.add_argument("--n-random", type=int, default=2_000, help="number of random outlines to add")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--max-mismatches", type=int, default=20, help="number of mismatches to list")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
@@ -0,0 +1,43 @@
+from pathlib import Path
+import importlib
+import os
+import timeit
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.theory.service import TheoryService
+    from plover_writeouts.lib.theory.artifact import write_compiled_theory
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+    out_path = Path(os.getcwd()) / args.out_path
+    out_path.parent.mkdir(exist_ok=True, parents=True)
+
+    def compile():
+        with open(out_path, "wb") as file:
+            write_compiled_theory(theory, file)
+
+    print(f"Compiling {args.theory}…")
+    duration = timeit.timeit(compile, number=1)
+    print(f"Finished (took {duration} s, {out_path.stat().st_size:,} bytes, hash {theory.content_hash})")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to compile, as `module:name`")
+    parser.add_argument("-o", "--out-path", "--out", help="path to output the compiled theory", required=True)
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
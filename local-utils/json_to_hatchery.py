@@ -22,6 +22,8 @@ class _Affix:
 
 def _main(args: argparse.Namespace):
     from plover_writeouts.lib.alignment.match_sophemes import match_sophemes
+    from plover_writeouts.lib.sopheme.parse import format_sopheme_seq
+    from plover_writeouts.lib.sopheme.binary import write_hatchery_binary
 
     root = Path(os.getcwd())
 
@@ -55,6 +57,7 @@ def _main(args: argparse.Namespace):
 
     def generate():
         sophemes_json = []
+        entries = []
 
         with open(root / args.in_unilex_path, "r", encoding="utf-8") as file:
             with open(out_path, "w+", encoding="utf-8") as out_file:
@@ -63,11 +66,21 @@ def _main(args: argparse.Namespace):
                     if translation not in reverse_lapwing_dict: continue
 
                     for outline_steno in reverse_lapwing_dict[translation]:
-                        # out_file.write(" ".join(str(sopheme) for sopheme in match_sophemes(translation, transcription, outline_steno)) + "\n")
+                        sophemes = match_sophemes(translation, transcription, outline_steno)
 
-                        sophemes_json.append(tuple(sopheme.to_dict() for sopheme in match_sophemes(translation, transcription, outline_steno)))
+                        if args.format == "lines":
+                            out_file.write(format_sopheme_seq(sophemes) + "\n")
+                        elif args.format == "binary":
+                            entries.append(sophemes)
+                        else:
+                            sophemes_json.append(tuple(sopheme.to_dict() for sopheme in sophemes))
 
-                json.dump(sophemes_json, out_file)
+                if args.format == "json":
+                    json.dump(sophemes_json, out_file)
+
+        if args.format == "binary":
+            with open(out_path, "wb") as out_file:
+                write_hatchery_binary(entries, out_file)
 
     print(f"Generating entries…")
     duration = timeit.timeit(generate, number=1)
@@ -78,6 +91,7 @@ if __name__ == "__main__":
     parser.add_argument("-j", "--in-json-path", "--in-json", help="path to the input JSON dictionary", required=True)  
     parser.add_argument("-u", "--in-unilex-path", "--in-unilex", help="path to the input Unilex lexicon", required=True)
     parser.add_argument("-o", "--out-path", "--out", help="path to output the Hatchery dictionary (to use in Plover, use the `hatchery` file extension)", required=True)
+    parser.add_argument("-f", "--format", choices=("lines", "binary", "json"), default="lines", help="`lines` writes one entry per line in the sopheme notation, which Hatchery reads as a stream; `binary` writes the memory-mapped columnar format; `json` writes a single JSON array")
     args = parser.parse_args()
 
     _setup_plover()  
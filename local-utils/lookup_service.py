@@ -0,0 +1,89 @@
+from pathlib import Path
+import asyncio
+import importlib
+import os
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _build(in_path: Path, theory, registry):
+    from plover_writeouts.lib.lookup import build_lookup_hatchery, build_lookup_hatchery_binary
+    from plover_writeouts.lib.lookup.shared import SharedTrieSource
+    from plover_writeouts.lib.sopheme.binary import HatcheryBinaryReader, is_hatchery_binary
+
+    shared = SharedTrieSource.for_file(registry, in_path, theory) if registry is not None else None
+
+    with open(in_path, "rb") as file:
+        is_binary = is_hatchery_binary(file)
+
+    if is_binary:
+        with HatcheryBinaryReader(str(in_path)) as entries:
+            return build_lookup_hatchery_binary(entries, theory, shared=shared)
+
+    with open(in_path, "r", encoding="utf-8") as file:
+        return build_lookup_hatchery(file, theory, shared=shared)
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.theory.service import TheoryService
+    from plover_writeouts.lib.lookup.engine import LookupEngine, TrieLookupEngine
+    from plover_writeouts.lib.lookup.batch import BatchLookupEngine
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+    from plover_writeouts.lib.lookup.shared import default_registry
+    from plover_writeouts.lib.lookup.service import LookupService, ServiceLimits, default_socket_path
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+    in_path = Path(os.getcwd()) / args.in_path
+
+    print(f"Loading {in_path}…")
+    lookup, _ = _build(in_path, theory, None if args.no_shared else default_registry())
+
+    engine = getattr(lookup, "__self__", None)
+    assert isinstance(engine, LookupEngine)
+    # Batch requests are the reason to go through the service rather than Plover, so traverse them in bulk when possible
+    if type(engine) is TrieLookupEngine:
+        engine = BatchLookupEngine(engine.trie, theory)
+    elif isinstance(engine, ShardedLookup):
+        # Otherwise the first lookups to reach each shard would build it on the event loop, stalling every client
+        print(f"Building {engine.n_shards:,} shards…")
+        engine.build_all()
+
+    limits = ServiceLimits(
+        max_in_flight=args.max_in_flight,
+        max_batch_outlines=args.max_batch_outlines,
+        max_reverse_outlines=args.max_reverse_outlines,
+        reverse_lookup_seconds=args.reverse_lookup_seconds,
+    )
+    socket_path = Path(os.getcwd()) / args.socket if args.socket is not None else default_socket_path()
+
+    print(f"Serving {engine.stats()} on {socket_path}")
+    try:
+        asyncio.run(LookupService(engine, limits).serve_forever(socket_path))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serves lookups from a Hatchery dictionary to local processes over a Unix domain socket")
+    parser.add_argument("-i", "--in-path", "--in", help="path to a Hatchery dictionary", required=True)
+    parser.add_argument("-k", "--socket", help="path of the socket to listen on (defaults to one in Plover's config folder)")
+    parser.add_argument("--no-shared", action="store_true", help="builds the trie in this process rather than attaching to the shared one")
+    parser.add_argument("--max-in-flight", type=int, default=32, help="requests from one client that can run at once")
+    parser.add_argument("--max-batch-outlines", type=int, default=100_000, help="most outlines a batch lookup can hold")
+    parser.add_argument("--max-reverse-outlines", type=int, default=1_000, help="outlines a reverse lookup stops after")
+    parser.add_argument("--reverse-lookup-seconds", type=float, default=0.5, help="time a reverse lookup can search for")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to build with, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
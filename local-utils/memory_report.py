@@ -0,0 +1,88 @@
+from dataclasses import asdict
+from pathlib import Path
+import importlib
+import json
+import os
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _build(in_path: Path, theory):
+    from plover_writeouts.lib.lookup import build_lookup_json, build_lookup_hatchery, build_lookup_hatchery_binary
+    from plover_writeouts.lib.sopheme.binary import HatcheryBinaryReader, is_hatchery_binary
+
+    with open(in_path, "rb") as file:
+        is_binary = is_hatchery_binary(file)
+
+    if is_binary:
+        with HatcheryBinaryReader(str(in_path)) as entries:
+            return build_lookup_hatchery_binary(entries, theory)
+
+    with open(in_path, "r", encoding="utf-8") as file:
+        if in_path.suffix == ".json":
+            return build_lookup_json(json.load(file), theory)
+        return build_lookup_hatchery(file, theory)
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.theory.service import TheoryService
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+    from plover_writeouts.lib.util.memory import MemoryReport, traced_memory
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+    in_path = Path(os.getcwd()) / args.in_path
+
+    print(f"Building {in_path}…")
+    with traced_memory(args.top) as load_memory:
+        lookup, _ = _build(in_path, theory)
+
+        engine = getattr(lookup, "__self__", None)
+        if isinstance(engine, ShardedLookup):
+            engine.build_all()
+
+    if isinstance(engine, ShardedLookup):
+        report = engine.memory_report()
+    else:
+        assert isinstance(engine, TrieLookupEngine)
+        report = MemoryReport("lookup trie")
+        report.add_all(engine.trie.memory_sections(), "trie ")
+    report.title = f"{in_path.name} with {args.theory}: {report.title}"
+    report.notes.append(str(load_memory))
+    print(report)
+
+    if args.out_path is not None:
+        out_path = Path(os.getcwd()) / args.out_path
+        out_path.parent.mkdir(exist_ok=True, parents=True)
+        with open(out_path, "w", encoding="utf-8") as file:
+            json.dump({
+                "dictionary": str(args.in_path),
+                "theory": args.theory,
+                "theory_hash": theory.content_hash,
+                "sections": [asdict(section) for section in report.sections],
+                "traced_retained_bytes": load_memory.retained_bytes,
+                "traced_peak_bytes": load_memory.peak_bytes,
+            }, file, indent=2)
+        print(f"Wrote {out_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds a dictionary in full and reports how much memory its lookup structures use")
+    parser.add_argument("-i", "--in-path", "--in", help="path to a Hatchery dictionary, or a JSON steno dictionary ending in .json", required=True)
+    parser.add_argument("-o", "--out-path", "--out", help="path to also write the report to as JSON, to compare between versions")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to build with, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    parser.add_argument("-n", "--top", type=int, default=10, help="number of allocation sites to list")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
@@ -0,0 +1,74 @@
+from datetime import datetime
+from pathlib import Path
+import importlib
+import os
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _publish(in_path: Path, theory, registry):
+    from plover_writeouts.lib.lookup import build_lookup_hatchery, build_lookup_hatchery_binary
+    from plover_writeouts.lib.lookup.shared import SharedTrieSource
+    from plover_writeouts.lib.sopheme.binary import HatcheryBinaryReader, is_hatchery_binary
+
+    shared = SharedTrieSource.for_file(registry, in_path, theory) if registry is not None else None
+
+    with open(in_path, "rb") as file:
+        is_binary = is_hatchery_binary(file)
+
+    if is_binary:
+        with HatcheryBinaryReader(str(in_path)) as entries:
+            return build_lookup_hatchery_binary(entries, theory, shared=shared)
+
+    with open(in_path, "r", encoding="utf-8") as file:
+        return build_lookup_hatchery(file, theory, shared=shared)
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.lookup.shared import SharedTrieRegistry, default_registry_dir, file_source_hash
+    from plover_writeouts.lib.theory.service import TheoryService
+
+    shared = SharedTrieRegistry(Path(os.getcwd()) / args.dir if args.dir is not None else default_registry_dir())
+
+    if args.in_path is not None:
+        module_name, theory_name = args.theory.rsplit(":", 1)
+        theory = getattr(importlib.import_module(module_name), theory_name)
+        assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+        in_path = Path(os.getcwd()) / args.in_path
+        was_published = shared.path_for(file_source_hash(in_path, theory)).exists()
+        _publish(in_path, theory, shared)
+        print(f"{'Already published' if was_published else 'Published'} {in_path.name} to {shared.directory}")
+
+    for source_hash in args.remove:
+        print(f"{'Removed' if shared.remove(source_hash) else 'Could not remove'} {source_hash}")
+
+    entries = shared.entries()
+    if args.keep is not None:
+        for info in entries[args.keep:]:
+            print(f"{'Removed' if shared.remove(info.source_hash) else 'Could not remove'} {info.source_hash}")
+        entries = shared.entries()
+
+    print(f"{len(entries):,} shared tries in {shared.directory}")
+    for info in entries:
+        print(f"\t{info.source_hash}  {info.n_bytes / 1_000_000:>8.1f} MB  {datetime.fromtimestamp(info.modified_time):%Y-%m-%d %H:%M}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lists, publishes, and removes compiled tries shared between local processes")
+    parser.add_argument("-i", "--in-path", "--in", help="path to a Hatchery dictionary to build and publish, if it is not published already")
+    parser.add_argument("-d", "--dir", help="registry folder (defaults to the one in Plover's config folder)")
+    parser.add_argument("-r", "--remove", nargs="*", default=[], help="source hashes of tries to remove")
+    parser.add_argument("-k", "--keep", type=int, help="removes all but this many of the most recently published tries")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to build with, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
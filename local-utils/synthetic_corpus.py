@@ -0,0 +1,141 @@
+"""Generates a reproducible corpus of made-up words for benchmarking. Each has an orthography, a Unilex-style
+transcription, a Lapwing-style outline, and its aligned sophemes. Words are built from syllables whose sounds line up
+one-to-one across all of these, so every entry aligns cleanly with `match_sophemes`.
+"""
+
+from pathlib import Path
+from typing import NamedTuple
+import json
+import os
+import random
+import argparse
+
+
+class _Sound(NamedTuple):
+    chars: str
+    keysymbol: str
+    phoneme: str
+    steno: str
+    """The keys of the sound's chord, with a leading `-` for right-bank chords"""
+
+_SyllablePart = tuple[_Sound, ...]
+
+_ONSETS: tuple[_SyllablePart, ...] = (
+    (_Sound("p", "p", "P", "P"),),
+    (_Sound("t", "t", "T", "T"),),
+    (_Sound("k", "k", "K", "K"),),
+    (_Sound("b", "b", "B", "PW"),),
+    (_Sound("d", "d", "D", "TK"),),
+    (_Sound("g", "g", "G", "TKPW"),),
+    (_Sound("f", "f", "F", "TP"),),
+    (_Sound("s", "s", "S", "S"),),
+    (_Sound("h", "h", "H", "H"),),
+    (_Sound("m", "m", "M", "PH"),),
+    (_Sound("n", "n", "N", "TPH"),),
+    (_Sound("l", "l", "L", "HR"),),
+    (_Sound("r", "r", "R", "R"),),
+    (_Sound("w", "w", "W", "W"),),
+    (_Sound("s", "s", "S", "S"), _Sound("t", "t", "T", "T")),
+    (_Sound("p", "p", "P", "P"), _Sound("r", "r", "R", "R")),
+    (_Sound("k", "k", "K", "K"), _Sound("l", "l", "L", "HR")),
+)
+
+_VOWELS: tuple[_Sound, ...] = (
+    _Sound("a", "a", "A", "A"),
+    _Sound("e", "e", "E", "E"),
+    _Sound("i", "i", "I", "EU"),
+    _Sound("o", "o", "O", "O"),
+    _Sound("u", "uh", "U", "U"),
+    _Sound("ee", "ii", "EE", "AOE"),
+    _Sound("oo", "uu", "UU", "AO"),
+)
+
+_CODAS: tuple[_SyllablePart, ...] = (
+    (),
+    (_Sound("p", "p", "P", "-P"),),
+    (_Sound("t", "t", "T", "-T"),),
+    (_Sound("k", "k", "K", "-BG"),),
+    (_Sound("b", "b", "B", "-B"),),
+    (_Sound("d", "d", "D", "-D"),),
+    (_Sound("g", "g", "G", "-G"),),
+    (_Sound("f", "f", "F", "-F"),),
+    (_Sound("s", "s", "S", "-S"),),
+    (_Sound("m", "m", "M", "-PL"),),
+    (_Sound("n", "n", "N", "-PB"),),
+    (_Sound("l", "l", "L", "-L"),),
+    (_Sound("r", "r", "R", "-R"),),
+    (_Sound("s", "s", "S", "-F"), _Sound("t", "t", "T", "-T")),
+)
+
+
+class SyntheticEntry(NamedTuple):
+    translation: str
+    transcription: str
+    """Unilex-style transcription, as taken by `match_sophemes`"""
+    outline_steno: str
+    sophemes: str
+    """The entry's aligned sophemes in the line notation of `parse_sopheme_seq`, as `match_sophemes` would produce them"""
+
+
+def generate_corpus(n_entries: int, seed: int=0, max_syllables: int=4):
+    """Generates `n_entries` entries with distinct translations. The same seed always gives the same corpus."""
+
+    rng = random.Random(seed)
+
+    entries: dict[str, SyntheticEntry] = {}
+    while len(entries) < n_entries:
+        n_syllables = rng.randint(1, max_syllables)
+        stressed_syllable = rng.randrange(n_syllables)
+
+        translation = ""
+        transcription_syllables: list[str] = []
+        strokes: list[str] = []
+        sophemes: list[str] = []
+        for i in range(n_syllables):
+            onset = rng.choice(_ONSETS) if i == 0 or rng.random() < 0.9 else ()
+            vowel = rng.choice(_VOWELS)
+            coda = rng.choice(_CODAS)
+
+            keysymbols: list[str] = []
+            for sound in (*onset, vowel, *coda):
+                is_stressed_vowel = sound is vowel and i == stressed_syllable
+                if is_stressed_vowel:
+                    keysymbols.append("*")
+                keysymbols.append(sound.keysymbol)
+
+                translation += sound.chars
+                sophemes.append(f"{sound.chars}.{sound.keysymbol}{'!1' if is_stressed_vowel else ''}[{sound.phoneme}][[{sound.steno}]]")
+
+            transcription_syllables.append(" ".join(keysymbols))
+            strokes.append("".join(sound.steno.lstrip("-") for sound in (*onset, vowel, *coda)))
+
+        if translation in entries: continue
+
+        entries[translation] = SyntheticEntry(
+            translation,
+            f" {{ {' . '.join(transcription_syllables)} }} ",
+            "/".join(strokes),
+            " ".join(sophemes),
+        )
+
+    return list(entries.values())
+
+
+def _main(args: argparse.Namespace):
+    corpus = generate_corpus(args.n_entries, args.seed)
+
+    out_path = Path(os.getcwd()) / args.out_path
+    out_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(out_path, "w", encoding="utf-8") as file:
+        json.dump([entry._asdict() for entry in corpus], file, indent=0)
+
+    print(f"Wrote {len(corpus):,} entries to {out_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes a synthetic corpus of entries as JSON")
+    parser.add_argument("-n", "--n-entries", type=int, default=10_000, help="number of entries to generate")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("-o", "--out-path", "--out", help="path to output the corpus", required=True)
+    args = parser.parse_args()
+
+    _main(args)
@@ -0,0 +1,131 @@
+from pathlib import Path
+from typing import Iterable, Optional, TextIO
+import importlib
+import json
+import os
+import sys
+import tempfile
+import time
+import argparse
+
+from plover import system
+from plover.registry import registry
+
+
+def _setup_plover(system_name: str):
+    registry.update()
+    system.setup(system_name)
+
+
+def _build(in_path: Path, theory, registry):
+    from plover_writeouts.lib.lookup import build_lookup_hatchery, build_lookup_hatchery_binary
+    from plover_writeouts.lib.lookup.shared import SharedTrieSource
+    from plover_writeouts.lib.sopheme.binary import HatcheryBinaryReader, is_hatchery_binary
+
+    shared = SharedTrieSource.for_file(registry, in_path, theory) if registry is not None else None
+
+    with open(in_path, "rb") as file:
+        is_binary = is_hatchery_binary(file)
+
+    if is_binary:
+        with HatcheryBinaryReader(str(in_path)) as entries:
+            return build_lookup_hatchery_binary(entries, theory, shared=shared)
+
+    with open(in_path, "r", encoding="utf-8") as file:
+        return build_lookup_hatchery(file, theory, shared=shared)
+
+
+def _read_strokes(strokes_path: "str | None") -> Iterable[Optional[str]]:
+    if strokes_path is None:
+        yield from _read_stroke_lines(sys.stdin)
+        return
+
+    with open(Path(os.getcwd()) / strokes_path, "r", encoding="utf-8") as file:
+        if strokes_path.endswith(".json"):
+            # A list of stroke tuples, e.g., outlines
+            for stroke_stenos in json.load(file):
+                yield from stroke_stenos
+        else:
+            yield from _read_stroke_lines(file)
+
+def _read_stroke_lines(file: TextIO):
+    from plover_writeouts.lib.lookup.translate import read_stroke_log
+
+    first_line = file.readline()
+    if "Stroke(" in first_line:
+        yield from read_stroke_log((first_line,))
+        yield from read_stroke_log(file)
+        return
+
+    # One outline per line, with strokes separated by slashes
+    line = first_line
+    while len(line) > 0:
+        yield from (stroke_steno for stroke_steno in line.strip().split("/") if len(stroke_steno) > 0)
+        line = file.readline()
+
+
+def _main(args: argparse.Namespace):
+    from plover_writeouts.lib.theory.service import TheoryService
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.shared import SharedTrieRegistry, default_registry
+    from plover_writeouts.lib.lookup.translate import StrokeTranslator
+
+    module_name, theory_name = args.theory.rsplit(":", 1)
+    theory = getattr(importlib.import_module(module_name), theory_name)
+    assert isinstance(theory, TheoryService), f"{args.theory} is not a theory"
+
+    in_path = Path(os.getcwd()) / args.in_path
+
+    print(f"Loading {in_path}…", file=sys.stderr)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # Building through a registry always gives a single trie, which is what the translator traverses
+        lookup, _ = _build(in_path, theory, SharedTrieRegistry(Path(temp_dir)) if args.no_shared else default_registry())
+
+        engine = getattr(lookup, "__self__", None)
+        assert isinstance(engine, TrieLookupEngine)
+        translator = StrokeTranslator(engine.trie, theory, args.longest_key)
+
+        out_file = sys.stdout if args.out_path is None else open(Path(os.getcwd()) / args.out_path, "w", encoding="utf-8")
+
+        n_strokes = 0
+        n_words = 0
+        n_untranslated = 0
+        total_cost = 0
+
+        def count_strokes(stroke_stenos: Iterable[Optional[str]]):
+            nonlocal n_strokes
+            for stroke_steno in stroke_stenos:
+                n_strokes += 1
+                yield stroke_steno
+
+        start_time = time.perf_counter()
+        with out_file:
+            for word in translator.translate(count_strokes(_read_strokes(args.strokes_path))):
+                n_words += 1
+                if word.translation is None or word.cost is None:
+                    n_untranslated += 1
+                    out_file.write(f"{'/'.join(word.stroke_stenos)}\t\t\n")
+                    continue
+
+                total_cost += word.cost
+                out_file.write(f"{'/'.join(word.stroke_stenos)}\t{word.translation}\t{word.cost:g}\n")
+        duration = time.perf_counter() - start_time
+
+    n_translated = n_words - n_untranslated
+    print(f"Translated {n_strokes:,} strokes into {n_words:,} words ({n_untranslated:,} untranslated) in {duration:.3f} s, {n_strokes / max(duration, 1e-9):,.0f} strokes/s", file=sys.stderr)
+    if n_translated > 0:
+        print(f"Mean cost per translated word: {total_cost / n_translated:.3f}", file=sys.stderr)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Translates a Plover stroke log, or a list of outlines, with a Hatchery dictionary without running Plover, writing each word with its cost as tab-separated values")
+    parser.add_argument("-i", "--in-path", "--in", help="path to a Hatchery dictionary", required=True)
+    parser.add_argument("-l", "--strokes-path", "--strokes", help="path to a Plover stroke log, a JSON list of stroke tuples ending in .json, or a file of outlines, one per line (defaults to standard input)")
+    parser.add_argument("-o", "--out-path", "--out", help="path to write the words to (defaults to standard output)")
+    parser.add_argument("--longest-key", type=int, default=12, help="most strokes in one word")
+    parser.add_argument("--no-shared", action="store_true", help="builds the trie in this process rather than attaching to the shared one")
+    parser.add_argument("-t", "--theory", default="plover_writeouts.lib.theory.theory:amphitheory", help="theory to build with, as `module:name`")
+    parser.add_argument("-s", "--system", default="English Stenotype", help="Plover system the theory's keys belong to")
+    args = parser.parse_args()
+
+    _setup_plover(args.system)
+    _main(args)
@@ -1,12 +1,27 @@
-from typing import Optional, Callable, Generator, Any
+from typing import Optional, Callable, Generator, Any, TYPE_CHECKING
 
 from plover.steno import Stroke
 from plover.steno_dictionary import StenoDictionary
 import plover.log
 
+if TYPE_CHECKING:
+    from threading import Event
+
+    from .lib.lookup.background import BackgroundLookupLoader
+    from .lib.lookup.incremental import HatcheryBuildCache
+    from .lib.util.memory import TracedMemory
+    from .lib.util.profiling import SampledLookupProfiler
+
 class HatcheryDictionary(StenoDictionary):
     readonly = True
 
+    _build_caches: "dict[str, HatcheryBuildCache]" = {}
+    """The latest build of each loaded file. Plover creates a new dictionary whenever a file changes, so these outlive
+    the instances that built them, letting a reload apply only the entries that changed."""
+    _loaders: "dict[str, BackgroundLookupLoader]" = {}
+    """The loader of each loaded file, kept across instances for the same reason: a reload keeps serving the last
+    lookups until its build finishes, and cancels the build it replaces"""
+
 
     def __init__(self):
         super().__init__()
@@ -14,14 +29,111 @@ class HatcheryDictionary(StenoDictionary):
         """(override)"""
         self._longest_key = 12
 
-        self.__maybe_lookup: "Callable[[tuple[str, ...]], str | None] | None" = None
-        self.__maybe_reverse_lookup: "Callable[[str], list[tuple[str, ...]]] | None" = None
+        from .lib.lookup.background import BackgroundLookupLoader
+        self.__loader = BackgroundLookupLoader("Hatchery dictionary")
+
+        self.__load_memory: "TracedMemory | None" = None
+        """Memory traced during the latest build, if `TRACE_LOAD_MEMORY` is set"""
+        self.__lookup_profiler: "SampledLookupProfiler | None" = None
 
     def _load(self, filepath: str):
-        from .lib.lookup import build_lookup_hatchery
+        import os
+
+        from .lib.util.config import LOAD_IN_BACKGROUND, TRACE_LOAD_MEMORY
+        from .lib.util.profiling import profiled, create_lookup_profiler
+        from .lib.lookup.background import BackgroundLookupLoader
+        from .lib.lookup.incremental import HatcheryBuildCache
+
+        cache = self._build_caches.get(filepath)
+        if cache is None:
+            cache = self._build_caches[filepath] = HatcheryBuildCache()
+
+        loader = self._loaders.get(filepath)
+        if loader is None:
+            loader = self._loaders[filepath] = BackgroundLookupLoader(filepath)
+        self.__loader = loader
+
+        filename = os.path.basename(filepath)
+        self.__lookup_profiler = create_lookup_profiler(f"lookups {filename}")
+
+        def build(cancel_event: "Event"):
+            # Profiled on the thread doing the build, since `cProfile` only sees the thread it was enabled on
+            with profiled(f"load {filename}"):
+                if not TRACE_LOAD_MEMORY:
+                    return build_lookups(cancel_event)
+
+                from .lib.util.memory import traced_memory
+
+                with traced_memory() as load_memory:
+                    lookups = build_lookups(cancel_event)
+                self.__load_memory = load_memory
+                plover.log.debug(f"loading {filepath}: {load_memory}")
+
+                return lookups
+
+        def build_lookups(cancel_event: "Event"):
+            from .lib.lookup import build_lookup_hatchery, build_lookup_hatchery_binary
+            from .lib.lookup.shared import SharedTrieSource, default_registry
+            from .lib.sopheme.binary import HatcheryBinaryReader, is_hatchery_binary
+            from .lib.theory.theory import amphitheory
+            from .lib.theory.artifact import load_or_compile_theory, default_compiled_theory_dir
+            from .lib.util.config import SHARED_TRIES, COMPILED_THEORY_CACHE
+
+            if COMPILED_THEORY_CACHE:
+                load_or_compile_theory(amphitheory, default_compiled_theory_dir())
+
+            shared = SharedTrieSource.for_file(default_registry(), filepath, amphitheory) if SHARED_TRIES else None
+
+            with open(filepath, "rb") as file:
+                is_binary = is_hatchery_binary(file)
+
+            if is_binary:
+                with HatcheryBinaryReader(filepath) as entries:
+                    return build_lookup_hatchery_binary(entries, amphitheory, cancel_event=cancel_event, cache=cache, shared=shared)
+            else:
+                with open(filepath, "r", encoding="utf-8") as file:
+                    return build_lookup_hatchery(file, amphitheory, cancel_event=cancel_event, cache=cache, shared=shared)
+
+        if LOAD_IN_BACKGROUND:
+            loader.start(build)
+        else:
+            loader.load(build)
+
+    @property
+    def is_ready(self):
+        """Whether a build has finished. Until then, lookups find nothing rather than block."""
+        return self.__loader.is_ready
+
+    def wait_until_ready(self, timeout: "float | None"=None):
+        """Blocks until the latest build finishes. Returns whether lookups are ready."""
+        return self.__loader.wait(timeout)
+
+    def memory_report(self):
+        """Reports the sizes of the lookup structures built so far, and the memory traced while loading if
+        `TRACE_LOAD_MEMORY` is set"""
+
+        from .lib.lookup.engine import TrieLookupEngine
+        from .lib.lookup.sharded import ShardedLookup
+        from .lib.util.memory import MemoryReport
+
+        lookups = self.__loader.lookups
+        engine = getattr(lookups[0], "__self__", None) if lookups is not None else None
+
+        if isinstance(engine, ShardedLookup):
+            report = engine.memory_report()
+        elif isinstance(engine, TrieLookupEngine):
+            report = MemoryReport("lookup trie")
+            report.add_all(engine.trie.memory_sections(), "trie ")
+            report.notes.append(f"{engine.trie.n_transitions:,} trie transitions")
+        else:
+            report = MemoryReport("lookup structures")
+            report.notes.append("not ready yet")
+
+        report.title = f"{self.__loader.name}: {report.title}"
+        if self.__load_memory is not None:
+            report.notes.append(str(self.__load_memory))
 
-        with open(filepath, "r", encoding="utf-8") as file:
-            self.__maybe_lookup, self.__maybe_reverse_lookup = build_lookup_hatchery(file)
+        return report
             
 
     def __getitem__(self, stroke_stenos: tuple[str, ...]) -> str:
@@ -39,12 +151,16 @@ class HatcheryDictionary(StenoDictionary):
         return result
     
     def reverse_lookup(self, translation: str) -> list[tuple[str, ...]]:
-        if self.__maybe_reverse_lookup is None: raise Exception("reverse lookup occurred before load")
+        lookups = self.__loader.lookups
+        if lookups is None: return []
 
-        return self.__maybe_reverse_lookup(translation)
+        return lookups[1](translation)
     
     def __lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
-        if self.__maybe_lookup is None: raise Exception("lookup occurred before load")
+        lookups = self.__loader.lookups
+        if lookups is None: return None
 
-        return self.__maybe_lookup(stroke_stenos)
+        if self.__lookup_profiler is not None:
+            return self.__lookup_profiler.lookup(lookups[0], stroke_stenos)
+        return lookups[0](stroke_stenos)
 
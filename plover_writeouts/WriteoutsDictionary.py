@@ -1,10 +1,13 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, TYPE_CHECKING
 import json
 
 from plover.steno import Stroke
 from plover.steno_dictionary import StenoDictionary
 import plover.log
 
+if TYPE_CHECKING:
+    from .lib.util.profiling import SampledLookupProfiler
+
 class WriteoutsDictionary(StenoDictionary):
     readonly = True
 
@@ -17,14 +20,23 @@ class WriteoutsDictionary(StenoDictionary):
 
         self.__maybe_lookup: "Callable[[tuple[str, ...]], str | None] | None" = None
         self.__maybe_reverse_lookup: "Callable[[str], list[tuple[str, ...]]] | None" = None
+        self.__lookup_profiler: "SampledLookupProfiler | None" = None
 
     def _load(self, filepath: str):
+        import os
+
         from .lib.lookup import build_lookup_json
+        from .lib.theory.theory import amphitheory
+        from .lib.util.profiling import profiled, create_lookup_profiler
+
+        filename = os.path.basename(filepath)
+        self.__lookup_profiler = create_lookup_profiler(f"lookups {filename}")
 
-        with open(filepath, "r", encoding="utf-8") as file:
-            map: dict[str, str] = json.load(file)
+        with profiled(f"load {filename}"):
+            with open(filepath, "r", encoding="utf-8") as file:
+                map: dict[str, str] = json.load(file)
 
-        self.__maybe_lookup, self.__maybe_reverse_lookup = build_lookup_json(map)
+            self.__maybe_lookup, self.__maybe_reverse_lookup = build_lookup_json(map, amphitheory)
 
 
     def __getitem__(self, stroke_stenos: tuple[str, ...]) -> str:
@@ -49,5 +61,7 @@ class WriteoutsDictionary(StenoDictionary):
     def __lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
         if self.__maybe_lookup is None: raise Exception("lookup occurred before load")
 
+        if self.__lookup_profiler is not None:
+            return self.__lookup_profiler.lookup(self.__maybe_lookup, stroke_stenos)
         return self.__maybe_lookup(stroke_stenos)
 
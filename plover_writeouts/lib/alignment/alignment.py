@@ -54,7 +54,10 @@ class Cell(Generic[Cost, MatchData]):
         return self.cost > cell.cost
 
 class AlignmentService(Generic[Cost, MatchData, InputX, InputY, MappingX, MappingY, ItemX, ItemY, Match], ABC):
-    MAPPINGS: Mapping[MappingX, MappingY]
+    @staticmethod
+    def build_mappings() -> Mapping[MappingX, MappingY]:
+        """Builds the table of what counts as a match. Called once, on the first alignment, so that importing an aligner stays cheap"""
+        ...
 
     @staticmethod
     def process_input(x_input: InputX, y_input: InputY) -> tuple[Sliceable[ItemX], Sliceable[ItemY]]:
@@ -98,6 +101,8 @@ class AlignmentService(Generic[Cost, MatchData, InputX, InputY, MappingX, Mappin
 
 
 def aligner(Service: type[AlignmentService[Cost, MatchData, InputX, InputY, MappingX, MappingY, ItemX, ItemY, Match]]):
+    built_mappings: "Mapping[MappingX, MappingY] | None" = None
+
     def align(input_x: InputX, input_y: InputY):
         """Generates an alignment between characters in a translation and keys in a Lapwing-style outline.
         
@@ -107,7 +112,10 @@ def aligner(Service: type[AlignmentService[Cost, MatchData, InputX, InputY, Mapp
         - Strict left-to-right parsing; no inversions
         """
 
-        mappings = Service.MAPPINGS
+        nonlocal built_mappings
+        if built_mappings is None:
+            built_mappings = Service.build_mappings()
+        mappings = built_mappings
 
         seq_x, seq_y = Service.process_input(input_x, input_y)
 
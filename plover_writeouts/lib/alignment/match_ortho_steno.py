@@ -7,7 +7,7 @@ from .steno_annotations import AsteriskableKey, AnnotatedChord
 from .alignment import AlignmentService, Cell, aligner
 
 
-_GRAPHEME_TO_STENO_MAPPINGS = {
+_build_grapheme_to_steno_mappings = lambda: {
     grapheme: sorted(
         tuple(AsteriskableKey.annotations_from_outline(outline_steno) for outline_steno in outline_stenos),
         key=lambda keys: len(keys), reverse=True
@@ -109,7 +109,7 @@ class _Cost(NamedTuple):
 
 @aligner
 class match_chars_to_chords(AlignmentService, ABC):
-    MAPPINGS = _GRAPHEME_TO_STENO_MAPPINGS
+    build_mappings = _build_grapheme_to_steno_mappings
 
     @staticmethod
     def process_input(translation: str, outline_steno: str) -> tuple[str, tuple[AsteriskableKey, ...]]:
@@ -166,7 +166,7 @@ _any_vowel_mapping = (
     (Stenophoneme.II, "AOEU"),
 )
 
-_KEYSYMBOL_TO_STENO_MAPPINGS = {
+_build_keysymbol_to_steno_mappings = lambda: {
     tuple(keysymbol.split(" ")): tuple(_Mapping(phoneme, AsteriskableKey.annotations_from_outline(outline_steno)) for phoneme, outline_steno in mapping)
     for keysymbol, mapping in cast(dict[str, tuple[tuple[Stenophoneme | None, str], ...]], {
         # How does each keysymbol appear as it does in Lapwing?
@@ -276,7 +276,7 @@ _STRESS_KEYSYMBOLS = {
 
 @aligner
 class match_keysymbols_to_chars(AlignmentService, ABC):
-    MAPPINGS = _KEYSYMBOL_TO_GRAPHEME_MAPPINGS
+    build_mappings = lambda: _KEYSYMBOL_TO_GRAPHEME_MAPPINGS
 
     @staticmethod
     def process_input(transcription: str, translation: str) -> tuple[tuple[Keysymbol, ...], str]:
@@ -338,7 +338,7 @@ class match_keysymbols_to_chars(AlignmentService, ABC):
 
 @aligner
 class match_orthokeysymbols_to_chords(AlignmentService, ABC):
-    MAPPINGS = _KEYSYMBOL_TO_STENO_MAPPINGS
+    build_mappings = _build_keysymbol_to_steno_mappings
 
     @staticmethod
     def process_input(orthokeysymbols: tuple[Orthokeysymbol, ...], outline_steno: str) -> tuple[tuple[Orthokeysymbol, ...], tuple[AsteriskableKey, ...]]:
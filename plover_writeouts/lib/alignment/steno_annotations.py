@@ -21,11 +21,11 @@ class AsteriskableKey:
     def annotations_from_strokes(strokes: Iterable[Stroke]):
         return tuple(
             AsteriskableKey(key, has_asterisk)
-            for stroke, has_asterisk in (
-                (stroke - lapwing.spec.ASTERISK_SUBSTROKE, lapwing.spec.ASTERISK_SUBSTROKE in stroke)
+            for stroke_mask, has_asterisk in (
+                (int(stroke) & ~lapwing.asterisk_mask, int(stroke) & lapwing.asterisk_mask != 0)
                 for stroke in strokes
             )
-            for key in stroke.keys() 
+            for key in lapwing.mask_keys(stroke_mask)
         )
     
     def __str__(self):
@@ -44,20 +44,20 @@ class AnnotatedChord(Generic[T]):
     def keys_to_strokes(keys: Iterable[str], asterisk_matches: Iterable[bool]):
         strokes: list[Stroke] = []
 
-        current_stroke = Stroke.from_integer(0)
+        current_stroke = 0
         for key, asterisk_match in zip(keys, asterisk_matches):
-            key_stroke = Stroke.from_keys((key,))
+            key_stroke = lapwing.steno_to_mask(key)
             if asterisk_match:
-                key_stroke += lapwing.spec.ASTERISK_SUBSTROKE
+                key_stroke |= lapwing.asterisk_mask
 
-            if lapwing.can_add_stroke_on(current_stroke, key_stroke):
-                current_stroke += key_stroke
+            if lapwing.can_add_mask_on(current_stroke, key_stroke):
+                current_stroke |= key_stroke
             else:
-                strokes.append(current_stroke)
+                strokes.append(Stroke.from_integer(current_stroke))
                 current_stroke = key_stroke
 
-        if len(current_stroke) > 0:
-            strokes.append(current_stroke)
+        if current_stroke != 0:
+            strokes.append(Stroke.from_integer(current_stroke))
 
         return tuple(strokes)
     
@@ -1,40 +1,216 @@
-from typing import TextIO
+import re
+from typing import Callable, Iterable, TextIO, TypeVar, TYPE_CHECKING
 
 from plover.steno import Stroke
 import plover.log
 
-from ..util.Trie import NondeterministicTrie
 from ..sopheme.Sopheme import Sopheme
-from .build_trie.add_entry import add_entry
-from .build_lookup import create_lookup_for
-from .build_reverse_lookup import create_reverse_lookup_for
+from ..sopheme.parse import parse_sopheme_seq, format_sopheme_seq
+from ..sopheme.intern import SophemeInternPool
+from ..theory.service import TheoryService
+from ..util.config import PROFILE_BUILD, ENTRY_MAX_COST, ENTRY_MAX_ABBREVIATION_STEPS, LAZY_SHARDS, WARM_UP_SHARDS, LOOKUP_ENGINE
+from .build_trie.add_entry import BuildCancelledError
+from .build_trie.profiler import BuildProfiler
+from .build_trie.budget import ExpansionBudget
+from .build_trie.state import OutlineSounds
+from .engine import LookupEngine, TrieLookupEngine
+from .sharded import ShardedLookup
+from .batch import BatchLookupEngine
+from .incremental import HatcheryBuildCache, build_incrementally, entry_hash
+from .shared import SharedTrieSource
 from .get_sophemes import get_outline_phonemes, get_sopheme_phonemes
 
-def build_lookup_json(mappings: dict[str, str]):
-    trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+if TYPE_CHECKING:
+    from threading import Event
 
-    for outline_steno, translation in mappings.items():
-        phonemes = get_outline_phonemes(Stroke.from_steno(steno) for steno in outline_steno.split("/"))
-        if phonemes is None:
-            continue
-        add_entry(trie, phonemes, translation)
+    from ..sopheme.binary import HatcheryBinaryReader
 
-    # plover.log.debug(str(trie))
-    return create_lookup_for(trie), create_reverse_lookup_for(trie)
+_T = TypeVar("_T")
 
+LOOKUP_ENGINES: dict[str, type[LookupEngine]] = {
+    "trie": TrieLookupEngine,
+    "sharded": ShardedLookup,
+    "batch": BatchLookupEngine,
+}
+"""Engines that dictionaries can be built with, by the names `LOOKUP_ENGINE` takes"""
 
-def build_lookup_hatchery(file: TextIO):
-    import json
+def build_lookup_json(mappings: dict[str, str], theory: TheoryService, profiler: "BuildProfiler | None"=None, cancel_event: "Event | None"=None):
+    def generate_entries():
+        for outline_steno, translation in mappings.items():
+            phonemes = get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), theory)
+            if phonemes is None:
+                continue
+            yield phonemes, translation
 
-    trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+    return _build_lookups(generate_entries(), theory, profiler, cancel_event)
 
-    entries_json = json.load(file)
-    for entry in entries_json:
-        sophemes = tuple(Sopheme.parse_sopheme_dict(sopheme_json) for sopheme_json in entry)
 
-        add_entry(trie, get_sopheme_phonemes(sophemes), Sopheme.get_translation(sophemes))
+def build_lookup_hatchery(
+    file: TextIO,
+    theory: TheoryService,
+    profiler: "BuildProfiler | None"=None,
+    cancel_event: "Event | None"=None,
+    cache: "HatcheryBuildCache | None"=None,
+    shared: "SharedTrieSource | None"=None,
+):
+    """Builds a lookup from a Hatchery dictionary, either in the line notation of `parse_sopheme_seq` (one entry per line,
+    read as a stream) or as a JSON array of entries. Streaming only avoids holding the whole text at once: the decoded
+    entries are still kept for as long as the lookup, since lazily built shards and incremental rebuilds need them, so
+    memory still grows with the number of entries. Raises `ValueError` naming the line of an entry that does not parse.
 
-    # while len(line := file.readline()) > 0:
-    #     _add_entry(trie, Sopheme.parse_seq())
+    If `cache` holds an earlier build of the same dictionary, only the entries that changed since then are applied. If
+    `shared` is given, the lookup attaches to the trie it names instead, publishing one first if there is none.
+    """
 
-    return create_lookup_for(trie), create_reverse_lookup_for(trie)
\ No newline at end of file
+    pool = SophemeInternPool()
+
+    first_line = file.readline()
+
+    if _JSON_ARRAY_START_PATTERN.match(first_line):
+        import json
+
+        entries_json: list = json.loads(first_line + file.read())
+
+        def decode(entry_json: list):
+            sophemes = tuple(Sopheme.parse_sopheme_dict(sopheme_json, pool) for sopheme_json in entry_json)
+            return get_sopheme_phonemes(sophemes, theory, pool), Sopheme.get_translation(sophemes)
+
+        lookups = _build_hatchery_lookups(entries_json, lambda entry_json: json.dumps(entry_json, separators=(",", ":")), decode, theory, profiler, cancel_event, cache, shared)
+
+    else:
+        def generate_lines():
+            line = first_line
+            line_number = 1
+            while len(line) > 0:
+                if not line.isspace():
+                    yield line_number, line.rstrip("\r\n")
+
+                line = file.readline()
+                line_number += 1
+
+        def decode(numbered_line: tuple[int, str]):
+            line_number, line = numbered_line
+            try:
+                sophemes = parse_sopheme_seq(line, pool)
+            except ValueError as error:
+                raise ValueError(f"line {line_number}: {error}") from error
+            return get_sopheme_phonemes(sophemes, theory, pool), Sopheme.get_translation(sophemes)
+
+        # Entries are hashed by their text alone, so that moving lines around does not count as changing them
+        lookups = _build_hatchery_lookups(generate_lines(), lambda numbered_line: numbered_line[1], decode, theory, profiler, cancel_event, cache, shared)
+
+    plover.log.debug(pool.report())
+
+    return lookups
+
+def build_lookup_hatchery_binary(
+    entries: "HatcheryBinaryReader",
+    theory: TheoryService,
+    profiler: "BuildProfiler | None"=None,
+    cancel_event: "Event | None"=None,
+    cache: "HatcheryBuildCache | None"=None,
+    shared: "SharedTrieSource | None"=None,
+):
+    """Builds a lookup from a binary Hatchery dictionary, decoding each entry only as the builder reaches it"""
+
+    # The reader already shares decoded sophemes, so the pool is only needed for their sounds
+    pool = SophemeInternPool()
+
+    def decode(sophemes: tuple[Sopheme, ...]):
+        return get_sopheme_phonemes(sophemes, theory, pool), Sopheme.get_translation(sophemes)
+
+    lookups = _build_hatchery_lookups(entries, format_sopheme_seq, decode, theory, profiler, cancel_event, cache, shared)
+    plover.log.debug(pool.report())
+
+    return lookups
+
+_JSON_ARRAY_START_PATTERN = re.compile(r"\s*\[\s*(\[\s*\{|\]|$)")
+"""Distinguishes a JSON array of entries from a line whose first sopheme is steno-only, e.g., `[[KWR]]`"""
+
+
+def _build_hatchery_lookups(
+    raw_entries: Iterable[_T],
+    entry_text: Callable[[_T], str],
+    decode: Callable[[_T], tuple[OutlineSounds, str]],
+    theory: TheoryService,
+    profiler: "BuildProfiler | None",
+    cancel_event: "Event | None",
+    cache: "HatcheryBuildCache | None",
+    shared: "SharedTrieSource | None"=None,
+):
+    if shared is not None:
+        if cache is not None:
+            cache.state = None
+        return _build_shared_lookups(raw_entries, decode, theory, profiler, cancel_event, shared)
+
+    # Only sharded builds can be updated in place
+    if cache is None or _lookup_engine_type(profiler is not None or PROFILE_BUILD) is not ShardedLookup:
+        if cache is not None:
+            cache.state = None
+        return _build_lookups((decode(raw_entry) for raw_entry in raw_entries), theory, profiler, cancel_event)
+
+    state = build_incrementally(
+        ((entry_hash(entry_text(raw_entry)), raw_entry) for raw_entry in raw_entries),
+        decode,
+        theory,
+        cache.state,
+        lambda entries: ShardedLookup.build(entries, theory, _expansion_budget(), cancel_event=cancel_event),
+        cancel_event,
+    )
+    if WARM_UP_SHARDS:
+        state.sharded_lookup.warm_up_in_background(cancel_event)
+
+    cache.state = state
+    return state.lookups
+
+
+def _build_shared_lookups(
+    raw_entries: Iterable[_T],
+    decode: Callable[[_T], tuple[OutlineSounds, str]],
+    theory: TheoryService,
+    profiler: "BuildProfiler | None",
+    cancel_event: "Event | None",
+    shared: "SharedTrieSource",
+):
+    # Entries are only read if there is no trie to attach to
+    compiled = shared.registry.attach(shared.source_hash)
+    if compiled is None:
+        if profiler is None and PROFILE_BUILD:
+            profiler = BuildProfiler()
+
+        engine = TrieLookupEngine.build((decode(raw_entry) for raw_entry in raw_entries), theory, _expansion_budget(), profiler, cancel_event)
+        compiled = shared.registry.publish(shared.source_hash, engine.trie.compiled())
+    else:
+        plover.log.debug(f"attached to shared trie {shared.source_hash} ({compiled.n_nodes:,} nodes)")
+
+    # Shared tries are always built whole, so only engines over a single trie can use them
+    engine = (BatchLookupEngine if LOOKUP_ENGINE == "batch" else TrieLookupEngine)(compiled, theory)
+    return engine.lookup, engine.reverse_lookup
+
+
+def _build_lookups(entries: Iterable[tuple[OutlineSounds, str]], theory: TheoryService, profiler: "BuildProfiler | None", cancel_event: "Event | None"):
+    if profiler is None and PROFILE_BUILD:
+        profiler = BuildProfiler()
+
+    engine = _lookup_engine_type(profiler is not None).build(entries, theory, _expansion_budget(), profiler, cancel_event)
+    if isinstance(engine, ShardedLookup) and WARM_UP_SHARDS:
+        engine.warm_up_in_background(cancel_event)
+
+    return engine.lookup, engine.reverse_lookup
+
+def _lookup_engine_type(profiling: bool):
+    # Profiling needs every entry to be built up front
+    if profiling:
+        return TrieLookupEngine
+
+    if LOOKUP_ENGINE is not None:
+        if LOOKUP_ENGINE not in LOOKUP_ENGINES:
+            raise ValueError(f"unknown lookup engine {LOOKUP_ENGINE!r} (expected one of {', '.join(LOOKUP_ENGINES)})")
+        return LOOKUP_ENGINES[LOOKUP_ENGINE]
+
+    return ShardedLookup if LAZY_SHARDS else TrieLookupEngine
+
+def _expansion_budget():
+    if ENTRY_MAX_COST is None and ENTRY_MAX_ABBREVIATION_STEPS is None:
+        return None
+    return ExpansionBudget(ENTRY_MAX_COST, ENTRY_MAX_ABBREVIATION_STEPS)
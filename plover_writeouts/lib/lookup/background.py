@@ -0,0 +1,93 @@
+from threading import Event, Lock, Thread
+from typing import Callable, Optional
+
+import plover.log
+
+from .build_trie.add_entry import BuildCancelledError
+
+Lookup = Callable[[tuple[str, ...]], Optional[str]]
+ReverseLookup = Callable[[str], list[tuple[str, ...]]]
+Build = Callable[[Event], tuple[Lookup, ReverseLookup]]
+
+
+class BackgroundLookupLoader:
+    """Builds lookups on a worker thread. The last completed lookups keep serving until a newer build finishes, at which
+    point they are swapped out in a single assignment. Starting a build cancels any build still in progress, along with
+    any work the last build left running in the background, such as warming up shards.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+
+        self.__lookups: "tuple[Lookup, ReverseLookup] | None" = None
+        """The lookup and reverse lookup from the most recent completed build, or None if no build has completed yet"""
+        self.__lock = Lock()
+        self.__cancel_event: "Event | None" = None
+        """Cancellation event of the latest build. It stays set up after the build completes, since work the build
+        started in the background keeps checking it."""
+        self.__is_loading = False
+        self.__thread: "Thread | None" = None
+
+    @property
+    def lookups(self):
+        return self.__lookups
+
+    @property
+    def is_ready(self):
+        return self.__lookups is not None
+
+    @property
+    def is_loading(self):
+        return self.__is_loading
+
+    def start(self, build: Build):
+        with self.__lock:
+            cancel_event = self.__replace_cancel_event()
+            self.__thread = Thread(target=self.__run, args=(build, cancel_event), name=f"hatchery-load:{self.name}", daemon=True)
+            self.__thread.start()
+
+    def load(self, build: Build):
+        """Builds on the calling thread, cancelling any build in progress"""
+
+        with self.__lock:
+            cancel_event = self.__replace_cancel_event()
+
+        self.__run(build, cancel_event, reraise=True)
+
+    def wait(self, timeout: "float | None"=None):
+        """Waits for the latest build to finish. Returns whether lookups are ready."""
+
+        thread = self.__thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.is_ready
+
+    def __replace_cancel_event(self):
+        if self.__cancel_event is not None:
+            self.__cancel_event.set()
+
+        cancel_event = Event()
+        self.__cancel_event = cancel_event
+        self.__is_loading = True
+        return cancel_event
+
+    def __run(self, build: Build, cancel_event: Event, reraise: bool=False):
+        try:
+            lookups = build(cancel_event)
+        except BuildCancelledError:
+            plover.log.debug(f"build of {self.name} was cancelled by a newer load")
+            return
+        except Exception:
+            with self.__lock:
+                if self.__cancel_event is cancel_event:
+                    self.__is_loading = False
+
+            if reraise: raise
+            plover.log.error(f"failed to build {self.name}", exc_info=True)
+            return
+
+        with self.__lock:
+            if cancel_event.is_set(): return
+
+            self.__lookups = lookups
+            self.__is_loading = False
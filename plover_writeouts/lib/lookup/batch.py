@@ -0,0 +1,61 @@
+from threading import Lock
+from typing import Iterable, Optional, TYPE_CHECKING
+
+import plover.log
+
+from ..util.Trie import NondeterministicTrie
+from ..theory.service import TheoryService
+from .engine import TrieLookupEngine
+
+if TYPE_CHECKING:
+    from ..util.compiled_trie import CompiledTrie
+    from .sparse_traversal import SparseBatchTraversal
+
+
+class BatchLookupEngine(TrieLookupEngine):
+    """Builds the same trie as `TrieLookupEngine`, but traverses it for whole batches of outlines at once with NumPy,
+    per `SparseBatchTraversal`. The trie is compiled into arrays the first time it is traversed. Single lookups and
+    rankings still traverse the trie directly, since a batch has a fixed overhead that only pays off over many outlines.
+
+    NumPy is optional; without it, lookups fall back on traversing the trie one outline at a time.
+    """
+
+    def __init__(self, trie: "NondeterministicTrie[str, str] | CompiledTrie", theory: TheoryService):
+        super().__init__(trie, theory)
+
+        self.__traversal: "SparseBatchTraversal | None" = None
+        self.__numpy_missing = False
+        self.__lock = Lock()
+        """Held while compiling the trie"""
+
+    def lookup_batch(self, outlines: Iterable[tuple[str, ...]]) -> list[Optional[str]]:
+        # The traversal goes over the outlines several times
+        outlines = list(outlines)
+
+        traversal = self.__batch_traversal()
+        if traversal is None:
+            return [super(BatchLookupEngine, self).lookup(stroke_stenos) for stroke_stenos in outlines]
+        return traversal.lookup(outlines)
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "compiled": int(self.__traversal is not None),
+        }
+
+    def __batch_traversal(self):
+        if self.__traversal is not None or self.__numpy_missing:
+            return self.__traversal
+
+        with self.__lock:
+            if self.__traversal is None and not self.__numpy_missing:
+                try:
+                    from .sparse_traversal import SparseBatchTraversal
+                except ImportError:
+                    plover.log.warning("batch lookups need NumPy, which is not installed; looking up one outline at a time instead")
+                    self.__numpy_missing = True
+                    return None
+
+                self.__traversal = SparseBatchTraversal(self.trie.compiled(), self.theory)
+
+        return self.__traversal
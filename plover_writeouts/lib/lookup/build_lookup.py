@@ -1,113 +1,197 @@
-from plover.steno import Stroke
+from typing import Callable, Iterable, NamedTuple
+
 import plover.log
 
 from ..util.Trie import Transition, NondeterministicTrie
 from ..util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY
-from ..theory.theory import amphitheory
+from ..theory.service import TheoryService
 
-def create_lookup_for(trie:  NondeterministicTrie[str, str]):
+def create_lookup_for(trie: NondeterministicTrie[str, str], theory: TheoryService):
     def lookup(stroke_stenos: tuple[str, ...]):
         # plover.log.debug("")
         # plover.log.debug("new lookup")
 
-        current_nodes = {
-            trie.ROOT: (),
-        }
-        n_variation = 0
+        traversal = traverse(trie, stroke_stenos, theory)
+        if traversal is None:
+            return None
 
-        asterisk = Stroke.from_integer(0)
+        current_nodes, n_variation, asterisk = traversal
+        return choose_translation(((trie, current_nodes),), n_variation, asterisk, theory, trie.value_id)
 
-        for i, stroke_steno in enumerate(stroke_stenos):
-            stroke = Stroke.from_steno(stroke_steno)
-            if len(stroke) == 0:
-                return None
-            
-            if stroke == amphitheory.spec.CYCLER_STROKE:
-                n_variation += 1
-                continue
-            # if stroke == CYCLER_STROKE_BACKWARD:
-            #     n_variation -= 1
-            #     continue
-            
-            if stroke not in amphitheory.spec.ALL_KEYS:
-                return None
-            
-            if stroke in amphitheory.spec.PROHIBITED_STROKES:
-                return None
+    return lookup
 
-            if n_variation > 0:
-                return None
-            
-            if i > 0:
-                # plover.log.debug(current_nodes)
-                # plover.log.debug(TRIE_STROKE_BOUNDARY_KEY)
-                current_nodes = trie.get_dst_nodes(current_nodes, TRIE_STROKE_BOUNDARY_KEY)
+class TraversalFrontier(NamedTuple):
+    """Where a traversal has reached after some strokes of an outline"""
+
+    nodes: dict[int, tuple[Transition, ...]]
+    n_variation: int
+    """Number of cycler presses so far"""
+    asterisk: int
+    """Asterisk of the latest stroke that was not a cycler press"""
+    n_strokes: int
+
+
+def traverse(trie: NondeterministicTrie[str, str], stroke_stenos: tuple[str, ...], theory: TheoryService):
+    """Finds the nodes that an outline reaches in the trie, along with the number of cycler presses and the asterisk of
+    its last stroke, or None if the outline cannot reach any node"""
+
+    frontier = start_frontier(trie)
+    for stroke_steno in stroke_stenos:
+        frontier = advance(trie, frontier, stroke_steno, theory)
+        if frontier is None:
+            return None
+
+    return frontier.nodes, frontier.n_variation, frontier.asterisk
+
+def start_frontier(trie: NondeterministicTrie[str, str]):
+    return TraversalFrontier({trie.ROOT: ()}, 0, 0, 0)
+
+def advance(trie: NondeterministicTrie[str, str], frontier: TraversalFrontier, stroke_steno: str, theory: TheoryService):
+    """Extends a traversal by one stroke, so that outlines sharing a prefix only traverse it once. Returns None if the
+    outline can no longer reach any node."""
+
+    stroke = theory.steno_to_mask(stroke_steno)
+    if stroke == 0:
+        return None
+    
+    if stroke == theory.cycler_mask:
+        return frontier._replace(n_variation=frontier.n_variation + 1, n_strokes=frontier.n_strokes + 1)
+    # if stroke == CYCLER_STROKE_BACKWARD:
+    #     n_variation -= 1
+    #     continue
+    
+    if stroke & ~theory.all_keys_mask != 0:
+        return None
+    
+    if stroke in theory.prohibited_masks:
+        return None
+
+    if frontier.n_variation > 0:
+        return None
+
+    if frontier.n_strokes > 0:
+        # plover.log.debug(current_nodes)
+        # plover.log.debug(TRIE_STROKE_BOUNDARY_KEY)
+        current_nodes = trie.get_dst_nodes(frontier.nodes, TRIE_STROKE_BOUNDARY_KEY)
+        if len(current_nodes) == 0:
+            return None
+    else:
+        # Copied since the asterisk can add to the nodes in place, and the frontier may be shared
+        current_nodes = dict(frontier.nodes)
+
+    left_bank_consonants, vowels, right_bank_consonants, asterisk = theory.split_mask_parts(stroke)
+
+    if left_bank_consonants != 0:
+        # plover.log.debug(current_nodes)
+        # plover.log.debug(theory.mask_keys(left_bank_consonants))
+        if asterisk != 0:
+            for key in theory.mask_keys(left_bank_consonants):
+                current_nodes = trie.get_dst_nodes(current_nodes, key)
+                # plover.log.debug(f"\t{key}\t {current_nodes}")
+                current_nodes |= trie.get_dst_nodes_chain(current_nodes, theory.mask_keys(asterisk))
+                # plover.log.debug(f"\t{theory.mask_to_steno(asterisk)}\t {current_nodes}")
                 if len(current_nodes) == 0:
                     return None
-
-            left_bank_consonants, vowels, right_bank_consonants, asterisk = amphitheory.split_stroke_parts(stroke)
-
-            if len(left_bank_consonants) > 0:
-                # plover.log.debug(current_nodes)
-                # plover.log.debug(left_bank_consonants.keys())
-                if len(asterisk) > 0:
-                    for key in left_bank_consonants.keys():
-                        current_nodes = trie.get_dst_nodes(current_nodes, key)
-                        # plover.log.debug(f"\t{key}\t {current_nodes}")
-                        current_nodes |= trie.get_dst_nodes_chain(current_nodes, asterisk.keys())
-                        # plover.log.debug(f"\t{asterisk.rtfcre}\t {current_nodes}")
-                        if len(current_nodes) == 0:
-                            return None
-                elif left_bank_consonants == amphitheory.spec.LINKER_CHORD:
-                    current_nodes = trie.get_dst_nodes_chain(current_nodes, left_bank_consonants.keys()) | trie.get_dst_nodes(current_nodes, TRIE_LINKER_KEY)
-                else:
-                    current_nodes = trie.get_dst_nodes_chain(current_nodes, left_bank_consonants.keys())
-
+        elif left_bank_consonants == theory.linker_mask:
+            current_nodes = trie.get_dst_nodes_chain(current_nodes, theory.mask_keys(left_bank_consonants)) | trie.get_dst_nodes(current_nodes, TRIE_LINKER_KEY)
+        else:
+            current_nodes = trie.get_dst_nodes_chain(current_nodes, theory.mask_keys(left_bank_consonants))
+
+        if len(current_nodes) == 0:
+            return None
+
+    if vowels != 0:
+        # plover.log.debug(current_nodes)
+        # plover.log.debug(theory.mask_to_steno(vowels))
+        current_nodes = trie.get_dst_nodes(current_nodes, theory.mask_to_steno(vowels))
+        if len(current_nodes) == 0:
+            return None
+
+    if right_bank_consonants != 0:
+        # plover.log.debug(current_nodes)
+        # plover.log.debug(theory.mask_keys(right_bank_consonants))
+        if asterisk != 0:
+            for key in theory.mask_keys(right_bank_consonants):
+                current_nodes |= trie.get_dst_nodes_chain(current_nodes, theory.mask_keys(asterisk))
+                # plover.log.debug(f"\t{theory.mask_to_steno(asterisk)}\t {current_nodes}")
+                current_nodes = trie.get_dst_nodes(current_nodes, key)
+                # plover.log.debug(f"\t{key}\t {current_nodes}")
                 if len(current_nodes) == 0:
                     return None
+        else:
+            current_nodes = trie.get_dst_nodes_chain(current_nodes, theory.mask_keys(right_bank_consonants))
+            
+        if len(current_nodes) == 0:
+            return None
+
+    return TraversalFrontier(current_nodes, 0, asterisk, frontier.n_strokes + 1)
+
+def choose_translation(
+    reached_nodes: "Iterable[tuple[NondeterministicTrie[str, str], dict[int, tuple[Transition, ...]]]]",
+    n_variation: int,
+    asterisk: int,
+    theory: TheoryService,
+    translation_order: "Callable[[str], int]",
+):
+    """Picks the translation for an outline from the nodes it reached in one or more tries"""
+
+    choice = choose_translation_and_cost(reached_nodes, n_variation, asterisk, theory, translation_order)
+    return choice[0] if choice is not None else None
+
+def choose_translation_and_cost(
+    reached_nodes: "Iterable[tuple[NondeterministicTrie[str, str], dict[int, tuple[Transition, ...]]]]",
+    n_variation: int,
+    asterisk: int,
+    theory: TheoryService,
+    translation_order: "Callable[[str], int]",
+):
+    """Like `choose_translation`, but also gives the weighted cost of the cheapest path to the translation it picks"""
+
+    translation_choices, best_choices = rank_translations(reached_nodes, theory, translation_order)
+    if len(translation_choices) == 0: return None
+
+    first_choice = translation_choices[0]
+    if asterisk == 0:
+        return _nth_variation(translation_choices, n_variation)
+    else:
+        trie = best_choices[first_choice[0]][1]
+        for transition in reversed(first_choice[1][1]):
+            if trie.transition_has_key(transition, TRIE_STROKE_BOUNDARY_KEY): break
+            if not trie.transition_has_key(transition, theory.mask_to_steno(theory.asterisk_mask)): continue
 
-            if len(vowels) > 0:
-                # plover.log.debug(current_nodes)
-                # plover.log.debug(vowels.rtfcre)
-                current_nodes = trie.get_dst_nodes(current_nodes, vowels.rtfcre)
-                if len(current_nodes) == 0:
-                    return None
+            return _nth_variation(translation_choices, n_variation)
 
-            if len(right_bank_consonants) > 0:
-                # plover.log.debug(current_nodes)
-                # plover.log.debug(right_bank_consonants.keys())
-                if len(asterisk) > 0:
-                    for key in right_bank_consonants.keys():
-                        current_nodes |= trie.get_dst_nodes_chain(current_nodes, asterisk.keys())
-                        # plover.log.debug(f"\t{asterisk.rtfcre}\t {current_nodes}")
-                        current_nodes = trie.get_dst_nodes(current_nodes, key)
-                        # plover.log.debug(f"\t{key}\t {current_nodes}")
-                        if len(current_nodes) == 0:
-                            return None
-                else:
-                    current_nodes = trie.get_dst_nodes_chain(current_nodes, right_bank_consonants.keys())
-                    
-                if len(current_nodes) == 0:
-                    return None
-                
-        translation_choices = sorted(trie.get_translations_and_costs(current_nodes).items(), key=lambda cost_info: cost_info[1])
-        if len(translation_choices) == 0: return None
+    return _nth_variation(translation_choices, n_variation + 1) if len(translation_choices) > 1 else None
 
-        first_choice = translation_choices[0]
-        if len(asterisk) == 0:
-            return _nth_variation(translation_choices, n_variation)
-        else:
-            for transition in reversed(first_choice[1][1]):
-                if trie.transition_has_key(transition, TRIE_STROKE_BOUNDARY_KEY): break
-                if not trie.transition_has_key(transition, amphitheory.spec.ASTERISK_SUBSTROKE.rtfcre): continue
+def rank_translations(
+    reached_nodes: "Iterable[tuple[NondeterministicTrie[str, str], dict[int, tuple[Transition, ...]]]]",
+    theory: TheoryService,
+    translation_order: "Callable[[str], int]",
+):
+    """Orders every translation at the nodes an outline reached in one or more tries from cheapest to costliest, which
+    is the order the cycler steps through them in. Also returns the trie each translation's cheapest path is in.
 
-                return _nth_variation(translation_choices, n_variation)
+    Translations of equal cost are ordered by `translation_order`, which gives the position of each translation's first
+    entry in the dictionary. Node ids cannot break ties, since they differ between engines that split the same entries
+    into different tries.
+    """
 
-        return _nth_variation(translation_choices, n_variation + 1) if len(translation_choices) > 1 else None
+    weights = theory.transition_cost_weights()
 
-    return lookup
+    best_choices: dict[str, tuple[tuple[float, tuple[Transition, ...]], NondeterministicTrie[str, str]]] = {}
+    for trie, current_nodes in reached_nodes:
+        for translation, cost_info in trie.get_translations_and_costs(current_nodes, weights).items():
+            if translation in best_choices and best_choices[translation][0] <= cost_info: continue
+            best_choices[translation] = (cost_info, trie)
+
+    translation_choices = sorted(
+        ((translation, cost_info) for translation, (cost_info, _) in best_choices.items()),
+        key=lambda choice: (choice[1][0], translation_order(choice[0])),
+    )
+    return translation_choices, best_choices
 
 def _nth_variation(choices: list[tuple[str, tuple[float, tuple[Transition, ...]]]], n_variation: int):
     # index = n_variation % (len(choices) + 1)
     # return choices[index][0] if index != len(choices) else None
-    return choices[n_variation % len(choices)][0]
\ No newline at end of file
+    translation, (cost, _) = choices[n_variation % len(choices)]
+    return translation, cost
\ No newline at end of file
@@ -1,42 +1,52 @@
-from plover.steno import Stroke
 import plover.log
 
-from ..theory.theory import amphitheory
+from ..theory.service import TheoryService
 from ..util.Trie import NondeterministicTrie
 from ..util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY
 
 
-def create_reverse_lookup_for(trie: NondeterministicTrie[str, str]):
-    reverse_lookup = trie.build_reverse_lookup()
-    
+def create_reverse_lookup_for(trie: NondeterministicTrie[str, str], theory: TheoryService):
+    search_lazily = create_lazy_reverse_lookup_for(trie, theory)
+
     def search(translation: str):
-        valid_outlines: list[tuple[str, ...]] = []
-        
-        for seq in reverse_lookup(translation):
+        return list(search_lazily(translation))
+
+    return search
+
+def create_lazy_reverse_lookup_for(trie: NondeterministicTrie[str, str], theory: TheoryService):
+    """Like `create_reverse_lookup_for`, but the search yields each outline as soon as it finds it. Given `pause_every`, it
+    also yields None while searching, per `NondeterministicTrie.build_reverse_lookup`."""
+
+    reverse_lookup = trie.build_reverse_lookup()
+
+    def search(translation: str, pause_every: "int | None"=None):
+        for seq in reverse_lookup(translation, pause_every):
+            if seq is None:
+                yield None
+                continue
+
             outline: list[str] = []
-            latest_stroke: Stroke = Stroke.from_integer(0)
+            latest_stroke = 0
             invalid = False
             for key in seq:
                 if key == TRIE_STROKE_BOUNDARY_KEY:
-                    outline.append(latest_stroke.rtfcre)
-                    latest_stroke = Stroke.from_integer(0)
+                    outline.append(theory.mask_to_steno(latest_stroke))
+                    latest_stroke = 0
                     continue
 
                 if key == TRIE_LINKER_KEY:
-                    key_stroke = amphitheory.spec.LINKER_CHORD
+                    key_stroke = theory.linker_mask
                 else: 
-                    key_stroke = Stroke.from_steno(key)
+                    key_stroke = theory.steno_to_mask(key)
 
-                if amphitheory.can_add_stroke_on(latest_stroke, key_stroke):
-                    latest_stroke += key_stroke
+                if theory.can_add_mask_on(latest_stroke, key_stroke):
+                    latest_stroke |= key_stroke
                 else:
                     invalid = True
                     break
 
             if not invalid:
-                outline.append(latest_stroke.rtfcre)
-                valid_outlines.append(tuple(outline))
+                outline.append(theory.mask_to_steno(latest_stroke))
+                yield tuple(outline)
 
-        return valid_outlines
-    
     return search
\ No newline at end of file
@@ -1,19 +1,49 @@
-from typing import Optional
+from typing import Iterable, NamedTuple, Optional, TYPE_CHECKING
 
 import plover.log
 
 from ...util.Trie import TransitionCostInfo, NondeterministicTrie
 from ...util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY
-from ...theory.theory import amphitheory
+from ...theory.service import TheoryService
 
 from .state import EntryBuilderState, OutlineSounds
+from .profiler import BuildProfiler, profiled_rule
+from .budget import BudgetedTrie, ExpansionBudget
 from .find_clusters import Cluster, handle_clusters
 from .rules.left_consonants import add_left_consonant
 from .rules.right_consonants import add_right_consonant
 
-def add_entry(trie: NondeterministicTrie[str, str], phonemes: OutlineSounds, translation: str):
-    state = EntryBuilderState(trie, phonemes, translation)
+if TYPE_CHECKING:
+    from threading import Event
+
+def add_entry(
+    trie: NondeterministicTrie[str, str],
+    phonemes: OutlineSounds,
+    translations: tuple[str, ...],
+    theory: TheoryService,
+    profiler: "BuildProfiler | None"=None,
+    budget: "ExpansionBudget | None"=None,
+):
+    """Adds the paths for `phonemes` to the trie, labeling them with every translation in `translations` at once.
+    
+    Returns the number of transitions that were not added because they would exceed `budget`.
+    """
+
+    entry_trie = trie if budget is None else BudgetedTrie(trie, budget, theory.transition_cost_weights())
+
+    state = EntryBuilderState(entry_trie, phonemes, translations, theory, profiler)
     state.left_consonant_src_node = trie.ROOT
+    _add_entry(state)
+
+    return entry_trie.n_declined_transitions if isinstance(entry_trie, BudgetedTrie) else 0
+
+# Vowels, linkers, and stroke boundaries are attributed to this rule since they are added here directly
+@profiled_rule("entry")
+def _add_entry(state: EntryBuilderState):
+    trie = state.trie
+    phonemes = state.phonemes
+    translations = state.translations
+    theory = state.theory
 
 
     upcoming_clusters: dict[tuple[int, int], list[Cluster]] = {}
@@ -23,7 +53,7 @@ def add_entry(trie: NondeterministicTrie[str, str], phonemes: OutlineSounds, tra
 
         vowels_src_node: Optional[int] = None
         if len(consonants) == 0 and not state.is_first_consonant_set:
-            vowels_src_node = trie.get_first_dst_node_else_create(state.left_consonant_src_node, TRIE_LINKER_KEY, TransitionCostInfo(0, translation))
+            vowels_src_node = trie.get_first_dst_node_else_create(state.left_consonant_src_node, TRIE_LINKER_KEY, TransitionCostInfo(theory.spec.TransitionCategories.NONE, translations))
 
         for phoneme_index, consonant in enumerate(consonants):
             state.phoneme_index = phoneme_index
@@ -53,16 +83,16 @@ def add_entry(trie: NondeterministicTrie[str, str], phonemes: OutlineSounds, tra
         # if it matches verbatim
         if vowels_src_node is None:
             vowels_src_node = state.left_consonant_src_node
-        postvowels_node = trie.get_first_dst_node_else_create(vowels_src_node, amphitheory.spec.PHONEMES_TO_CHORDS_VOWELS[vowel.phoneme].rtfcre, TransitionCostInfo(0, translation))
+        postvowels_node = trie.get_first_dst_node_else_create(vowels_src_node, theory.vowel_chords[vowel.phoneme].rtfcre, TransitionCostInfo(theory.spec.TransitionCategories.NONE, translations))
 
         handle_clusters(upcoming_clusters, state.left_consonant_src_node, state.right_consonant_src_node, state, True)
 
 
         state.right_consonant_src_node = postvowels_node
-        state.left_consonant_src_node = trie.get_first_dst_node_else_create(postvowels_node, TRIE_STROKE_BOUNDARY_KEY, TransitionCostInfo(0, translation))
+        state.left_consonant_src_node = trie.get_first_dst_node_else_create(postvowels_node, TRIE_STROKE_BOUNDARY_KEY, TransitionCostInfo(theory.spec.TransitionCategories.NONE, translations))
 
-        if amphitheory.spec.INITIAL_VOWEL_CHORD is not None and state.is_first_consonant_set and len(consonants) == 0:
-            trie.link_chain(trie.ROOT, state.left_consonant_src_node, amphitheory.spec.INITIAL_VOWEL_CHORD.keys(), TransitionCostInfo(0, translation))
+        if theory.spec.INITIAL_VOWEL_CHORD is not None and state.is_first_consonant_set and len(consonants) == 0:
+            trie.link_chain(trie.ROOT, state.left_consonant_src_node, theory.spec.INITIAL_VOWEL_CHORD.keys(), TransitionCostInfo(theory.spec.TransitionCategories.NONE, translations))
 
         state.prev_left_consonant_node = None
 
@@ -84,4 +114,106 @@ def add_entry(trie: NondeterministicTrie[str, str], phonemes: OutlineSounds, tra
         # The outline contains no vowels and is likely a brief
         return
 
-    trie.set_translation(state.right_consonant_src_node, translation)
+    for translation in translations:
+        trie.set_translation(state.right_consonant_src_node, translation)
+
+
+class EntryBatchStats(NamedTuple):
+    n_entries: int
+    """Number of entries received"""
+    n_groups: int
+    """Number of distinct phoneme signatures, i.e., the number of times the rules were run"""
+    n_duplicate_hits: int
+    """Number of entries skipped because an entry with the same phonemes and translation was already seen"""
+    n_homophone_hits: int
+    """Number of entries whose translation was attached to an already-seen phoneme signature"""
+    n_budget_capped: int
+    """Number of phoneme groups for which some paths were not added because they exceeded the expansion budget"""
+
+class BuildCancelledError(Exception):
+    """Raised when a build is cancelled partway through"""
+
+
+def add_entries(
+    trie: NondeterministicTrie[str, str],
+    entries: Iterable[tuple[OutlineSounds, str]],
+    theory: TheoryService,
+    profiler: "BuildProfiler | None"=None,
+    budget: "ExpansionBudget | None"=None,
+    cancel_event: "Event | None"=None,
+):
+    """Adds entries to the trie, running the rules once per distinct phoneme signature.
+    
+    Raises `BuildCancelledError` if `cancel_event` is set before all entries have been added.
+    """
+
+    groups = group_entries(entries, cancel_event)
+    # Value ids break ties between equally costly translations, so they follow the order of the entries
+    trie.add_values(groups.translation_order)
+    n_budget_capped = add_entry_groups(trie, groups.groups.values(), theory, profiler, budget, cancel_event)
+
+    return EntryBatchStats(groups.n_entries, len(groups.groups), groups.n_duplicate_hits, groups.n_homophone_hits, n_budget_capped)
+
+
+class EntryGroups(NamedTuple):
+    groups: dict[tuple, tuple[OutlineSounds, dict[str, None]]]
+    """Mapping from each phoneme signature to the first outline seen with it and the (ordered) set of its translations"""
+    n_entries: int
+    n_duplicate_hits: int
+    n_homophone_hits: int
+    translation_order: dict[str, int]
+    """Index of each translation's first entry among the translations, which orders translations of equal cost"""
+
+def group_entries(entries: Iterable[tuple[OutlineSounds, str]], cancel_event: "Event | None"=None):
+    """Groups entries by phoneme signature, since entries with equal signatures build identical paths"""
+
+    groups: dict[tuple, tuple[OutlineSounds, dict[str, None]]] = {}
+    translation_order: dict[str, int] = {}
+    n_entries = 0
+    n_duplicate_hits = 0
+    n_homophone_hits = 0
+
+    for phonemes, translation in entries:
+        if cancel_event is not None and cancel_event.is_set(): raise BuildCancelledError
+
+        n_entries += 1
+        if translation not in translation_order:
+            translation_order[translation] = len(translation_order)
+
+        signature = phonemes.signature()
+        group = groups.get(signature)
+        if group is None:
+            groups[signature] = (phonemes, {translation: None})
+            continue
+
+        translations = group[1]
+        if translation in translations:
+            n_duplicate_hits += 1
+            continue
+        
+        translations[translation] = None
+        n_homophone_hits += 1
+
+    return EntryGroups(groups, n_entries, n_duplicate_hits, n_homophone_hits, translation_order)
+
+def add_entry_groups(
+    trie: NondeterministicTrie[str, str],
+    groups: Iterable[tuple[OutlineSounds, dict[str, None]]],
+    theory: TheoryService,
+    profiler: "BuildProfiler | None"=None,
+    budget: "ExpansionBudget | None"=None,
+    cancel_event: "Event | None"=None,
+):
+    """Adds grouped entries to the trie. Returns the number of groups that reached the expansion budget."""
+
+    n_budget_capped = 0
+    for phonemes, translations in groups:
+        if cancel_event is not None and cancel_event.is_set(): raise BuildCancelledError
+
+        n_declined_transitions = add_entry(trie, phonemes, tuple(translations), theory, profiler, budget)
+        if n_declined_transitions == 0: continue
+
+        n_budget_capped += 1
+        plover.log.debug(f"expansion budget reached for {', '.join(translations)}: {n_declined_transitions:,} transitions not added")
+
+    return n_budget_capped
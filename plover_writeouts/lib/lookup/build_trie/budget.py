@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Generic, TypeVar
+
+from ...util.Trie import NondeterministicTrie, TransitionCostInfo, TransitionCategoryCounts, NO_TRANSITION_COST
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+@dataclass(frozen=True)
+class ExpansionBudget:
+    """Limits on how expensive the paths built for a single entry may become"""
+
+    max_cost: "float | None" = None
+    """Maximum accumulated transition cost of any path, using the transition cost weights at build time"""
+    max_abbreviation_steps: "int | None" = None
+    """Maximum number of abbreviations (elisions, clusters, alternate chords) on any path"""
+
+    def allows(self, cost: TransitionCategoryCounts, weights: tuple[float, ...]):
+        return (
+            (self.max_cost is None or cost.weighted(weights) <= self.max_cost)
+            and (self.max_abbreviation_steps is None or cost.n_steps <= self.max_abbreviation_steps)
+        )
+
+
+class BudgetedTrie(Generic[K, V]):
+    """Wraps a trie while a single entry is being added, declining to add transitions that would put every path through
+    them over the entry's budget.
+
+    The cost of reaching a node is the cheapest cost known when a transition out of it is added. Rules add an entry's
+    cheapest paths first, so this is exact in practice. Transitions may only start from nodes this entry has reached.
+
+    Declined `get_first_dst_node_else_create*` calls return None. Transitions that add no cost are never declined, since
+    every node the entry reaches is within its budget.
+    """
+
+    def __init__(self, trie: NondeterministicTrie[K, V], budget: ExpansionBudget, weights: tuple[float, ...]):
+        self.trie = trie
+        self.budget = budget
+        self.weights = weights
+        self.ROOT = trie.ROOT
+
+        self.__node_costs: dict[int, TransitionCategoryCounts] = {trie.ROOT: NO_TRANSITION_COST}
+        """Mapping from each node reached by this entry to the category counts of its cheapest known path"""
+        self.n_declined_transitions = 0
+
+    def can_afford(self, src_node: int, cost: TransitionCategoryCounts):
+        return self.budget.allows(self.__node_cost(src_node) + cost, self.weights)
+
+    def __node_cost(self, node: int):
+        cost = self.__node_costs.get(node)
+        if cost is None:
+            raise ValueError(f"node {node} has not been reached by the entry being added, so its cost is unknown")
+        return cost
+
+    def __reach(self, src_node: int, dst_node: int, cost: TransitionCategoryCounts):
+        dst_cost = self.__node_cost(src_node) + cost
+        if dst_node not in self.__node_costs or self.__is_cheaper(dst_cost, self.__node_costs[dst_node]):
+            self.__node_costs[dst_node] = dst_cost
+
+    def __is_cheaper(self, a: TransitionCategoryCounts, b: TransitionCategoryCounts):
+        return (a.weighted(self.weights), a.n_steps) < (b.weighted(self.weights), b.n_steps)
+
+    def __decline_if_unaffordable(self, src_node: int, cost_info: TransitionCostInfo[V]):
+        if self.can_afford(src_node, cost_info.cost):
+            return False
+
+        self.n_declined_transitions += 1
+        return True
+
+    @property
+    def n_nodes(self):
+        return self.trie.n_nodes
+
+    @property
+    def n_transitions(self):
+        return self.trie.n_transitions
+
+    @property
+    def n_cost_labels(self):
+        return self.trie.n_cost_labels
+
+    def get_first_dst_node_else_create(self, src_node: int, key: K, cost_info: TransitionCostInfo[V]) -> "int | None":
+        if self.__decline_if_unaffordable(src_node, cost_info): return None
+
+        dst_node = self.trie.get_first_dst_node_else_create(src_node, key, cost_info)
+        self.__reach(src_node, dst_node, cost_info.cost)
+        return dst_node
+
+    def get_first_dst_node_else_create_chain(self, src_node: int, keys: tuple[K, ...], cost_info: TransitionCostInfo[V]) -> "int | None":
+        if self.__decline_if_unaffordable(src_node, cost_info): return None
+
+        dst_node = self.trie.get_first_dst_node_else_create_chain(src_node, keys, cost_info)
+        self.__reach(src_node, dst_node, cost_info.cost)
+        return dst_node
+
+    def link(self, src_node: int, dst_node: int, key: K, cost_info: TransitionCostInfo[V]):
+        if self.__decline_if_unaffordable(src_node, cost_info): return
+
+        self.trie.link(src_node, dst_node, key, cost_info)
+        self.__reach(src_node, dst_node, cost_info.cost)
+
+    def link_chain(self, src_node: int, dst_node: int, keys: tuple[K, ...], cost_info: TransitionCostInfo[V]):
+        if self.__decline_if_unaffordable(src_node, cost_info): return
+
+        self.trie.link_chain(src_node, dst_node, keys, cost_info)
+        self.__reach(src_node, dst_node, cost_info.cost)
+
+    def set_translation(self, node: int, translation: V):
+        self.trie.set_translation(node, translation)
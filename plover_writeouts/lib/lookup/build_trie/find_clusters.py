@@ -6,10 +6,10 @@ from typing import Any
 from plover.steno import Stroke
 
 from .state import EntryBuilderState, OutlineSounds
+from .profiler import profiled_rule
 from .rules.elision import allow_elide_previous_vowel_using_first_left_consonant, allow_elide_previous_vowel_using_first_right_consonant
 from ...util.Trie import NondeterministicTrie, TransitionCostInfo, ReadonlyTrie
-from ...theory.theory import amphitheory
-from ...stenophoneme.Stenophoneme import Stenophoneme, vowel_phonemes
+from ...stenophoneme.Stenophoneme import ANY_VOWEL_CODE, IS_VOWEL_CODE
 
 @dataclass(frozen=True)
 class Cluster(ABC):
@@ -17,30 +17,30 @@ class Cluster(ABC):
     initial_state: EntryBuilderState
 
     @abstractmethod
-    def apply(self, trie: NondeterministicTrie[str, str], translation: str, current_left: "int | None", current_right: "int | None"):
+    def apply(self, trie: NondeterministicTrie[str, str], translations: tuple[str, ...], current_left: "int | None", current_right: "int | None"):
         ...
 
 @dataclass(frozen=True)
 class _ClusterLeft(Cluster):
-    def apply(self, trie: NondeterministicTrie[str, str], translation: str, current_left: "int | None", current_right: "int | None"):
+    def apply(self, trie: NondeterministicTrie[str, str], translations: tuple[str, ...], current_left: "int | None", current_right: "int | None"):
         if current_left is None: return
 
         if self.initial_state.left_consonant_src_node is not None:
-            trie.link_chain(self.initial_state.left_consonant_src_node, current_left, self.stroke.keys(), TransitionCostInfo(amphitheory.spec.TransitionCosts.CLUSTER, translation))
+            trie.link_chain(self.initial_state.left_consonant_src_node, current_left, self.stroke.keys(), TransitionCostInfo(self.initial_state.theory.spec.TransitionCategories.CLUSTER, translations))
 
         if self.initial_state.can_elide_prev_vowel_left:
-            allow_elide_previous_vowel_using_first_left_consonant(self.initial_state, self.stroke, current_left, amphitheory.spec.TransitionCosts.CLUSTER)
+            allow_elide_previous_vowel_using_first_left_consonant(self.initial_state, self.stroke, current_left, self.initial_state.theory.spec.TransitionCategories.CLUSTER)
 
 @dataclass(frozen=True)
 class _ClusterRight(Cluster):
-    def apply(self, trie: NondeterministicTrie[str, str], translation: str, current_left: "int | None", current_right: "int | None"):
+    def apply(self, trie: NondeterministicTrie[str, str], translations: tuple[str, ...], current_left: "int | None", current_right: "int | None"):
         if current_right is None: return
 
         if self.initial_state.right_consonant_src_node is not None:
-            trie.link_chain(self.initial_state.right_consonant_src_node, current_right, self.stroke.keys(), TransitionCostInfo(amphitheory.spec.TransitionCosts.CLUSTER, translation))
+            trie.link_chain(self.initial_state.right_consonant_src_node, current_right, self.stroke.keys(), TransitionCostInfo(self.initial_state.theory.spec.TransitionCategories.CLUSTER, translations))
 
         if self.initial_state.is_first_consonant:
-            allow_elide_previous_vowel_using_first_right_consonant(self.initial_state, self.stroke, current_right, amphitheory.spec.TransitionCosts.CLUSTER)
+            allow_elide_previous_vowel_using_first_right_consonant(self.initial_state, self.stroke, current_right, self.initial_state.theory.spec.TransitionCategories.CLUSTER)
 
         # if origin.right_f is not None and right_consonant_f_node is not None:
         #     trie.link_chain(origin.right_f, right_consonant_f_node, cluster_stroke.keys(), TransitionCosts.CLUSTER, translation)
@@ -57,14 +57,14 @@ def _find_clusters(
 
     state: EntryBuilderState,
 ):
-    current_head = amphitheory.clusters_trie.ROOT
+    current_head = state.theory.clusters_trie.ROOT
     current_index = (start_group_index, start_phoneme_index)
     while current_head is not None and current_index is not None:
-        current_head = amphitheory.clusters_trie.get_dst_node(current_head, sounds.get_consonant(*current_index).phoneme)
+        current_head = state.theory.clusters_trie.get_dst_node(current_head, sounds.get_consonant(*current_index).phoneme)
 
         if current_head is None: return
 
-        if (result := _get_clusters_from_node(current_head, current_index, amphitheory.clusters_trie, state)) is not None:
+        if (result := _get_clusters_from_node(current_head, current_index, state.theory.clusters_trie, state)) is not None:
             yield result
 
         current_index = sounds.increment_consonant_index(*current_index)
@@ -76,22 +76,22 @@ def _find_vowel_clusters(
 
     state: EntryBuilderState,
 ):
-    current_nodes = {amphitheory.vowel_clusters_trie.ROOT}
+    current_nodes = {state.theory.vowel_clusters_trie.ROOT}
     current_index = (start_group_index, start_phoneme_index)
     while current_nodes is not None and current_index is not None:
         sound = sounds[current_index]
         current_nodes = {
             node
             for current_node in current_nodes
-            for node in (amphitheory.vowel_clusters_trie.get_dst_node(current_node, sound.phoneme),)
-                    + ((amphitheory.vowel_clusters_trie.get_dst_node(current_node, Stenophoneme.ANY_VOWEL),) if sound.phoneme in vowel_phonemes else ())
+            for node in (state.theory.vowel_clusters_trie.get_dst_node(current_node, sound.phoneme),)
+                    + ((state.theory.vowel_clusters_trie.get_dst_node(current_node, ANY_VOWEL_CODE),) if IS_VOWEL_CODE[sound.phoneme] else ())
             if node is not None
         }
 
         if len(current_nodes) == 0: return
 
         for current_node in current_nodes:
-            if (result := _get_clusters_from_node(current_node, current_index, amphitheory.vowel_clusters_trie, state)) is None:
+            if (result := _get_clusters_from_node(current_node, current_index, state.theory.vowel_clusters_trie, state)) is None:
                 continue
 
             yield result
@@ -108,12 +108,13 @@ def _get_clusters_from_node(
     stroke = clusters_trie.get_translation(node)
     if stroke is None: return None
 
-    if len(stroke & amphitheory.spec.LEFT_BANK_CONSONANTS_SUBSTROKE) > 0:
+    if int(stroke) & state.theory.left_bank_mask != 0:
         return current_index, _ClusterLeft(stroke, dataclasses.replace(state))
     else:
         return current_index, _ClusterRight(stroke, dataclasses.replace(state))
     
 
+@profiled_rule("clusters")
 def handle_clusters(
     upcoming_clusters: dict[tuple[int, int], list[Cluster]],
     left_consonant_node: "int | None",
@@ -131,4 +132,4 @@ def handle_clusters(
 
     if (state.group_index, state.phoneme_index) in upcoming_clusters:
         for cluster in upcoming_clusters[state.group_index, state.phoneme_index]:
-            cluster.apply(state.trie, state.translation, left_consonant_node, right_consonant_node)
\ No newline at end of file
+            cluster.apply(state.trie, state.translations, left_consonant_node, right_consonant_node)
\ No newline at end of file
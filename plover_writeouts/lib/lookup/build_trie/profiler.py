@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from functools import wraps
+import heapq
+import inspect
+from time import perf_counter
+from typing import Any, Callable, TypeVar, TYPE_CHECKING
+
+from ...util.Trie import NondeterministicTrie
+
+if TYPE_CHECKING:
+    from .state import EntryBuilderState
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+@dataclass
+class RuleStats:
+    n_calls: int = 0
+    wall_time: float = 0
+    """Seconds spent in the rule itself, excluding nested rules"""
+    n_nodes: int = 0
+    """Trie nodes created by the rule itself"""
+    n_transitions: int = 0
+    """Trie transitions added by the rule itself"""
+    n_cost_labels: int = 0
+    """New (transition, translation) cost labels written by the rule itself"""
+
+    def add(self, wall_time: float, n_nodes: int, n_transitions: int, n_cost_labels: int):
+        self.n_calls += 1
+        self.wall_time += wall_time
+        self.n_nodes += n_nodes
+        self.n_transitions += n_transitions
+        self.n_cost_labels += n_cost_labels
+
+@dataclass(frozen=True)
+class EntryStats:
+    translations: tuple[str, ...]
+    wall_time: float
+    n_nodes: int
+    n_transitions: int
+    n_cost_labels: int
+
+
+class BuildProfiler:
+    """Attributes build time and trie growth to the theory rules that caused them.
+
+    Measurements are exclusive: time and growth inside a nested rule (e.g., vowel elision called from a left consonant rule)
+    count only toward the nested rule.
+    """
+
+    def __init__(self, n_top_entries: int=20):
+        self.rule_stats: dict[str, RuleStats] = {}
+        self.n_top_entries = n_top_entries
+        self.__top_entries: list[tuple[float, int, EntryStats]] = []
+        """Min-heap of the most expensive entries by wall time"""
+        self.__n_entries = 0
+
+        self.__frames: list[list[Any]] = []
+        """Stack of [start time, start nodes, start transitions, start cost labels, then the same four totals for nested rules]"""
+
+    def enter(self, trie: NondeterministicTrie[str, str]):
+        self.__frames.append([perf_counter(), trie.n_nodes, trie.n_transitions, trie.n_cost_labels, 0, 0, 0, 0])
+
+    def exit(self, trie: NondeterministicTrie[str, str], rule_name: str, translations: tuple[str, ...]):
+        start_time, start_nodes, start_transitions, start_cost_labels, child_time, child_nodes, child_transitions, child_cost_labels = self.__frames.pop()
+
+        wall_time = perf_counter() - start_time
+        n_nodes = trie.n_nodes - start_nodes
+        n_transitions = trie.n_transitions - start_transitions
+        n_cost_labels = trie.n_cost_labels - start_cost_labels
+
+        if rule_name not in self.rule_stats:
+            self.rule_stats[rule_name] = RuleStats()
+        self.rule_stats[rule_name].add(wall_time - child_time, n_nodes - child_nodes, n_transitions - child_transitions, n_cost_labels - child_cost_labels)
+
+        if len(self.__frames) > 0:
+            parent = self.__frames[-1]
+            parent[4] += wall_time
+            parent[5] += n_nodes
+            parent[6] += n_transitions
+            parent[7] += n_cost_labels
+            return
+
+        self.__record_entry(EntryStats(translations, wall_time, n_nodes, n_transitions, n_cost_labels))
+
+    def __record_entry(self, entry: EntryStats):
+        self.__n_entries += 1
+        heap_item = (entry.wall_time, self.__n_entries, entry)
+        if len(self.__top_entries) < self.n_top_entries:
+            heapq.heappush(self.__top_entries, heap_item)
+        else:
+            heapq.heappushpop(self.__top_entries, heap_item)
+
+    @property
+    def top_entries(self):
+        return tuple(entry for _, _, entry in sorted(self.__top_entries, reverse=True))
+
+    def report(self):
+        lines: list[str] = [f"build profile ({self.__n_entries:,} entries)"]
+
+        lines.append(f"""\t{"rule":<24}{"calls":>10}{"time (ms)":>12}{"nodes":>10}{"transitions":>13}{"cost labels":>13}""")
+        for rule_name, stats in sorted(self.rule_stats.items(), key=lambda item: item[1].wall_time, reverse=True):
+            lines.append(f"""\t{rule_name:<24}{stats.n_calls:>10,}{stats.wall_time * 1000:>12,.1f}{stats.n_nodes:>10,}{stats.n_transitions:>13,}{stats.n_cost_labels:>13,}""")
+
+        lines.append(f"most expensive entries")
+        for entry in self.top_entries:
+            lines.append(f"""\t{" | ".join(entry.translations)}: {entry.wall_time * 1000:,.2f} ms, {entry.n_nodes:,} nodes, {entry.n_transitions:,} transitions, {entry.n_cost_labels:,} cost labels""")
+
+        return "\n".join(lines)
+
+
+def profiled_rule(rule_name: str):
+    """Measures calls to the decorated rule with the entry's `BuildProfiler`, if it has one. The rule must take a parameter named `state`."""
+
+    def decorator(fn: F) -> F:
+        state_arg_index = tuple(inspect.signature(fn).parameters).index("state")
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            state: "EntryBuilderState" = args[state_arg_index] if state_arg_index < len(args) else kwargs["state"]
+            if state.profiler is None:
+                return fn(*args, **kwargs)
+
+            state.profiler.enter(state.trie)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                state.profiler.exit(state.trie, rule_name, state.translations)
+
+        return wrapper # type: ignore
+
+    return decorator
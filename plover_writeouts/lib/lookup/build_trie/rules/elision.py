@@ -1,19 +1,22 @@
 from plover.steno import Stroke
 
 from ....util.Trie import TransitionCostInfo
-from ....theory.theory import amphitheory
+from ....theory.spec import TheorySpec
 from ..state import EntryBuilderState
+from ..profiler import profiled_rule
 
-def allow_elide_previous_vowel_using_first_left_consonant(state: EntryBuilderState, phoneme_substroke: Stroke, left_consonant_node: int, additional_cost=0, allow_boundary_elision=True):
+@profiled_rule("left_vowel_elision")
+def allow_elide_previous_vowel_using_first_left_consonant(state: EntryBuilderState, phoneme_substroke: Stroke, left_consonant_node: int, additional_cost=TheorySpec.TransitionCategories.NONE, allow_boundary_elision=True):
     # Elide a vowel by attaching a new left consonant to the previous left consonant
     if state.left_elision_squish_src_node is not None:
-        state.trie.link_chain(state.left_elision_squish_src_node, left_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(amphitheory.spec.TransitionCosts.VOWEL_ELISION + additional_cost, state.translation))
+        state.trie.link_chain(state.left_elision_squish_src_node, left_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(state.theory.spec.TransitionCategories.VOWEL_ELISION + additional_cost, state.translations))
 
     # Elide a vowel by placing the left consonant after a right consonant
     if state.left_elision_boundary_src_node is not None and allow_boundary_elision:
-        state.trie.link_chain(state.left_elision_boundary_src_node, left_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(amphitheory.spec.TransitionCosts.VOWEL_ELISION + additional_cost, state.translation))
+        state.trie.link_chain(state.left_elision_boundary_src_node, left_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(state.theory.spec.TransitionCategories.VOWEL_ELISION + additional_cost, state.translations))
 
-def allow_elide_previous_vowel_using_first_right_consonant(state: EntryBuilderState, phoneme_substroke: Stroke, right_consonant_node: int, additional_cost=0):
+@profiled_rule("right_vowel_elision")
+def allow_elide_previous_vowel_using_first_right_consonant(state: EntryBuilderState, phoneme_substroke: Stroke, right_consonant_node: int, additional_cost=TheorySpec.TransitionCategories.NONE):
     if state.right_elision_squish_src_node is not None:
-        state.trie.link_chain(state.right_elision_squish_src_node, right_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(amphitheory.spec.TransitionCosts.VOWEL_ELISION + additional_cost, state.translation))
+        state.trie.link_chain(state.right_elision_squish_src_node, right_consonant_node, phoneme_substroke.keys(), TransitionCostInfo(state.theory.spec.TransitionCategories.VOWEL_ELISION + additional_cost, state.translations))
 
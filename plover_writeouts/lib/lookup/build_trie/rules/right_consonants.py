@@ -4,42 +4,44 @@ import plover.log
 
 from ....util.Trie import TransitionCostInfo
 from ....util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY
-from ....theory.theory import Stenophoneme, amphitheory
+from ....stenophoneme.Stenophoneme import DUMMY_CODE
 
 from ..state import EntryBuilderState
+from ..profiler import profiled_rule
 from .elision import allow_elide_previous_vowel_using_first_right_consonant
 
 
+@profiled_rule("right_consonant")
 def add_right_consonant(state: EntryBuilderState, left_consonant_node: Optional[int]):
-    if state.right_consonant_src_node is None or state.consonant.phoneme not in amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT:
+    if state.right_consonant_src_node is None or state.theory.right_chords[state.consonant.phoneme] is None:
         return None, None, None
     
 
-    right_stroke = amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT[state.consonant.phoneme]
+    right_stroke = state.theory.right_consonant_chord(state.consonant)
     right_stroke_keys = right_stroke.keys()
     
-    right_consonant_node = state.trie.get_first_dst_node_else_create_chain(state.right_consonant_src_node, right_stroke_keys, TransitionCostInfo(0, state.translation))
+    right_consonant_node = state.trie.get_first_dst_node_else_create_chain(state.right_consonant_src_node, right_stroke_keys, TransitionCostInfo(state.theory.spec.TransitionCategories.NONE, state.translations))
 
 
     if state.last_right_alt_consonant_node is not None:
-        state.trie.link_chain(state.last_right_alt_consonant_node, right_consonant_node, right_stroke_keys, TransitionCostInfo(amphitheory.spec.TransitionCosts.VOWEL_ELISION if state.is_first_consonant else 0, state.translation))
+        state.trie.link_chain(state.last_right_alt_consonant_node, right_consonant_node, right_stroke_keys, TransitionCostInfo(state.theory.spec.TransitionCategories.VOWEL_ELISION if state.is_first_consonant else state.theory.spec.TransitionCategories.NONE, state.translations))
 
     # Skeletals and right-bank consonant addons
     can_use_main_prev = (
         state.last_consonant is None
-        or state.last_consonant.phoneme in amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT and amphitheory.can_add_stroke_on(amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT[state.last_consonant.phoneme], right_stroke)
+        or (last_right_mask := state.theory.right_chord_masks[state.last_consonant.phoneme]) is not None and state.theory.can_add_mask_on(last_right_mask, int(right_stroke))
     )
     if state.prev_left_consonant_node is not None and not can_use_main_prev:
-        state.trie.link_chain(state.prev_left_consonant_node, right_consonant_node, right_stroke_keys, TransitionCostInfo(0, state.translation))
+        state.trie.link_chain(state.prev_left_consonant_node, right_consonant_node, right_stroke_keys, TransitionCostInfo(state.theory.spec.TransitionCategories.NONE, state.translations))
 
 
     pre_rtl_stroke_boundary_node = state.right_elision_squish_src_node
     rtl_stroke_boundary_node = None
 
-    if left_consonant_node is not None and state.consonant.phoneme is not Stenophoneme.DUMMY:
+    if left_consonant_node is not None and state.consonant.phoneme != DUMMY_CODE:
         pre_rtl_stroke_boundary_node = right_consonant_node
-        rtl_stroke_boundary_node = state.trie.get_first_dst_node_else_create(right_consonant_node, TRIE_STROKE_BOUNDARY_KEY, TransitionCostInfo(0, state.translation))
-        state.trie.link(rtl_stroke_boundary_node, left_consonant_node, TRIE_LINKER_KEY, TransitionCostInfo(0, state.translation))
+        rtl_stroke_boundary_node = state.trie.get_first_dst_node_else_create(right_consonant_node, TRIE_STROKE_BOUNDARY_KEY, TransitionCostInfo(state.theory.spec.TransitionCategories.NONE, state.translations))
+        state.trie.link(rtl_stroke_boundary_node, left_consonant_node, TRIE_LINKER_KEY, TransitionCostInfo(state.theory.spec.TransitionCategories.NONE, state.translations))
         
 
     if state.is_first_consonant:
@@ -51,45 +53,40 @@ def add_right_consonant(state: EntryBuilderState, left_consonant_node: Optional[
     rtl_stroke_boundary_adjacent_nodes = (pre_rtl_stroke_boundary_node, rtl_stroke_boundary_node)
     return right_consonant_node, right_consonant_f_node, rtl_stroke_boundary_adjacent_nodes if rtl_stroke_boundary_node is not None else None
 
+@profiled_rule("right_alt_consonant")
 def _add_right_alt_consonant(state: EntryBuilderState, right_consonant_node: int):
-    if state.right_consonant_src_node is None or state.consonant.phoneme not in amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT_ALT:
+    right_alt_stroke = state.theory.right_alt_chords[state.consonant.phoneme]
+    if state.right_consonant_src_node is None or right_alt_stroke is None:
         return None
     
-    right_alt_stroke = amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT_ALT[state.consonant.phoneme]
-    right_stroke = amphitheory.right_consonant_chord(state.consonant)
+    eligibility = state.theory.right_alt_chord_eligibility(state.consonant, state.last_consonant, state.next_consonant)
+    if eligibility is None:
+        return None
 
-    should_use_alt_from_prev = (
-        state.last_consonant is None
-        or state.last_consonant.phoneme in amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT and (
-            amphitheory.can_add_stroke_on(amphitheory.right_consonant_chord(state.last_consonant), right_stroke)
-            or not amphitheory.can_add_stroke_on(amphitheory.right_consonant_chord(state.last_consonant), right_alt_stroke)
-        )
-    )
-    should_use_alt_from_next = (
-        state.next_consonant is None
-        or state.next_consonant.phoneme in amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT and (
-            amphitheory.can_add_stroke_on(right_stroke, amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT[state.next_consonant.phoneme])
-            or not amphitheory.can_add_stroke_on(right_alt_stroke, amphitheory.spec.PHONEMES_TO_CHORDS_RIGHT[state.next_consonant.phoneme])
-        )
-    )
+    should_use_alt_from_prev, should_use_alt_from_next = eligibility
     if should_use_alt_from_prev and should_use_alt_from_next:
         return None
+    
 
 
     right_alt_stroke_keys = right_alt_stroke.keys()
 
 
-    right_alt_consonant_node = state.trie.get_first_dst_node_else_create_chain(state.right_consonant_src_node, right_alt_stroke_keys, TransitionCostInfo(amphitheory.spec.TransitionCosts.ALT_CONSONANT, state.translation))
+    right_alt_consonant_node = state.trie.get_first_dst_node_else_create_chain(state.right_consonant_src_node, right_alt_stroke_keys, TransitionCostInfo(state.theory.spec.TransitionCategories.ALT_CONSONANT, state.translations))
+    # Over the entry's expansion budget
+    if right_alt_consonant_node is None:
+        return None
+
     if state.last_right_alt_consonant_node is not None:
         state.trie.link_chain(
             state.last_right_alt_consonant_node, right_alt_consonant_node, right_alt_stroke_keys,
-            TransitionCostInfo(amphitheory.spec.TransitionCosts.ALT_CONSONANT + (amphitheory.spec.TransitionCosts.VOWEL_ELISION if state.is_first_consonant else 0), state.translation)
+            TransitionCostInfo(state.theory.spec.TransitionCategories.ALT_CONSONANT + (state.theory.spec.TransitionCategories.VOWEL_ELISION if state.is_first_consonant else state.theory.spec.TransitionCategories.NONE), state.translations)
         )
 
     if state.prev_left_consonant_node is not None and not should_use_alt_from_prev:
-        state.trie.link_chain(state.prev_left_consonant_node, right_alt_consonant_node, right_alt_stroke_keys, TransitionCostInfo(0, state.translation))
+        state.trie.link_chain(state.prev_left_consonant_node, right_alt_consonant_node, right_alt_stroke_keys, TransitionCostInfo(state.theory.spec.TransitionCategories.NONE, state.translations))
         
     if state.is_first_consonant:
-        allow_elide_previous_vowel_using_first_right_consonant(state, right_alt_stroke, right_consonant_node, amphitheory.spec.TransitionCosts.ALT_CONSONANT)
+        allow_elide_previous_vowel_using_first_right_consonant(state, right_alt_stroke, right_consonant_node, state.theory.spec.TransitionCategories.ALT_CONSONANT)
 
     return right_alt_consonant_node
\ No newline at end of file
@@ -2,6 +2,9 @@ from typing import NamedTuple
 from dataclasses import dataclass
 
 from ...util.Trie import NondeterministicTrie
+from .profiler import BuildProfiler
+from .budget import BudgetedTrie
+from ...theory.service import TheoryService
 from ...sopheme.Sound import Sound
 
 class ConsonantVowelGroup(NamedTuple):
@@ -13,6 +16,13 @@ class OutlineSounds:
     nonfinals: tuple[ConsonantVowelGroup, ...]
     final_consonants: tuple[Sound, ...]
 
+    def signature(self):
+        """The phoneme codes of this outline, without the sophemes they came from; entries with equal signatures build identical paths"""
+        return (
+            tuple((tuple(consonant.phoneme for consonant in consonants), vowel.phoneme) for consonants, vowel in self.nonfinals),
+            tuple(consonant.phoneme for consonant in self.final_consonants),
+        )
+
     def get_consonants(self, group_index: int):
         if group_index == len(self.nonfinals):
             return self.final_consonants
@@ -96,9 +106,13 @@ class OutlineSounds:
 class EntryBuilderState:
     """Convenience struct for making entry state easier to pass into helper functions"""
 
-    trie: NondeterministicTrie[str, str]
+    trie: "NondeterministicTrie[str, str] | BudgetedTrie[str, str]"
     phonemes: OutlineSounds
-    translation: str
+    translations: tuple[str, ...]
+    theory: TheoryService
+
+    # Measures each rule's time and trie growth, if profiling is enabled
+    profiler: "BuildProfiler | None" = None
 
     # The node from which the next left consonant chord will be attached
     left_consonant_src_node: "int | None" = None
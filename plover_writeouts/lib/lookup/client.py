@@ -0,0 +1,183 @@
+"""Clients of the lookup service in `service`.
+
+`LookupClient` is for asyncio programs. Requests can be sent without waiting for earlier ones to finish, e.g., with
+`asyncio.gather`, and share one connection. `BlockingLookupClient` sends one request at a time, for scripts and editor
+plugins without an event loop.
+"""
+
+from pathlib import Path
+from typing import Iterable, NamedTuple, Optional
+import asyncio
+import socket
+
+from .protocol import (
+    Op,
+    Status,
+    ProtocolError,
+    FRAME_HEADER,
+    encode_frame,
+    decode_header,
+    decode_strings,
+    encode_outlines,
+    decode_outlines,
+    decode_stats,
+)
+
+
+class LookupServiceError(Exception):
+    """The service could not answer a request"""
+
+
+class ReverseLookupResult(NamedTuple):
+    outlines: list[tuple[str, ...]]
+    truncated: bool
+    """Whether the service stopped searching at a work limit, so that there may be more outlines"""
+
+
+class LookupClient:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.__reader = reader
+        self.__writer = writer
+
+        self.__next_request_id = 0
+        self.__pending: dict[int, asyncio.Future[tuple[int, list[Optional[str]]]]] = {}
+        """Futures of the requests still waiting for responses, by request id"""
+        self.__receive_task = asyncio.create_task(self.__receive())
+
+    @classmethod
+    async def connect(cls, socket_path: Path):
+        reader, writer = await asyncio.open_unix_connection(str(socket_path))
+        return cls(reader, writer)
+
+    async def lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
+        _, strings = await self.__request(Op.LOOKUP, stroke_stenos)
+        return strings[0]
+
+    async def reverse_lookup(self, translation: str):
+        status, strings = await self.__request(Op.REVERSE_LOOKUP, (translation,))
+        return ReverseLookupResult(decode_outlines(strings), status == Status.TRUNCATED)
+
+    async def lookup_batch(self, outlines: Iterable[tuple[str, ...]]) -> list[Optional[str]]:
+        _, strings = await self.__request(Op.LOOKUP_BATCH, encode_outlines(outlines))
+        return strings
+
+    async def stats(self):
+        _, strings = await self.__request(Op.STATS, ())
+        return decode_stats(strings)
+
+    async def close(self):
+        self.__writer.close()
+        try:
+            await self.__writer.wait_closed()
+        except ConnectionError:
+            pass
+        await self.__receive_task
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        await self.close()
+
+    async def __request(self, op: Op, strings: Iterable[Optional[str]]):
+        if self.__receive_task.done():
+            raise ConnectionError("connection to the lookup service is closed")
+
+        request_id = self.__next_request_id
+        self.__next_request_id = (self.__next_request_id + 1) % (1 << 32)
+
+        future: asyncio.Future[tuple[int, list[Optional[str]]]] = asyncio.get_running_loop().create_future()
+        self.__pending[request_id] = future
+
+        try:
+            self.__writer.write(encode_frame(request_id, op, strings))
+            await self.__writer.drain()
+            status, response = await future
+        finally:
+            self.__pending.pop(request_id, None)
+
+        return _check_status(status, response)
+
+    async def __receive(self):
+        error: Exception = ConnectionError("connection to the lookup service closed")
+
+        try:
+            while True:
+                payload_length, request_id, status = decode_header(await self.__reader.readexactly(FRAME_HEADER.size))
+                payload = await self.__reader.readexactly(payload_length)
+
+                future = self.__pending.get(request_id)
+                if future is not None and not future.done():
+                    future.set_result((status, decode_strings(payload)))
+
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except ProtocolError as protocol_error:
+            error = protocol_error
+            self.__writer.close()
+
+        for future in self.__pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class BlockingLookupClient:
+    def __init__(self, socket_path: Path, timeout: "float | None"=None):
+        self.__socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.__socket.settimeout(timeout)
+        self.__socket.connect(str(socket_path))
+
+        self.__next_request_id = 0
+
+    def lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
+        _, strings = self.__request(Op.LOOKUP, stroke_stenos)
+        return strings[0]
+
+    def reverse_lookup(self, translation: str):
+        status, strings = self.__request(Op.REVERSE_LOOKUP, (translation,))
+        return ReverseLookupResult(decode_outlines(strings), status == Status.TRUNCATED)
+
+    def lookup_batch(self, outlines: Iterable[tuple[str, ...]]) -> list[Optional[str]]:
+        _, strings = self.__request(Op.LOOKUP_BATCH, encode_outlines(outlines))
+        return strings
+
+    def stats(self):
+        _, strings = self.__request(Op.STATS, ())
+        return decode_stats(strings)
+
+    def close(self):
+        self.__socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __request(self, op: Op, strings: Iterable[Optional[str]]):
+        request_id = self.__next_request_id
+        self.__next_request_id = (self.__next_request_id + 1) % (1 << 32)
+
+        self.__socket.sendall(encode_frame(request_id, op, strings))
+
+        payload_length, response_id, status = decode_header(self.__receive_exactly(FRAME_HEADER.size))
+        payload = self.__receive_exactly(payload_length)
+        if response_id != request_id:
+            raise ProtocolError(f"expected a response to request {request_id}, but got one to {response_id}")
+
+        return _check_status(status, decode_strings(payload))
+
+    def __receive_exactly(self, n_bytes: int):
+        buffer = bytearray()
+        while len(buffer) < n_bytes:
+            chunk = self.__socket.recv(n_bytes - len(buffer))
+            if len(chunk) == 0:
+                raise ConnectionError("connection to the lookup service closed")
+            buffer += chunk
+        return bytes(buffer)
+
+
+def _check_status(status: int, strings: list[Optional[str]]):
+    if status == Status.ERROR:
+        raise LookupServiceError(strings[0] if len(strings) > 0 else "unknown error")
+    return status, strings
@@ -0,0 +1,136 @@
+"""Differential checks between lookup engines. Runs the same outlines through a reference engine and a candidate and
+collects every outline where they disagree on the result or on the ranking of translations.
+"""
+
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Iterable, NamedTuple, Optional
+import random
+
+from ..theory.service import TheoryService
+from .engine import LookupEngine
+
+
+class EngineMismatch(NamedTuple):
+    kind: str
+    """`"lookup"`, `"ranking"`, `"batch lookup"`, or `"reverse lookup"`"""
+    query: "tuple[str, ...] | str"
+    expected: object
+    actual: object
+
+
+@dataclass
+class EngineComparison:
+    n_outlines: int = 0
+    n_translations: int = 0
+    mismatches: list[EngineMismatch] = field(default_factory=list)
+    reference_seconds: float = 0
+    """Time the reference engine spent on lookups, rankings, and reverse lookups"""
+    candidate_seconds: float = 0
+    candidate_batch_seconds: float = 0
+    """Time the candidate engine spent looking up every outline in one batch"""
+
+    def describe(self, max_mismatches: "int | None"=None):
+        lines = [
+            f"{self.n_outlines:,} outlines and {self.n_translations:,} translations compared: {len(self.mismatches):,} mismatches",
+            f"\treference {self.reference_seconds:.3f} s, candidate {self.candidate_seconds:.3f} s ({self.candidate_batch_seconds:.3f} s batched)",
+        ]
+        lines.extend(f"\t{mismatch.kind} {mismatch.query}: expected {mismatch.expected!r}, got {mismatch.actual!r}" for mismatch in self.mismatches[:max_mismatches])
+        return "\n".join(lines)
+
+    def __str__(self):
+        return self.describe()
+
+
+def compare_engines(
+    reference: LookupEngine,
+    candidate: LookupEngine,
+    outlines: Iterable[tuple[str, ...]],
+    translations: Iterable[str]=(),
+):
+    comparison = EngineComparison()
+
+    def timed(engine: LookupEngine, method_name: str, query):
+        start = perf_counter()
+        result = getattr(engine, method_name)(query)
+        duration = perf_counter() - start
+
+        if engine is reference:
+            comparison.reference_seconds += duration
+        else:
+            comparison.candidate_seconds += duration
+        return result
+
+    outlines = list(outlines)
+    expected_lookups: list[Optional[str]] = []
+    for outline in outlines:
+        comparison.n_outlines += 1
+
+        expected, actual = timed(reference, "lookup", outline), timed(candidate, "lookup", outline)
+        expected_lookups.append(expected)
+        if expected != actual:
+            comparison.mismatches.append(EngineMismatch("lookup", outline, expected, actual))
+
+        expected, actual = timed(reference, "ranked_translations", outline), timed(candidate, "ranked_translations", outline)
+        if expected != actual:
+            comparison.mismatches.append(EngineMismatch("ranking", outline, expected, actual))
+
+    start = perf_counter()
+    batch_lookups = candidate.lookup_batch(outlines)
+    comparison.candidate_batch_seconds = perf_counter() - start
+    for outline, expected, actual in zip(outlines, expected_lookups, batch_lookups):
+        if expected != actual:
+            comparison.mismatches.append(EngineMismatch("batch lookup", outline, expected, actual))
+
+    for translation in translations:
+        comparison.n_translations += 1
+
+        expected, actual = sorted(timed(reference, "reverse_lookup", translation)), sorted(timed(candidate, "reverse_lookup", translation))
+        if expected != actual:
+            comparison.mismatches.append(EngineMismatch("reverse lookup", translation, expected, actual))
+
+    return comparison
+
+
+def sample_outlines(
+    reference: LookupEngine,
+    translations: Iterable[str],
+    theory: TheoryService,
+    rng: random.Random,
+    n_random: int=1000,
+):
+    """Outlines to compare engines with: every outline the reference finds for each translation, some of them with cycler
+    presses or the asterisk added, and random outlines spliced and perturbed from those
+    """
+
+    corpus_outlines: list[tuple[str, ...]] = []
+    for translation in translations:
+        corpus_outlines.extend(reference.reverse_lookup(translation))
+    if len(corpus_outlines) == 0:
+        return []
+
+    cycler_steno = theory.mask_to_steno(theory.cycler_mask)
+    asterisk_steno = theory.mask_to_steno(theory.asterisk_mask)
+    key_masks = [1 << bit for bit in range(theory.all_keys_mask.bit_length()) if theory.all_keys_mask & (1 << bit) != 0]
+
+    outlines = list(dict.fromkeys(corpus_outlines))
+    for _ in range(n_random):
+        outline = list(rng.choice(corpus_outlines))
+
+        variant = rng.randrange(4)
+        if variant == 0:
+            outline.extend((cycler_steno,) * rng.randint(1, 3))
+        elif variant == 1:
+            outline.append(asterisk_steno)
+        elif variant == 2:
+            other_outline = rng.choice(corpus_outlines)
+            outline = outline[:rng.randint(1, len(outline))] + list(other_outline[rng.randrange(len(other_outline)):])
+        else:
+            i = rng.randrange(len(outline))
+            stroke = theory.steno_to_mask(outline[i]) ^ rng.choice(key_masks)
+            if stroke == 0: continue
+            outline[i] = theory.mask_to_steno(stroke)
+
+        outlines.append(tuple(outline))
+
+    return outlines
@@ -0,0 +1,122 @@
+from abc import ABC, abstractmethod
+from typing import Iterable, Iterator, Optional, TYPE_CHECKING
+
+import plover.log
+
+from ..util.Trie import NondeterministicTrie
+from ..theory.service import TheoryService
+from .build_trie.add_entry import add_entries
+from .build_trie.profiler import BuildProfiler
+from .build_trie.budget import ExpansionBudget
+from .build_trie.state import OutlineSounds
+from .build_lookup import create_lookup_for, traverse, rank_translations
+from .build_reverse_lookup import create_lazy_reverse_lookup_for
+
+if TYPE_CHECKING:
+    from threading import Event
+
+    from ..util.compiled_trie import CompiledTrie
+
+
+class LookupEngine(ABC):
+    """Answers lookups and reverse lookups for a set of entries. `TrieLookupEngine` is the reference; other engines
+    must give the same result and the same ranking of translations for every outline.
+    """
+
+    @classmethod
+    @abstractmethod
+    def build(
+        cls,
+        entries: Iterable[tuple[OutlineSounds, str]],
+        theory: TheoryService,
+        budget: "ExpansionBudget | None"=None,
+        profiler: "BuildProfiler | None"=None,
+        cancel_event: "Event | None"=None,
+    ) -> "LookupEngine":
+        ...
+
+    @abstractmethod
+    def lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    def ranked_translations(self, stroke_stenos: tuple[str, ...]) -> list[str]:
+        """Every translation an outline reaches, ignoring cycler presses and the asterisk, from the one the lookup
+        prefers to the one it prefers least"""
+        ...
+
+    @abstractmethod
+    def reverse_lookup(self, translation: str) -> list[tuple[str, ...]]:
+        ...
+
+    def lookup_batch(self, outlines: Iterable[tuple[str, ...]]) -> list[Optional[str]]:
+        """Looks up many outlines at once, for bulk workloads such as audits and exports"""
+        return [self.lookup(stroke_stenos) for stroke_stenos in outlines]
+
+    def iter_reverse_lookup(self, translation: str, pause_every: "int | None"=None) -> Iterator[Optional[tuple[str, ...]]]:
+        """The outlines of `reverse_lookup`, found one at a time, so that callers can stop early or do other work between
+        them. Engines that search lazily also yield None after every `pause_every` nodes they search, if given."""
+        yield from self.reverse_lookup(translation)
+
+    @abstractmethod
+    def stats(self) -> dict[str, int]:
+        """Counts describing the engine's structures, e.g., nodes"""
+        ...
+
+
+class TrieLookupEngine(LookupEngine):
+    """Builds every entry into one trie up front. Can also serve a `CompiledTrie`, such as one attached from a
+    `SharedTrieRegistry`."""
+
+    def __init__(self, trie: "NondeterministicTrie[str, str] | CompiledTrie", theory: TheoryService):
+        self.trie = trie
+        self.theory = theory
+
+        self.__lookup = create_lookup_for(trie, theory)
+        self.__reverse_lookup = create_lazy_reverse_lookup_for(trie, theory)
+
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[tuple[OutlineSounds, str]],
+        theory: TheoryService,
+        budget: "ExpansionBudget | None"=None,
+        profiler: "BuildProfiler | None"=None,
+        cancel_event: "Event | None"=None,
+    ):
+        trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+
+        stats = add_entries(trie, entries, theory, profiler, budget, cancel_event)
+        plover.log.debug(f"built {stats.n_groups:,} phoneme groups from {stats.n_entries:,} entries ({stats.n_duplicate_hits:,} duplicates skipped, {stats.n_homophone_hits:,} homophones batched)")
+        if stats.n_budget_capped > 0:
+            plover.log.info(f"expansion budget reached for {stats.n_budget_capped:,} phoneme groups")
+
+        if profiler is not None:
+            plover.log.info(f"{profiler.report()}\n\tresulting trie: {trie.n_nodes:,} nodes, {trie.n_transitions:,} transitions, {trie.n_cost_labels:,} cost labels")
+
+        # plover.log.debug(str(trie))
+        return cls(trie, theory)
+
+    def lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
+        return self.__lookup(stroke_stenos)
+
+    def reverse_lookup(self, translation: str) -> list[tuple[str, ...]]:
+        return list(self.__reverse_lookup(translation))
+
+    def iter_reverse_lookup(self, translation: str, pause_every: "int | None"=None):
+        return self.__reverse_lookup(translation, pause_every)
+
+    def ranked_translations(self, stroke_stenos: tuple[str, ...]):
+        traversal = traverse(self.trie, stroke_stenos, self.theory)
+        if traversal is None:
+            return []
+
+        translation_choices, _ = rank_translations(((self.trie, traversal[0]),), self.theory, self.trie.value_id)
+        return [translation for translation, _ in translation_choices]
+
+    def stats(self):
+        return {
+            "nodes": self.trie.n_nodes,
+            "transitions": self.trie.n_transitions,
+            "cost labels": self.trie.n_cost_labels,
+        }
@@ -0,0 +1,137 @@
+from hashlib import blake2b
+from typing import Callable, Iterable, TypeVar, TYPE_CHECKING
+
+import plover.log
+
+from ..theory.service import TheoryService
+from ..util.config import ENTRY_MAX_COST, ENTRY_MAX_ABBREVIATION_STEPS
+from .build_trie.add_entry import BuildCancelledError
+from .build_trie.state import OutlineSounds
+from .sharded import ShardedLookup
+
+if TYPE_CHECKING:
+    from threading import Event
+
+_T = TypeVar("_T")
+
+_EntryRef = tuple[tuple, str]
+"""An entry's phoneme signature and translation, which are all that decide the paths it adds"""
+
+
+def entry_hash(entry_text: str):
+    """Content hash identifying an entry across loads of a dictionary"""
+    return blake2b(entry_text.encode("utf-8"), digest_size=16).digest()
+
+def build_key(theory: TheoryService):
+    """Identifies everything besides the entries themselves that decides how a dictionary builds. A build can only be
+    updated in place by a later load with the same key.
+    """
+    return f"{theory.content_hash}:{ENTRY_MAX_COST}:{ENTRY_MAX_ABBREVIATION_STEPS}"
+
+
+class HatcheryBuildState:
+    """The entries behind a completed sharded build, kept so that the next load of the same file can apply only the
+    entries that changed
+    """
+
+    def __init__(
+        self,
+        build_key: str,
+        sharded_lookup: ShardedLookup,
+        entries: dict[bytes, tuple[OutlineSounds, str]],
+        n_refs: dict[_EntryRef, int],
+    ):
+        self.build_key = build_key
+        self.sharded_lookup = sharded_lookup
+
+        self.entries = entries
+        """Each entry's decoded sounds and translation, keyed by its content hash"""
+        self.n_refs = n_refs
+        """How many entries share each signature and translation, so that removing one of them only removes the path once
+        none are left"""
+
+    @property
+    def lookups(self):
+        return self.sharded_lookup.lookup, self.sharded_lookup.reverse_lookup
+
+
+class HatcheryBuildCache:
+    """Holds the most recent build of a Hatchery dictionary across reloads. Builds only ever replace the state as a
+    whole, so a build that is cancelled partway leaves the cache unchanged.
+    """
+
+    def __init__(self):
+        self.state: "HatcheryBuildState | None" = None
+
+
+def build_incrementally(
+    keyed_entries: Iterable[tuple[bytes, _T]],
+    decode: Callable[[_T], tuple[OutlineSounds, str]],
+    theory: TheoryService,
+    previous: "HatcheryBuildState | None",
+    build_sharded_lookup: Callable[[Iterable[tuple[OutlineSounds, str]]], ShardedLookup],
+    cancel_event: "Event | None"=None,
+):
+    """Builds lookups for entries identified by their content hashes. If `previous` was built with the same build key,
+    only the entries whose hashes are new are decoded, and only the shards touched by added or removed entries are
+    rebuilt. Otherwise, every entry is decoded and `build_sharded_lookup` builds the lookup from scratch.
+    """
+
+    key = build_key(theory)
+    if previous is not None and previous.build_key != key:
+        plover.log.debug("theory or build settings changed since the last load; rebuilding every entry")
+        previous = None
+
+    entries: dict[bytes, tuple[OutlineSounds, str]] = {}
+    added: list[tuple[OutlineSounds, str]] = []
+    for hash, raw_entry in keyed_entries:
+        if cancel_event is not None and cancel_event.is_set(): raise BuildCancelledError
+        if hash in entries: continue
+
+        entry = previous.entries.get(hash) if previous is not None else None
+        if entry is None:
+            entry = decode(raw_entry)
+            added.append(entry)
+        entries[hash] = entry
+
+    if previous is None:
+        n_refs: dict[_EntryRef, int] = {}
+        for phonemes, translation in entries.values():
+            ref = (phonemes.signature(), translation)
+            n_refs[ref] = n_refs.get(ref, 0) + 1
+
+        return HatcheryBuildState(key, build_sharded_lookup(entries.values()), entries, n_refs)
+
+
+    removed = [entry for hash, entry in previous.entries.items() if hash not in entries]
+    if len(added) == 0 and len(removed) == 0:
+        return HatcheryBuildState(key, previous.sharded_lookup, entries, previous.n_refs)
+
+    # Count additions first, so that an edit which keeps an entry's sounds and translation does not touch its shard
+    n_refs = dict(previous.n_refs)
+    added_paths: list[tuple[OutlineSounds, str]] = []
+    for phonemes, translation in added:
+        ref = (phonemes.signature(), translation)
+        n_refs[ref] = n_refs.get(ref, 0) + 1
+        if n_refs[ref] > 1: continue
+
+        added_paths.append((phonemes, translation))
+
+    removed_paths: list[tuple[OutlineSounds, str]] = []
+    for phonemes, translation in removed:
+        ref = (phonemes.signature(), translation)
+        n_refs[ref] -= 1
+        if n_refs[ref] > 0: continue
+
+        del n_refs[ref]
+        removed_paths.append((phonemes, translation))
+
+    translation_order: dict[str, int] = {}
+    for _, translation in entries.values():
+        if translation not in translation_order:
+            translation_order[translation] = len(translation_order)
+
+    sharded_lookup = previous.sharded_lookup.with_changes(added_paths, removed_paths, translation_order)
+    plover.log.debug(f"applied {len(added):,} added and {len(removed):,} removed entries; {sharded_lookup.n_shards - sharded_lookup.n_built_shards:,} of {sharded_lookup.n_shards:,} shards left to build")
+
+    return HatcheryBuildState(key, sharded_lookup, entries, n_refs)
@@ -0,0 +1,131 @@
+"""Wire format of the lookup service in `service` and its clients in `client`.
+
+Every message is a frame: a header of the payload's length, the request's id, and a code, then the payload, which is a
+sequence of strings, each a signed length followed by that many bytes of UTF-8 (or a length of -1 for None). A request's
+code is its `Op` and a response's is its `Status`; responses carry the id of the request they answer, so a client can
+send many requests without waiting and match up the responses in whatever order they finish.
+
+| Op               | Request strings                        | Response strings                        |
+|------------------|----------------------------------------|-----------------------------------------|
+| `LOOKUP`         | the strokes of one outline             | the translation, or None                |
+| `REVERSE_LOOKUP` | the translation                        | outlines, per `encode_outlines`         |
+| `LOOKUP_BATCH`   | outlines, per `encode_outlines`        | a translation or None for each outline  |
+| `STATS`          | nothing                                | alternating names and values            |
+
+A response with `Status.ERROR` holds only an error message.
+"""
+
+from enum import IntEnum
+from typing import Iterable, Optional, Sequence
+import struct
+
+
+class Op(IntEnum):
+    LOOKUP = 1
+    REVERSE_LOOKUP = 2
+    LOOKUP_BATCH = 3
+    STATS = 4
+
+class Status(IntEnum):
+    OK = 0
+    TRUNCATED = 1
+    """The request ran into a work limit, and the response holds the results found before then"""
+    ERROR = 2
+
+
+class ProtocolError(Exception):
+    pass
+
+
+FRAME_HEADER = struct.Struct("<IIB")
+"""Payload length, request id, and op or status"""
+
+MAX_PAYLOAD_BYTES = 1 << 26
+
+_LENGTH = struct.Struct("<i")
+
+
+def encode_frame(request_id: int, code: int, strings: Iterable[Optional[str]]):
+    parts: list[bytes] = []
+    for string in strings:
+        if string is None:
+            parts.append(_LENGTH.pack(-1))
+            continue
+
+        encoded = string.encode("utf-8")
+        parts.append(_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+
+    payload = b"".join(parts)
+    if len(payload) > MAX_PAYLOAD_BYTES:
+        raise ProtocolError(f"payload of {len(payload):,} bytes is over the limit of {MAX_PAYLOAD_BYTES:,}")
+
+    return FRAME_HEADER.pack(len(payload), request_id, code) + payload
+
+def decode_header(header: bytes):
+    """The payload length, request id, and code of a frame"""
+
+    payload_length, request_id, code = FRAME_HEADER.unpack(header)
+    if payload_length > MAX_PAYLOAD_BYTES:
+        raise ProtocolError(f"payload of {payload_length:,} bytes is over the limit of {MAX_PAYLOAD_BYTES:,}")
+    return payload_length, request_id, code
+
+def decode_strings(payload: bytes):
+    strings: list[Optional[str]] = []
+
+    position = 0
+    while position < len(payload):
+        if position + _LENGTH.size > len(payload):
+            raise ProtocolError("payload ends inside a string's length")
+        (length,) = _LENGTH.unpack_from(payload, position)
+        position += _LENGTH.size
+
+        if length == -1:
+            strings.append(None)
+            continue
+        if length < 0 or position + length > len(payload):
+            raise ProtocolError(f"string of length {length} does not fit in the payload")
+
+        strings.append(payload[position:position + length].decode("utf-8"))
+        position += length
+
+    return strings
+
+
+def encode_outlines(outlines: Iterable[tuple[str, ...]]):
+    """Lays out a list of outlines as strings, with each outline's strokes followed by None"""
+
+    for outline in outlines:
+        yield from outline
+        yield None
+
+def decode_outlines(strings: Sequence[Optional[str]]):
+    outlines: list[tuple[str, ...]] = []
+
+    outline: list[str] = []
+    for string in strings:
+        if string is None:
+            outlines.append(tuple(outline))
+            outline = []
+        else:
+            outline.append(string)
+
+    if len(outline) > 0:
+        raise ProtocolError("last outline is not terminated")
+
+    return outlines
+
+
+def encode_stats(stats: dict[str, int]):
+    for name, value in stats.items():
+        yield name
+        yield str(value)
+
+def decode_stats(strings: Sequence[Optional[str]]):
+    stats: dict[str, int] = {}
+    for i in range(0, len(strings) - 1, 2):
+        name, value = strings[i], strings[i + 1]
+        if name is None or value is None:
+            raise ProtocolError("stats are not name–value pairs")
+        stats[name] = int(value)
+    return stats
@@ -0,0 +1,252 @@
+"""A daemon that holds one dictionary's lookup and answers lookups for other local processes, such as editor plugins and
+scripts, over a Unix domain socket in the format of `protocol`.
+
+Everything runs on a single event loop. Clients can pipeline requests, i.e., send more before earlier ones are answered,
+up to `ServiceLimits.max_in_flight` per connection. Lookups and stats are answered as soon as they are read. Reverse
+lookups and batches, which can do much more work, run as tasks that hand control back to the loop every
+`ServiceLimits.slice_seconds`, and only one of them per connection runs at a time, so each client gets a turn in every
+round no matter how many expensive requests another client queues up. Reverse lookups also stop after a limited number
+of outlines or amount of work and answer with what they found by then.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Sequence
+import asyncio
+import os
+import stat
+import time
+
+import plover.log
+
+from .engine import LookupEngine
+from .protocol import (
+    Op,
+    Status,
+    ProtocolError,
+    FRAME_HEADER,
+    encode_frame,
+    decode_header,
+    decode_strings,
+    encode_outlines,
+    decode_outlines,
+    encode_stats,
+)
+
+
+@dataclass(frozen=True)
+class ServiceLimits:
+    max_in_flight: int = 32
+    """Requests from one connection that can be waiting on an answer at once. The service stops reading from a
+    connection at this limit until one of its requests finishes."""
+    slice_seconds: float = 0.005
+    """How long a request works before letting other requests run"""
+    max_batch_outlines: int = 100_000
+    batch_chunk_size: int = 512
+    """Outlines a batch looks up between checks of its time slice"""
+    max_reverse_outlines: int = 1_000
+    reverse_lookup_seconds: float = 0.5
+    """Time a reverse lookup can spend searching, not counting time spent letting other requests run"""
+    reverse_pause_nodes: int = 256
+    """Trie nodes a reverse lookup searches between checks of its time slice"""
+
+
+class LookupService:
+    def __init__(self, engine: LookupEngine, limits: ServiceLimits=ServiceLimits()):
+        self.engine = engine
+        self.limits = limits
+
+        self.__n_connections = 0
+        self.__n_requests = 0
+        self.__n_truncated = 0
+        self.__n_errors = 0
+
+    async def start(self, socket_path: Path):
+        """Starts listening on `socket_path`, replacing any socket left behind by a service that is no longer running"""
+
+        await _remove_stale_socket(socket_path)
+        socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+        server = await asyncio.start_unix_server(self.__serve_connection, path=str(socket_path))
+        os.chmod(socket_path, 0o600)
+
+        plover.log.info(f"lookup service listening on {socket_path}")
+        return server
+
+    async def serve_forever(self, socket_path: Path):
+        server = await self.start(socket_path)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+    def stats(self):
+        return {
+            **self.engine.stats(),
+            "connections": self.__n_connections,
+            "requests": self.__n_requests,
+            "truncated requests": self.__n_truncated,
+            "failed requests": self.__n_errors,
+        }
+
+    async def __serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.__n_connections += 1
+
+        slots = asyncio.Semaphore(self.limits.max_in_flight)
+        work_lock = asyncio.Lock()
+        """Held by the connection's expensive request that is running"""
+        write_lock = asyncio.Lock()
+        tasks: set[asyncio.Task] = set()
+
+        async def respond(request_id: int, code: int, payload: bytes):
+            try:
+                try:
+                    status, strings = await self.__handle(code, decode_strings(payload), work_lock)
+                    frame = encode_frame(request_id, status, strings)
+                except Exception as error:
+                    self.__n_errors += 1
+                    frame = encode_frame(request_id, Status.ERROR, (f"{type(error).__name__}: {error}",))
+
+                async with write_lock:
+                    writer.write(frame)
+                    await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                slots.release()
+
+        try:
+            while True:
+                try:
+                    header = await reader.readexactly(FRAME_HEADER.size)
+                except asyncio.IncompleteReadError as error:
+                    if len(error.partial) > 0:
+                        plover.log.warning("lookup service client disconnected in the middle of a frame")
+                    break
+
+                payload_length, request_id, code = decode_header(header)
+                payload = await reader.readexactly(payload_length)
+
+                await slots.acquire()
+                if code in _INLINE_OPS:
+                    # Cheaper to answer than to schedule
+                    await respond(request_id, code, payload)
+                    continue
+
+                task = asyncio.create_task(respond(request_id, code, payload))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+        except (ProtocolError, asyncio.IncompleteReadError, ConnectionError) as error:
+            plover.log.warning(f"closing lookup service connection: {error}")
+
+        finally:
+            if len(tasks) > 0:
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+            self.__n_connections -= 1
+
+    async def __handle(self, code: int, strings: list[Optional[str]], work_lock: asyncio.Lock) -> tuple[Status, Sequence[Optional[str]]]:
+        self.__n_requests += 1
+
+        op = Op(code)
+        if op == Op.LOOKUP:
+            return Status.OK, (self.engine.lookup(_outline(strings)),)
+
+        elif op == Op.REVERSE_LOOKUP:
+            if len(strings) != 1 or strings[0] is None:
+                raise ValueError("reverse lookup takes exactly one translation")
+
+            async with work_lock:
+                outlines, truncated = await self.__reverse_lookup(strings[0])
+            if truncated:
+                self.__n_truncated += 1
+            return Status.TRUNCATED if truncated else Status.OK, tuple(encode_outlines(outlines))
+
+        elif op == Op.LOOKUP_BATCH:
+            async with work_lock:
+                return Status.OK, await self.__lookup_batch(decode_outlines(strings))
+
+        elif op == Op.STATS:
+            return Status.OK, tuple(encode_stats(self.stats()))
+
+        raise AssertionError(op)
+
+    async def __reverse_lookup(self, translation: str):
+        outlines: list[tuple[str, ...]] = []
+
+        work_seconds = 0
+        slice_start = time.perf_counter()
+        for outline in self.engine.iter_reverse_lookup(translation, self.limits.reverse_pause_nodes):
+            now = time.perf_counter()
+            if work_seconds + (now - slice_start) > self.limits.reverse_lookup_seconds:
+                return outlines, True
+
+            if outline is not None:
+                if len(outlines) >= self.limits.max_reverse_outlines:
+                    return outlines, True
+                outlines.append(outline)
+
+            if now - slice_start > self.limits.slice_seconds:
+                work_seconds += now - slice_start
+                await asyncio.sleep(0)
+                slice_start = time.perf_counter()
+
+        return outlines, False
+
+    async def __lookup_batch(self, outlines: list[tuple[str, ...]]):
+        if len(outlines) > self.limits.max_batch_outlines:
+            raise ValueError(f"batch of {len(outlines):,} outlines is over the limit of {self.limits.max_batch_outlines:,}")
+
+        translations: list[Optional[str]] = []
+
+        slice_start = time.perf_counter()
+        for i in range(0, len(outlines), self.limits.batch_chunk_size):
+            translations.extend(self.engine.lookup_batch(outlines[i:i + self.limits.batch_chunk_size]))
+
+            if time.perf_counter() - slice_start > self.limits.slice_seconds:
+                await asyncio.sleep(0)
+                slice_start = time.perf_counter()
+
+        return translations
+
+
+_INLINE_OPS = (Op.LOOKUP, Op.STATS)
+
+
+def default_socket_path():
+    return Path(plover.log.LOG_FILENAME).parent / "hatchery-lookup.sock"
+
+
+def _outline(strings: list[Optional[str]]):
+    outline: list[str] = []
+    for stroke_steno in strings:
+        if stroke_steno is None:
+            raise ValueError("outline contains a missing stroke")
+        outline.append(stroke_steno)
+    return tuple(outline)
+
+async def _remove_stale_socket(socket_path: Path):
+    try:
+        mode = socket_path.stat().st_mode
+    except FileNotFoundError:
+        return
+
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket")
+
+    try:
+        _, writer = await asyncio.open_unix_connection(str(socket_path))
+    except (ConnectionRefusedError, FileNotFoundError):
+        socket_path.unlink(missing_ok=True)
+        return
+
+    writer.close()
+    raise RuntimeError(f"a lookup service is already listening on {socket_path}")
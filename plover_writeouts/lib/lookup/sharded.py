@@ -0,0 +1,742 @@
+from threading import Event, RLock, Thread
+from typing import Callable, Iterable, Optional
+
+from plover.steno import Stroke
+import plover.log
+
+from ..util.Trie import NondeterministicTrie, ReadonlyTrie
+from ..util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY, MAX_SHARD_SIZE
+from ..theory.service import TheoryService
+from ..sopheme.Sound import Sound
+from ..stenophoneme.Stenophoneme import ANY_VOWEL_CODE, IS_VOWEL_CODE
+from .build_trie.add_entry import add_entry_groups, group_entries, BuildCancelledError
+from .build_trie.budget import ExpansionBudget
+from .build_trie.profiler import BuildProfiler
+from .build_trie.state import OutlineSounds
+from .build_lookup import traverse, choose_translation, rank_translations
+from .build_reverse_lookup import create_reverse_lookup_for
+from .engine import LookupEngine
+
+_KeyPrefix = tuple[str, ...]
+"""The first keys of a path from the root of a trie"""
+
+_ShardKey = tuple[str, ...]
+"""The first keys of the paths that write a shard's entries with the main chords of their sounds"""
+
+
+class _Shard:
+    def __init__(self, key: _ShardKey):
+        self.key = key
+        self.groups: dict[tuple, tuple[OutlineSounds, dict[str, None]]] = {}
+        """Groups of entries in this shard, keyed by phoneme signature"""
+        self.predicted_key_prefixes: set[_KeyPrefix] = set()
+        """Prefixes that every path of the shard's entries starts with one of, including entries since removed"""
+        self.trie: "NondeterministicTrie[str, str] | None" = None
+        self.reverse_lookup: "Callable[[str], list[tuple[str, ...]]] | None" = None
+        """Created the first time the shard is searched by translation, or when it is warmed up"""
+        self.unpredicted_key_prefixes: frozenset[_KeyPrefix] = frozenset()
+        """Prefixes of paths in the shard's trie once it is built that none of the predicted prefixes cover"""
+
+    def copy_unbuilt(self):
+        shard = _Shard(self.key)
+        shard.groups = {signature: (phonemes, dict(translations)) for signature, (phonemes, translations) in self.groups.items()}
+        shard.predicted_key_prefixes = set(self.predicted_key_prefixes)
+        return shard
+
+    def add_group(self, phonemes: OutlineSounds, translations: dict[str, None], theory: TheoryService):
+        self.groups[phonemes.signature()] = (phonemes, translations)
+        self.predicted_key_prefixes.update(_predicted_key_prefixes(phonemes, theory))
+
+
+class ShardedLookup(LookupEngine):
+    """Lookups over entries split into shards by how they start. Each shard gets its own trie, which is only built the
+    first time a lookup or reverse lookup could reach one of its entries.
+
+    Entries are sharded by the first keys of the path that writes them with the main chords of their sounds, taking as
+    many keys as it takes to keep each shard within `max_shard_size` phoneme groups. Entries added by `with_changes` join
+    the shard with the longest key their path starts with, so shards may grow past it.
+
+    Each shard is indexed by the key prefixes that any path of its entries could start with, which are predicted from the
+    chords that could write their first sounds, so an outline only reaches the shards with a prefix that the outline
+    could start with. Once a shard is built, any prefixes of its trie that were not predicted are used as well, including
+    by any other lookups that share the shard through `with_changes` once they reach it.
+    """
+
+    def __init__(
+        self,
+        groups: Iterable[tuple[OutlineSounds, dict[str, None]]],
+        translation_order: dict[str, int],
+        theory: TheoryService,
+        budget: "ExpansionBudget | None"=None,
+        max_shard_size: int=MAX_SHARD_SIZE,
+    ):
+        self.theory = theory
+        self.budget = budget
+
+        self.__translation_order = translation_order
+        """Orders translations of equal cost the same way across shards, as in `EntryGroups.translation_order`"""
+
+        self.__lock = RLock()
+        """Held while reading or swapping in the tries of shards, since a warm-up thread may be building shards
+        concurrently"""
+
+        main_path_groups = [(_main_path_keys(phonemes, theory), phonemes, translations) for phonemes, translations in groups]
+        shard_keys = _split_shard_keys([main_path for main_path, _, _ in main_path_groups], max_shard_size) if len(main_path_groups) > 0 else ()
+
+        self.__shards: dict[_ShardKey, _Shard] = {key: _Shard(key) for key in shard_keys}
+        self.__shards_by_translation: dict[str, list[_Shard]] = {}
+        for main_path, phonemes, translations in main_path_groups:
+            shard = self.__shards[_shard_key(main_path, self.__shards)]
+            shard.add_group(phonemes, translations, theory)
+
+            for translation in translations:
+                shards = self.__shards_by_translation.setdefault(translation, [])
+                if shard not in shards:
+                    shards.append(shard)
+
+        self.__shards_by_key_prefix: dict[_KeyPrefix, list[_Shard]] = {}
+        self.__max_key_prefix_length = 0
+        self.__indexed_built_shards: set[_Shard] = set()
+        """Built shards whose unpredicted key prefixes are in `__shards_by_key_prefix`"""
+        for shard in self.__shards.values():
+            for key_prefix in shard.predicted_key_prefixes:
+                self.__register_key_prefix(key_prefix, shard)
+
+    @property
+    def n_shards(self):
+        return len(self.__shards)
+
+    @property
+    def n_built_shards(self):
+        return sum(1 for shard in self.__shards.values() if shard.trie is not None)
+
+    @classmethod
+    def build(
+        cls,
+        entries: Iterable[tuple[OutlineSounds, str]],
+        theory: TheoryService,
+        budget: "ExpansionBudget | None"=None,
+        profiler: "BuildProfiler | None"=None,
+        cancel_event: "Event | None"=None,
+        max_shard_size: int=MAX_SHARD_SIZE,
+    ):
+        """Indexes the entries into shards without building any of them. `profiler` is not used, since profiling needs
+        every entry to be built up front."""
+
+        groups = group_entries(entries, cancel_event)
+        plover.log.debug(f"indexed {len(groups.groups):,} phoneme groups from {groups.n_entries:,} entries ({groups.n_duplicate_hits:,} duplicates skipped, {groups.n_homophone_hits:,} homophones batched)")
+
+        sharded_lookup = cls(groups.groups.values(), groups.translation_order, theory, budget, max_shard_size)
+        plover.log.debug(f"split entries into {sharded_lookup.n_shards:,} lazily built shards")
+
+        return sharded_lookup
+
+    def lookup(self, stroke_stenos: tuple[str, ...]) -> Optional[str]:
+        with self.__lock:
+            traversal = self.__traverse(stroke_stenos)
+            if traversal is None:
+                return None
+
+            reached_nodes, n_variation, asterisk = traversal
+            return choose_translation(reached_nodes, n_variation, asterisk, self.theory, self.__translation_order.__getitem__)
+
+    def ranked_translations(self, stroke_stenos: tuple[str, ...]):
+        with self.__lock:
+            traversal = self.__traverse(stroke_stenos)
+            if traversal is None:
+                return []
+
+            translation_choices, _ = rank_translations(traversal[0], self.theory, self.__translation_order.__getitem__)
+            return [translation for translation, _ in translation_choices]
+
+    def reverse_lookup(self, translation: str) -> list[tuple[str, ...]]:
+        with self.__lock:
+            outlines: list[tuple[str, ...]] = []
+            for shard in self.__shards_by_translation.get(translation, ()):
+                trie = self.__build_shard(shard)
+                if shard.reverse_lookup is None:
+                    shard.reverse_lookup = create_reverse_lookup_for(trie, self.theory)
+                outlines.extend(shard.reverse_lookup(translation))
+            return outlines
+
+    def with_changes(
+        self,
+        added: Iterable[tuple[OutlineSounds, str]],
+        removed: Iterable[tuple[OutlineSounds, str]],
+        translation_order: dict[str, int],
+    ):
+        """Returns a lookup with the given entries added and removed, leaving this one unchanged. Shards the changes do
+        not touch are shared between both lookups, built tries included, so only the touched shards are rebuilt.
+        `translation_order` covers every translation after the changes.
+        """
+
+        with self.__lock:
+            shards = dict(self.__shards)
+            replaced_shards: dict[_ShardKey, _Shard] = {}
+
+            def touched_shard(phonemes: OutlineSounds):
+                key = _shard_key(_main_path_keys(phonemes, self.theory), shards)
+                shard = replaced_shards.get(key)
+                if shard is None:
+                    old_shard = shards.get(key)
+                    shard = replaced_shards[key] = old_shard.copy_unbuilt() if old_shard is not None else _Shard(key)
+                    shards[key] = shard
+                return shard
+
+            for phonemes, translation in removed:
+                groups = touched_shard(phonemes).groups
+                signature = phonemes.signature()
+                translations = groups[signature][1]
+                del translations[translation]
+                if len(translations) == 0:
+                    del groups[signature]
+
+            for phonemes, translation in added:
+                shard = touched_shard(phonemes)
+                signature = phonemes.signature()
+                if signature in shard.groups:
+                    shard.groups[signature][1][translation] = None
+                else:
+                    shard.add_group(phonemes, {translation: None}, self.theory)
+
+            # Swap the touched shards into copies of the indexes
+            old_shards = {self.__shards[key]: shard for key, shard in replaced_shards.items() if key in self.__shards}
+
+            shards_by_translation = dict(self.__shards_by_translation)
+            for old_shard in old_shards:
+                for _, translations in old_shard.groups.values():
+                    for translation in translations:
+                        if translation not in shards_by_translation: continue
+                        shards_by_translation[translation] = [shard for shard in shards_by_translation[translation] if shard is not old_shard]
+            for shard in replaced_shards.values():
+                for _, translations in shard.groups.values():
+                    for translation in translations:
+                        translation_shards = shards_by_translation.get(translation, [])
+                        if shard not in translation_shards:
+                            shards_by_translation[translation] = translation_shards + [shard]
+            for translation in [translation for translation, translation_shards in shards_by_translation.items() if len(translation_shards) == 0]:
+                del shards_by_translation[translation]
+
+            shards_by_key_prefix = {
+                key_prefix: [old_shards.get(shard, shard) for shard in key_prefix_shards]
+                for key_prefix, key_prefix_shards in self.__shards_by_key_prefix.items()
+            }
+
+            lookup = ShardedLookup((), translation_order, self.theory, self.budget)
+            lookup.__lock = self.__lock
+            lookup.__shards = shards
+            lookup.__shards_by_translation = shards_by_translation
+            lookup.__shards_by_key_prefix = shards_by_key_prefix
+            lookup.__max_key_prefix_length = self.__max_key_prefix_length
+            lookup.__indexed_built_shards = {shard for shard in self.__indexed_built_shards if shard not in old_shards}
+            for shard in replaced_shards.values():
+                for key_prefix in shard.predicted_key_prefixes:
+                    lookup.__register_key_prefix(key_prefix, shard)
+
+            return lookup
+
+    def memory_report(self):
+        """Counts and estimated sizes of the structures of every shard built so far, with shared objects counted once"""
+
+        from ..util.memory import MemoryReport, deep_sizeof
+
+        with self.__lock:
+            report = MemoryReport(f"{self.n_built_shards:,} of {self.n_shards:,} lookup shards built")
+            seen: set[int] = set()
+
+            trie_totals: dict[str, list[int]] = {}
+            n_transitions = 0
+            for shard in self.__shards.values():
+                if shard.trie is None: continue
+                n_transitions += shard.trie.n_transitions
+                for section in shard.trie.memory_sections(seen):
+                    totals = trie_totals.setdefault(section.name, [0, 0])
+                    totals[0] += section.count
+                    totals[1] += section.n_bytes
+            for name, (count, n_bytes) in trie_totals.items():
+                report.add(f"trie {name}", count, n_bytes)
+
+            report.add("entry groups", sum(len(shard.groups) for shard in self.__shards.values()), sum(deep_sizeof(shard.groups, seen) for shard in self.__shards.values()))
+            report.add("translation index", len(self.__shards_by_translation), deep_sizeof(self.__shards_by_translation, seen))
+            report.add("key prefix index", len(self.__shards_by_key_prefix), deep_sizeof(self.__shards_by_key_prefix, seen))
+            report.notes.append(f"{n_transitions:,} trie transitions")
+
+        return report
+
+    def stats(self):
+        with self.__lock:
+            built_tries = [shard.trie for shard in self.__shards.values() if shard.trie is not None]
+            return {
+                "shards": self.n_shards,
+                "largest shard": max((len(shard.groups) for shard in self.__shards.values()), default=0),
+                "built shards": len(built_tries),
+                "nodes": sum(trie.n_nodes for trie in built_tries),
+                "transitions": sum(trie.n_transitions for trie in built_tries),
+                "cost labels": sum(trie.n_cost_labels for trie in built_tries),
+            }
+
+    def build_all(self, cancel_event: "Event | None"=None):
+        """Builds every shard not built yet, largest first, along with its reverse lookup. Raises `BuildCancelledError` if
+        `cancel_event` is set first."""
+
+        for shard in sorted(self.__shards.values(), key=lambda shard: len(shard.groups), reverse=True):
+            if cancel_event is not None and cancel_event.is_set(): raise BuildCancelledError
+
+            # Build without the lock so that lookups can go on meanwhile, then only take it to swap the shard in
+            trie = shard.trie
+            if trie is None:
+                trie = self.__build_trie(shard)
+            reverse_lookup = shard.reverse_lookup
+            if reverse_lookup is None:
+                reverse_lookup = create_reverse_lookup_for(trie, self.theory)
+
+            with self.__lock:
+                if shard.trie is None:
+                    self.__swap_in_trie(shard, trie)
+                if shard.reverse_lookup is None and shard.trie is trie:
+                    shard.reverse_lookup = reverse_lookup
+                self.__index_built_shard(shard)
+
+    def warm_up_in_background(self, cancel_event: "Event | None"=None):
+        def warm_up():
+            try:
+                self.build_all(cancel_event)
+            except BuildCancelledError:
+                return
+            plover.log.debug(f"built all {self.n_shards:,} lookup shards")
+
+        Thread(target=warm_up, name="hatchery-shard-warm-up", daemon=True).start()
+
+    def __build_shard(self, shard: _Shard):
+        """Builds the shard's trie if needed while holding the lock"""
+
+        if shard.trie is None:
+            self.__swap_in_trie(shard, self.__build_trie(shard))
+        self.__index_built_shard(shard)
+
+        return shard.trie
+
+    def __build_trie(self, shard: _Shard):
+        trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+        add_entry_groups(trie, shard.groups.values(), self.theory, None, self.budget)
+        return trie
+
+    @staticmethod
+    def __swap_in_trie(shard: _Shard, trie: NondeterministicTrie[str, str]):
+        shard.unpredicted_key_prefixes = frozenset(_unpredicted_key_prefixes(trie, shard.predicted_key_prefixes))
+        shard.trie = trie
+
+    def __index_built_shard(self, shard: _Shard):
+        # The shard may have been built by another lookup sharing it, which only indexed its prefixes for itself
+        if shard in self.__indexed_built_shards: return
+
+        for key_prefix in shard.unpredicted_key_prefixes:
+            if self.__register_key_prefix(key_prefix, shard):
+                plover.log.debug(f"lookup shard starts with unpredicted keys {key_prefix}")
+        self.__indexed_built_shards.add(shard)
+
+    def __traverse(self, stroke_stenos: tuple[str, ...]):
+        """Traverses the trie of every shard the outline could reach, building them if needed"""
+
+        reached_nodes = []
+        n_variation = 0
+        asterisk = 0
+        for shard in self.__shards_for_outline(stroke_stenos):
+            trie = self.__build_shard(shard)
+            traversal = traverse(trie, stroke_stenos, self.theory)
+            if traversal is None: continue
+
+            current_nodes, n_variation, asterisk = traversal
+            reached_nodes.append((trie, current_nodes))
+
+        if len(reached_nodes) == 0:
+            return None
+        return reached_nodes, n_variation, asterisk
+
+    def __register_key_prefix(self, key_prefix: _KeyPrefix, shard: _Shard):
+        shards = self.__shards_by_key_prefix.setdefault(key_prefix, [])
+        if shard in shards:
+            return False
+        shards.append(shard)
+        self.__max_key_prefix_length = max(self.__max_key_prefix_length, len(key_prefix))
+        return True
+
+    def __shards_for_outline(self, stroke_stenos: tuple[str, ...]):
+        shards: dict[_Shard, None] = {}
+        for outline_prefix in _outline_key_prefixes(stroke_stenos, self.__max_key_prefix_length, self.theory):
+            for length in range(1, len(outline_prefix) + 1):
+                shards.update(dict.fromkeys(self.__shards_by_key_prefix.get(outline_prefix[:length], ())))
+        return shards
+
+
+def _predicted_key_prefixes(phonemes: OutlineSounds, theory: TheoryService) -> frozenset[_KeyPrefix]:
+    """The key prefixes that the paths `add_entry` builds for the entry could start with: the keys of the chords it could
+    link for the sounds up to the first vowel and the consonant after it, or up to the first consonants of the next group
+    after a stroke boundary or an elided vowel, followed by the first key after them. This follows how `add_entry` links
+    chords, but may include prefixes that it ends up not adding."""
+
+    if len(phonemes.nonfinals) == 0:
+        # Without a vowel, `add_entry` adds no paths
+        return frozenset()
+
+    sounds: list[Sound] = []
+    is_vowel: list[bool] = []
+    group_indices: list[int] = []
+    for group_index, (consonants, vowel) in enumerate(phonemes.nonfinals):
+        sounds.extend((*consonants, vowel))
+        is_vowel.extend((*(False for _ in consonants), True))
+        group_indices.extend(group_index for _ in range(len(consonants) + 1))
+    sounds.extend(phonemes.final_consonants)
+    is_vowel.extend(False for _ in phonemes.final_consonants)
+    group_indices.extend(len(phonemes.nonfinals) for _ in phonemes.final_consonants)
+
+    consonant_indices = [i for i in range(len(sounds)) if not is_vowel[i]]
+    first_vowel_index = len(phonemes.nonfinals[0].consonants)
+
+    def is_consonant(sound_index: int):
+        return sound_index < len(sounds) and not is_vowel[sound_index]
+
+    def is_nonfinal(sound_index: int):
+        return group_indices[sound_index] < len(phonemes.nonfinals)
+
+    def left_chords(sound_index: int):
+        return theory.left_chords[sounds[sound_index].phoneme], theory.left_alt_chords[sounds[sound_index].phoneme]
+
+    def right_chords(sound_index: int):
+        return theory.right_chords[sounds[sound_index].phoneme], theory.right_alt_chords[sounds[sound_index].phoneme]
+
+    # Most of the work goes into matching clusters, so each is matched once, and not at all if the theory has none
+    cluster_chords_by_index: dict[int, tuple[tuple[Stroke, int], ...]] = {}
+    vowel_cluster_chords_by_index: dict[int, tuple[Stroke, ...]] = {}
+
+    def cluster_chords(sound_index: int):
+        """The chords of the consonant clusters starting at the consonant, along with the index of the consonant each ends
+        at"""
+
+        if len(theory.spec.CLUSTERS) == 0: return ()
+
+        chords = cluster_chords_by_index.get(sound_index)
+        if chords is None:
+            consonant_index = consonant_indices.index(sound_index)
+            consonants = [sounds[i] for i in consonant_indices[consonant_index:]]
+            chords = cluster_chords_by_index[sound_index] = tuple(
+                (chord, consonant_indices[consonant_index + n_sounds - 1])
+                for chord, n_sounds in _cluster_chords(theory.clusters_trie, consonants)
+            )
+        return chords
+
+    def vowel_cluster_chords(sound_index: int):
+        if len(theory.spec.VOWEL_CONSCIOUS_CLUSTERS) == 0: return ()
+
+        chords = vowel_cluster_chords_by_index.get(sound_index)
+        if chords is None:
+            chords = vowel_cluster_chords_by_index[sound_index] = tuple(chord for chord, _ in _cluster_chords(theory.vowel_clusters_trie, sounds[sound_index:]))
+        return chords
+
+    def first_keys(chords: "Iterable[Stroke | None]"):
+        return {chord.keys()[0] for chord in chords if chord is not None}
+
+    def keys_starting_left(sound_index: int, include_clusters=True):
+        """The first keys of the left chords of a consonant"""
+        return first_keys((*left_chords(sound_index), *(chord for chord, _ in cluster_chords(sound_index) if include_clusters)))
+
+    def keys_starting_right(sound_index: int):
+        """The first keys of the right chords of a consonant"""
+        return first_keys((*right_chords(sound_index), *(chord for chord, _ in cluster_chords(sound_index))))
+
+    def keys_eliding_vowel(vowel_index: int, include_clusters=True):
+        """The first keys of the left chords that can follow the consonants before a vowel by eliding it"""
+        if not is_consonant(vowel_index + 1) or not is_nonfinal(vowel_index + 1): return set()
+        return keys_starting_left(vowel_index + 1, include_clusters)
+
+    def keys_after_left(sound_index: int):
+        """The first keys that can follow the main left chord of a consonant in a nonfinal group"""
+
+        next_index = sound_index + 1
+        if not is_vowel[next_index]:
+            keys = keys_starting_left(next_index)
+            if group_indices[sound_index] > 0:
+                # Skeletal right chords after the previous left consonant
+                keys.update(first_keys(right_chords(next_index)))
+            return keys
+
+        return {
+            theory.vowel_chords[sounds[next_index].phoneme].rtfcre,
+            *first_keys(vowel_cluster_chords(next_index)),
+            *keys_eliding_vowel(next_index),
+        }
+
+    def keys_after_left_alt(sound_index: int):
+        """The first keys that can follow the left alt chord of a consonant in a nonfinal group, which links to the next
+        consonant, or else the first consonant of the next group with any"""
+
+        later_index = next((i for i in range(sound_index + 1, len(sounds)) if is_consonant(i) and is_nonfinal(i)), None)
+        if later_index is None: return set()
+        return keys_starting_left(later_index, False)
+
+    def key_prefixes_starting_left(sound_index: int) -> set[_KeyPrefix]:
+        """The keys of the left chords that can start the consonants of a nonfinal group after a stroke boundary or an
+        elided vowel, along with the first key after each"""
+
+        main_chord, alt_chord = left_chords(sound_index)
+        key_prefixes: set[_KeyPrefix] = set()
+        if main_chord is not None:
+            key_prefixes.update(main_chord.keys() + (key,) for key in keys_after_left(sound_index))
+        if alt_chord is not None:
+            # An elided alt chord also links to the main node of the consonant
+            key_prefixes.update(alt_chord.keys() + (key,) for key in (*keys_after_left(sound_index), *keys_after_left_alt(sound_index)))
+        for chord, end_index in cluster_chords(sound_index):
+            if not is_nonfinal(end_index): continue
+            key_prefixes.update(chord.keys() + (key,) for key in keys_after_left(end_index))
+        return key_prefixes
+
+    def keys_after_right(sound_index: int):
+        """The keys that can follow the main right chord of the consonant after the first vowel, or none at the end"""
+
+        keys: set[_KeyPrefix] = set()
+        if sound_index + 1 == len(sounds):
+            keys.add(())
+        if is_nonfinal(sound_index):
+            keys.add((TRIE_STROKE_BOUNDARY_KEY,))
+            vowel_index = next(i for i in range(sound_index, len(sounds)) if is_vowel[i])
+            keys.update((key,) for key in first_keys(vowel_cluster_chords(vowel_index)))
+
+        if is_consonant(sound_index + 1) and group_indices[sound_index + 1] == group_indices[sound_index]:
+            keys.update((key,) for key in keys_starting_right(sound_index + 1))
+
+        # Eliding vowels using the first right chord of a later group, which can skip groups whose consonants have no
+        # right chords
+        for i in range(sound_index + 1, len(sounds)):
+            if is_consonant(i) and group_indices[i] != group_indices[sound_index] and is_vowel[i - 1]:
+                keys.update((key,) for key in keys_starting_right(i))
+        return keys
+
+    # Paths through the postvowel node of the first vowel
+    vowel_chord_keys = (theory.vowel_chords[sounds[first_vowel_index].phoneme].rtfcre,)
+    key_prefixes_after_boundary: set[_KeyPrefix] = set()
+    if len(phonemes.nonfinals) > 1:
+        next_index = first_vowel_index + 1
+        if is_consonant(next_index):
+            key_prefixes_after_boundary = key_prefixes_starting_left(next_index)
+        else:
+            key_prefixes_after_boundary = {
+                (TRIE_LINKER_KEY, theory.vowel_chords[sounds[next_index].phoneme].rtfcre),
+                *(chord.keys() for chord in vowel_cluster_chords(next_index)),
+            }
+
+    keys_after_first_vowel: set[_KeyPrefix] = {(TRIE_STROKE_BOUNDARY_KEY, *keys) for keys in key_prefixes_after_boundary}
+    next_index = first_vowel_index + 1
+    if next_index == len(sounds):
+        keys_after_first_vowel.add(())
+    elif is_vowel[next_index]:
+        keys_after_first_vowel.update(chord.keys() for chord in vowel_cluster_chords(next_index))
+    else:
+        right_chord, right_alt_chord = right_chords(next_index)
+        if right_chord is not None:
+            keys_after_first_vowel.update(right_chord.keys() + keys for keys in keys_after_right(next_index))
+        if right_alt_chord is not None:
+            keys_after_first_vowel.add(right_alt_chord.keys())
+        keys_after_first_vowel.update(chord.keys() for chord, _ in cluster_chords(next_index))
+
+    if first_vowel_index == 0:
+        prefixes = {vowel_chord_keys + keys for keys in keys_after_first_vowel}
+        if theory.spec.INITIAL_VOWEL_CHORD is not None:
+            prefixes.update(theory.spec.INITIAL_VOWEL_CHORD.keys() + keys for keys in key_prefixes_after_boundary)
+        prefixes.update(chord.keys() for chord in vowel_cluster_chords(0))
+        return frozenset(prefixes)
+
+    # Follow the chords of the first group's consonants the way `add_entry` chains them: main and alt chords lead to the
+    # next consonant, clusters lead to the consonant they end at, and only main chords and clusters lead to the vowel
+    prefixes: set[_KeyPrefix] = set()
+    def visit(sound_index: int, after_alt: bool, key_prefix: _KeyPrefix):
+        if sound_index == first_vowel_index:
+            if after_alt:
+                # The alt chord links to the first consonant of the next group with any, skipping groups without
+                later_index = next((i for i in range(first_vowel_index + 1, len(sounds)) if is_consonant(i) and is_nonfinal(i)), None)
+                if later_index is not None:
+                    prefixes.update(key_prefix + keys for keys in key_prefixes_starting_left(later_index))
+                return
+
+            prefixes.update(key_prefix + vowel_chord_keys + keys for keys in keys_after_first_vowel)
+            prefixes.update(key_prefix + chord.keys() for chord in vowel_cluster_chords(first_vowel_index))
+            if is_consonant(first_vowel_index + 1) and is_nonfinal(first_vowel_index + 1):
+                # Eliding the vowel into the consonants of the next group
+                prefixes.update(key_prefix + keys for keys in key_prefixes_starting_left(first_vowel_index + 1))
+            return
+
+        main_chord, alt_chord = left_chords(sound_index)
+        if main_chord is not None:
+            visit(sound_index + 1, False, key_prefix + main_chord.keys())
+        if alt_chord is not None:
+            visit(sound_index + 1, True, key_prefix + alt_chord.keys())
+        if after_alt: return
+
+        for chord, end_index in cluster_chords(sound_index):
+            if end_index < first_vowel_index:
+                visit(end_index + 1, False, key_prefix + chord.keys())
+            elif is_nonfinal(end_index):
+                prefixes.update(key_prefix + chord.keys() + (key,) for key in keys_after_left(end_index))
+            # Clusters ending among the final consonants have no left consonant to link to
+
+    visit(0, False, ())
+    return frozenset(prefixes)
+
+def _shard_key(main_path: _KeyPrefix, shards: "dict[_ShardKey, _Shard]") -> _ShardKey:
+    """The key of the shard for an entry with the given main path: the longest key of the shards that the path starts
+    with, or else the first key of the path for a new shard"""
+
+    for length in range(len(main_path), -1, -1):
+        if main_path[:length] in shards:
+            return main_path[:length]
+    return main_path[:1]
+
+def _main_path_keys(phonemes: OutlineSounds, theory: TheoryService) -> _KeyPrefix:
+    """The keys of the path that writes the entry with the main chords of its sounds, stroke by stroke. The path may not
+    exist when a sound has no main chord, in which case it stops there."""
+
+    if len(phonemes.nonfinals) == 0:
+        return ()
+
+    keys: list[str] = []
+    for group_index, (consonants, vowel) in enumerate(phonemes.nonfinals):
+        if group_index > 0:
+            keys.append(TRIE_STROKE_BOUNDARY_KEY)
+            if len(consonants) == 0:
+                keys.append(TRIE_LINKER_KEY)
+
+        for consonant in consonants:
+            chord = theory.left_chords[consonant.phoneme]
+            if chord is None:
+                return tuple(keys)
+            keys.extend(chord.keys())
+
+        keys.append(theory.vowel_chords[vowel.phoneme].rtfcre)
+
+    for consonant in phonemes.final_consonants:
+        chord = theory.right_chords[consonant.phoneme]
+        if chord is None: break
+        keys.extend(chord.keys())
+
+    return tuple(keys)
+
+def _split_shard_keys(main_paths: "list[_KeyPrefix]", max_shard_size: int, length: int=0) -> Iterable[_ShardKey]:
+    """Splits main paths that share their first `length` keys by ever more of their keys, until each shard key is the
+    prefix of at most `max_shard_size` of them or of paths that all end there"""
+
+    if len(main_paths) <= max_shard_size or all(len(main_path) <= length for main_path in main_paths):
+        yield main_paths[0][:length]
+        return
+
+    main_paths_by_prefix: dict[_KeyPrefix, list[_KeyPrefix]] = {}
+    for main_path in main_paths:
+        main_paths_by_prefix.setdefault(main_path[:length + 1], []).append(main_path)
+    for prefix_main_paths in main_paths_by_prefix.values():
+        yield from _split_shard_keys(prefix_main_paths, max_shard_size, length + 1)
+
+def _cluster_chords(clusters_trie: "ReadonlyTrie[int, Stroke]", sounds: "list[Sound]"):
+    """The chords of the clusters that start `sounds`, along with the number of sounds each covers. A cluster may match
+    any vowel by `ANY_VOWEL_CODE`."""
+
+    current_nodes = {clusters_trie.ROOT}
+    for n_sounds, sound in enumerate(sounds, 1):
+        current_nodes = {
+            dst_node
+            for node in current_nodes
+            for dst_node in (clusters_trie.get_dst_node(node, sound.phoneme), clusters_trie.get_dst_node(node, ANY_VOWEL_CODE) if IS_VOWEL_CODE[sound.phoneme] else None)
+            if dst_node is not None
+        }
+        if len(current_nodes) == 0:
+            return
+
+        for node in current_nodes:
+            chord = clusters_trie.get_translation(node)
+            if chord is not None and int(chord) != 0:
+                yield chord, n_sounds
+
+def _outline_key_prefixes(stroke_stenos: tuple[str, ...], length: int, theory: TheoryService):
+    """The first `length` keys that a lookup could take from the root for the outline, following `advance`, or fewer if
+    the outline ends first"""
+
+    # Each step of the traversal is one of a few alternative key sequences, which may be empty
+    steps: list[tuple[tuple[str, ...], ...]] = []
+    for i, stroke_steno in enumerate(stroke_stenos):
+        stroke = theory.steno_to_mask(stroke_steno)
+        if stroke == 0 or stroke == theory.cycler_mask:
+            break
+
+        # Steps that always take a key are enough once there are as many as there are keys to find
+        if sum(1 for alternatives in steps if () not in alternatives) >= length:
+            break
+
+        if i > 0:
+            steps.append(((TRIE_STROKE_BOUNDARY_KEY,),))
+
+        left_bank_consonants, vowels, right_bank_consonants, asterisk = theory.split_mask_parts(stroke)
+        asterisk_keys = theory.mask_keys(asterisk)
+
+        if left_bank_consonants != 0:
+            if asterisk != 0:
+                for key in theory.mask_keys(left_bank_consonants):
+                    steps.append(((key,),))
+                    steps.append(((), asterisk_keys))
+            elif left_bank_consonants == theory.linker_mask:
+                steps.append((theory.mask_keys(left_bank_consonants), (TRIE_LINKER_KEY,)))
+            else:
+                steps.extend(((key,),) for key in theory.mask_keys(left_bank_consonants))
+
+        if vowels != 0:
+            steps.append(((theory.mask_to_steno(vowels),),))
+
+        if right_bank_consonants != 0:
+            for key in theory.mask_keys(right_bank_consonants):
+                if asterisk != 0:
+                    steps.append(((), asterisk_keys))
+                steps.append(((key,),))
+
+    prefixes: set[_KeyPrefix] = {()}
+    for alternatives in steps:
+        prefixes = {(prefix + keys)[:length] for prefix in prefixes for keys in alternatives}
+    return prefixes
+
+def _unpredicted_key_prefixes(trie: NondeterministicTrie[str, str], predicted_key_prefixes: "set[_KeyPrefix] | frozenset[_KeyPrefix]"):
+    """Prefixes of the paths out of the root of a built trie that do not start with any of the predicted prefixes, cut
+    off at the length of the longest predicted prefix or where a translation is reached. Paths that cannot reach a
+    translation are left out."""
+
+    length = max((len(key_prefix) for key_prefix in predicted_key_prefixes), default=1)
+    key_prefixes: set[_KeyPrefix] = set()
+
+    def has_translation(node: int):
+        return len(trie.get_translations_and_costs_single(node, (), ())) > 0
+
+    def dst_nodes(node: int):
+        for key in trie.get_keys_from(node):
+            for dst_node in trie.get_dst_nodes({node: ()}, key):
+                yield key, dst_node
+
+    def reaches_translation(node: int):
+        visited = {node}
+        stack = [node]
+        while len(stack) > 0:
+            node = stack.pop()
+            if has_translation(node):
+                return True
+            for _, dst_node in dst_nodes(node):
+                if dst_node in visited: continue
+                visited.add(dst_node)
+                stack.append(dst_node)
+        return False
+
+    def visit(node: int, key_prefix: _KeyPrefix):
+        if key_prefix in predicted_key_prefixes: return
+
+        if len(key_prefix) > 0 and has_translation(node) or len(key_prefix) == length and reaches_translation(node):
+            key_prefixes.add(key_prefix)
+            return
+        if len(key_prefix) == length: return
+
+        for key, dst_node in dst_nodes(node):
+            visit(dst_node, key_prefix + (key,))
+
+    visit(trie.ROOT, ())
+    return key_prefixes
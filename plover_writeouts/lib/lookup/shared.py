@@ -0,0 +1,174 @@
+"""Compiled tries shared between local processes, e.g., Plover, a suggestion daemon, and batch jobs that all use the same
+Hatchery dictionary.
+
+Each trie is written once to a file named after the hash of the dictionary file and build settings it came from, and
+every process that needs it maps that file read-only. The operating system keeps one copy of the mapped pages no matter how many
+processes attach, and nothing is parsed or copied on attach. Files rather than `multiprocessing.shared_memory` segments
+are used so that a trie outlives the process that built it and is not unlinked by the creator's resource tracker, which
+also lets Plover attach to the trie from its previous session on startup.
+"""
+
+from hashlib import blake2b
+from pathlib import Path
+from typing import NamedTuple
+import mmap
+import os
+
+import plover.log
+
+from ..theory.service import TheoryService
+from ..util.compiled_trie import CompiledTrie
+from .incremental import build_key
+
+_SUFFIX = ".hatchtrie"
+
+
+class SharedTrieInfo(NamedTuple):
+    source_hash: str
+    path: Path
+    n_bytes: int
+    modified_time: float
+
+
+class SharedTrieRegistry:
+    """A directory of compiled tries, each in a file named by its source hash.
+
+    A source hash of the form `{dictionary}-{contents}`, as `file_source_hash` gives, ties the trie to one dictionary
+    file, and publishing it removes the tries built from that file's earlier contents.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+
+        self.__attached: dict[str, CompiledTrie] = {}
+        """Tries this process has already mapped, so that attaching again reuses the mapping"""
+
+    def attach(self, source_hash: str) -> "CompiledTrie | None":
+        """Maps the trie for `source_hash` read-only, or returns None if no process has published it yet"""
+
+        compiled = self.__attached.get(source_hash)
+        if compiled is not None:
+            return compiled
+
+        path = self.path_for(source_hash)
+        try:
+            with open(path, "rb") as file:
+                buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # `mmap` raises `ValueError` for an empty file
+            return None
+
+        try:
+            compiled, file_source_hash = CompiledTrie.from_buffer(buffer)
+        except ValueError as error:
+            plover.log.warning(f"ignoring shared trie {path}: {error}")
+            return None
+
+        if file_source_hash != source_hash:
+            plover.log.warning(f"ignoring shared trie {path}, which was built from {file_source_hash}")
+            return None
+
+        self.__attached[source_hash] = compiled
+        return compiled
+
+    def publish(self, source_hash: str, compiled: CompiledTrie):
+        """Writes a trie for other processes to attach to, then attaches to it. If several processes publish the same
+        source hash at once, the last one to finish wins, which is harmless since their tries are identical."""
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        path = self.path_for(source_hash)
+        temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp_path, "wb") as file:
+                compiled.write(file, source_hash)
+            os.replace(temp_path, path)
+        except PermissionError:
+            # On Windows, a file cannot be replaced while another process has it mapped, which means it already exists
+            temp_path.unlink(missing_ok=True)
+
+        attached = self.attach(source_hash)
+        if attached is None:
+            raise RuntimeError(f"could not attach to the trie just published at {path}")
+
+        plover.log.debug(f"published shared trie {path}")
+        self.__remove_outdated(source_hash)
+        return attached
+
+    def entries(self):
+        """Every trie in the registry, most recently written first"""
+
+        if not self.directory.exists():
+            return []
+
+        infos: list[SharedTrieInfo] = []
+        for path in self.directory.glob(f"*{_SUFFIX}"):
+            stat = path.stat()
+            infos.append(SharedTrieInfo(path.name[:-len(_SUFFIX)], path, stat.st_size, stat.st_mtime))
+        return sorted(infos, key=lambda info: info.modified_time, reverse=True)
+
+    def remove(self, source_hash: str):
+        """Removes a trie from the registry. Processes already attached to it keep their mapping."""
+
+        try:
+            self.path_for(source_hash).unlink()
+        except FileNotFoundError:
+            return False
+        except PermissionError:
+            # Still mapped by some process on Windows
+            return False
+        return True
+
+    def path_for(self, source_hash: str):
+        return self.directory / f"{source_hash}{_SUFFIX}"
+
+    def __remove_outdated(self, source_hash: str):
+        dictionary, separator, _ = source_hash.partition("-")
+        if len(separator) == 0:
+            return
+
+        for info in self.entries():
+            if info.source_hash != source_hash and info.source_hash.startswith(f"{dictionary}-") and self.remove(info.source_hash):
+                plover.log.debug(f"removed outdated shared trie {info.path}")
+
+
+def default_registry_dir():
+    return Path(plover.log.LOG_FILENAME).parent / "hatchery-shared"
+
+def default_registry():
+    """The registry in Plover's config folder, shared by every dictionary in this process"""
+
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = SharedTrieRegistry(default_registry_dir())
+    return _default_registry
+
+_default_registry: "SharedTrieRegistry | None" = None
+
+
+class SharedTrieSource(NamedTuple):
+    """Where a build attaches to or publishes its trie"""
+
+    registry: SharedTrieRegistry
+    source_hash: str
+
+    @staticmethod
+    def for_file(registry: SharedTrieRegistry, path: "str | Path", theory: TheoryService):
+        return SharedTrieSource(registry, file_source_hash(path, theory))
+
+
+def file_source_hash(path: "str | Path", theory: TheoryService):
+    """Identifies a trie by the dictionary file it is built from, as `{dictionary}-{contents}`: `dictionary` hashes the
+    file's path, and `contents` hashes its bytes along with everything else that decides how it builds. The file is read
+    in chunks, and none of its entries are decoded."""
+
+    dictionary_digest = blake2b(os.path.abspath(path).encode("utf-8"), digest_size=8)
+
+    contents_digest = blake2b(build_key(theory).encode("utf-8"), digest_size=16)
+    with open(path, "rb") as file:
+        while len(chunk := file.read(_HASH_CHUNK_SIZE)) > 0:
+            contents_digest.update(chunk)
+
+    return f"{dictionary_digest.hexdigest()}-{contents_digest.hexdigest()}"
+
+_HASH_CHUNK_SIZE = 1 << 20
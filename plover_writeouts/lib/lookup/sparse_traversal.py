@@ -0,0 +1,443 @@
+"""Traversal of a `CompiledTrie` for a whole batch of outlines at once using NumPy.
+
+The transitions taken with each key form a sparse adjacency matrix between nodes, and each outline's set of current
+nodes is a sparse row vector. Every step advances all outlines in the batch together by multiplying their frontiers by
+the matrix of the key each outline takes next, which is done as a gather over the rows of the transition groups rather
+than with a general sparse matrix library. Each frontier entry keeps a pointer to the path that reached it, so costs are
+only resolved once, for the nodes that the outlines end on.
+
+Results match `traverse` and `choose_translation` exactly, including which path is kept when several reach the same
+node and how ties between translations of equal cost are ordered.
+"""
+
+from itertools import chain
+from typing import Optional, Sequence
+
+import numpy as np
+
+from ..util.compiled_trie import CompiledTrie
+from ..util.config import TRIE_STROKE_BOUNDARY_KEY, TRIE_LINKER_KEY
+from ..theory.service import TheoryService
+
+
+_NOP = -1
+_PUSH = -2
+"""Saves a copy of the frontier"""
+_SWAP = -3
+"""Exchanges the frontier with the saved frontier"""
+_UNION = -4
+"""Merges the frontier into the saved frontier, as `saved |= frontier` would with dicts, and makes that the frontier"""
+_MISSING_KEY = -5
+"""Steps with a key that the trie does not have, which empties the frontier"""
+
+_INVALID_STROKE = 0
+_CYCLER_STROKE = 1
+_KEYS_STROKE = 2
+
+_MAX_COMPILED_STROKES = 1 << 16
+"""Strokes kept compiled before the stroke table is cleared, since the strokes come from clients and need not be valid"""
+
+_Rows = tuple[np.ndarray, np.ndarray, np.ndarray]
+"""Parallel arrays of outline indices, nodes, and path ids. The rows of each outline are in the order that `traverse`'s
+dict of current nodes would be in."""
+
+
+class SparseBatchTraversal:
+    def __init__(self, compiled: CompiledTrie, theory: TheoryService):
+        self.compiled = compiled
+        self.theory = theory
+
+        self.__n_keys = len(compiled.keys)
+        self.__n_values = len(compiled.values)
+        self.__key_ids = {key: key_id for key_id, key in enumerate(compiled.keys)}
+
+        self.__group_codes = np.frombuffer(compiled.group_codes, dtype=np.int64)
+        self.__group_starts = np.frombuffer(compiled.group_starts, dtype=np.int64)
+        self.__dst_nodes = np.frombuffer(compiled.dst_nodes, dtype=np.int64)
+        self.__translation_starts = np.frombuffer(compiled.translation_starts, dtype=np.int64)
+        self.__translation_value_ids = np.frombuffer(compiled.translation_value_ids, dtype=np.int64)
+        self.__label_codes = np.frombuffer(compiled.label_codes, dtype=np.int64)
+
+        self.__boundary_key_id = self.__key_ids.get(TRIE_STROKE_BOUNDARY_KEY, _MISSING_KEY)
+        self.__linker_key_id = self.__key_ids.get(TRIE_LINKER_KEY, _MISSING_KEY)
+        self.__asterisk_key_id = self.__key_ids.get(theory.mask_to_steno(theory.asterisk_mask), _MISSING_KEY)
+
+        self.__strokes = _StrokeTable()
+        self.__label_costs: "tuple[tuple[float, ...], np.ndarray] | None" = None
+        """The cheapest weighted cost of each cost label, and the weights it was computed with"""
+
+    def ranked_translations(self, outlines: Sequence[tuple[str, ...]]):
+        """Every translation each outline reaches, ordered as `rank_translations` would"""
+
+        _, _, choices, _ = self.__rank(outlines)
+        return [
+            [self.compiled.values[value_id] for value_id, _ in outline_choices]
+            for outline_choices in choices
+        ]
+
+    def lookup(self, outlines: Sequence[tuple[str, ...]]) -> list[Optional[str]]:
+        n_variations, asterisks, choices, path_table = self.__rank(outlines)
+
+        results: list[Optional[str]] = []
+        for n_variation, asterisk, outline_choices in zip(n_variations.tolist(), asterisks.tolist(), choices):
+            if len(outline_choices) == 0:
+                results.append(None)
+            elif asterisk == 0 or self.__path_has_asterisk_in_last_stroke(path_table.path(outline_choices[0][1])):
+                results.append(self.compiled.values[outline_choices[n_variation % len(outline_choices)][0]])
+            elif len(outline_choices) > 1:
+                results.append(self.compiled.values[outline_choices[(n_variation + 1) % len(outline_choices)][0]])
+            else:
+                results.append(None)
+
+        return results
+
+    def __rank(self, outlines: Sequence[tuple[str, ...]]):
+        """The number of cycler presses and the asterisk of each outline, along with its translations from cheapest to
+        costliest as pairs of value ids and the path id of their cheapest match"""
+
+        op_matrix, n_variations, asterisks = self.__programs(outlines)
+        (outline_indices, nodes, paths), path_table = self.__traverse(op_matrix)
+
+        choices: list[list[tuple[int, int]]] = [[] for _ in outlines]
+
+        # Every translation at every reached node, in the order `get_translations_and_costs` would visit them
+        starts = self.__translation_starts[nodes]
+        counts = self.__translation_starts[nodes + 1] - starts
+        rows = np.repeat(np.arange(len(nodes)), counts)
+        value_ids = self.__translation_value_ids[np.repeat(starts, counts) + _offsets_within(counts)]
+        if len(value_ids) == 0:
+            return n_variations, asterisks, choices, path_table
+
+        pair_outlines = outline_indices[rows]
+        pair_paths = paths[rows]
+        costs = self.__path_costs(path_table, pair_paths, value_ids)
+
+        # The first cheapest match of each translation, with ties between translations broken by value id, which follows
+        # the order of the entries
+        positions = np.arange(len(value_ids))
+        order = np.lexsort((positions, costs, value_ids, pair_outlines))
+        group_starts = np.flatnonzero(np.r_[True, (np.diff(pair_outlines[order]) != 0) | (np.diff(value_ids[order]) != 0)])
+        winners = order[group_starts]
+
+        winners = winners[np.lexsort((value_ids[winners], costs[winners], pair_outlines[winners]))]
+        for outline_index, value_id, path in zip(pair_outlines[winners].tolist(), value_ids[winners].tolist(), pair_paths[winners].tolist()):
+            choices[outline_index].append((value_id, path))
+        return n_variations, asterisks, choices, path_table
+
+    def __programs(self, outlines: Sequence[tuple[str, ...]]):
+        """Compiles every outline into a row of operations, mirroring the steps and checks of `traverse`. Outlines that
+        `traverse` would reject get a row that empties their frontier."""
+
+        new_stroke_stenos = set(chain.from_iterable(outlines)).difference(self.__strokes.ids)
+        if len(self.__strokes.ids) + len(new_stroke_stenos) > _MAX_COMPILED_STROKES:
+            self.__strokes = _StrokeTable()
+            new_stroke_stenos = set(chain.from_iterable(outlines))
+
+        strokes = self.__strokes
+        for stroke_steno in new_stroke_stenos:
+            strokes.add(stroke_steno, *self.__compile_stroke(stroke_steno))
+        kinds, stroke_asterisks, op_starts, op_lengths, ops = strokes.arrays()
+
+        n_outlines = len(outlines)
+        n_strokes = np.fromiter(map(len, outlines), dtype=np.int64, count=n_outlines)
+        stroke_ids = np.fromiter(map(strokes.ids.__getitem__, chain.from_iterable(outlines)), dtype=np.int64, count=int(n_strokes.sum()))
+        stroke_outlines = np.repeat(np.arange(n_outlines), n_strokes)
+        stroke_kinds = kinds[stroke_ids]
+
+        # Cycler presses may only end an outline
+        is_cycler = stroke_kinds == _CYCLER_STROKE
+        is_keys = stroke_kinds == _KEYS_STROKE
+        is_rejected = (stroke_kinds == _INVALID_STROKE) | (is_keys & (_cumsum_within(is_cycler, n_strokes) > 0))
+        outline_rejected = np.bincount(stroke_outlines, weights=is_rejected, minlength=n_outlines) > 0
+        n_variations = np.bincount(stroke_outlines, weights=is_cycler, minlength=n_outlines).astype(np.int64)
+
+        keys_strokes = np.flatnonzero(is_keys & ~outline_rejected[stroke_outlines])
+        keys_stroke_outlines = stroke_outlines[keys_strokes]
+
+        asterisks = np.zeros(n_outlines, dtype=np.int64)
+        last_keys_strokes = keys_strokes[np.r_[np.diff(keys_stroke_outlines) != 0, True]] if len(keys_strokes) > 0 else keys_strokes
+        asterisks[stroke_outlines[last_keys_strokes]] = stroke_asterisks[stroke_ids[last_keys_strokes]]
+
+        # Every stroke after the first starts by crossing the stroke boundary
+        n_keys_strokes = np.bincount(keys_stroke_outlines, minlength=n_outlines)
+        variants = (_cumsum_within(np.ones(len(keys_strokes), dtype=np.int64), n_keys_strokes) > 0).astype(np.int64)
+        segment_starts = op_starts[stroke_ids[keys_strokes], variants]
+        segment_lengths = op_lengths[stroke_ids[keys_strokes], variants]
+
+        n_outline_ops = np.bincount(keys_stroke_outlines, weights=segment_lengths, minlength=n_outlines).astype(np.int64)
+        op_matrix = np.full((n_outlines, int(n_outline_ops.max(initial=0)) + 1), _NOP, dtype=np.int64)
+        op_matrix[outline_rejected, 0] = _MISSING_KEY
+
+        segment_columns = _cumsum_within(segment_lengths, n_keys_strokes)
+        op_matrix[
+            np.repeat(keys_stroke_outlines, segment_lengths),
+            np.repeat(segment_columns, segment_lengths) + _offsets_within(segment_lengths),
+        ] = ops[np.repeat(segment_starts, segment_lengths) + _offsets_within(segment_lengths)]
+
+        return op_matrix, n_variations, asterisks
+
+    def __traverse(self, op_matrix: np.ndarray):
+        """The nodes each outline ends on, along with the paths that reached them"""
+
+        n_outlines = len(op_matrix)
+
+        path_table = _PathTable()
+        frontier: _Rows = (np.arange(n_outlines, dtype=np.int64), np.zeros(n_outlines, dtype=np.int64), np.zeros(n_outlines, dtype=np.int64))
+        saved = _EMPTY_ROWS
+
+        for ops in op_matrix.T:
+            if len(frontier[0]) == 0 and len(saved[0]) == 0: break
+
+            frontier_ops = ops[frontier[0]]
+            saved_ops = ops[saved[0]]
+
+            parts = [_select(frontier, (frontier_ops == _NOP) | (frontier_ops == _PUSH))]
+
+            is_step = frontier_ops >= 0
+            parts.append(self.__step(_select(frontier, is_step), frontier_ops[is_step], path_table))
+
+            is_swapped = saved_ops == _SWAP
+            parts.append(_select(saved, is_swapped))
+
+            is_merged = saved_ops == _UNION
+            parts.append(_deduplicated(_concat((_select(saved, is_merged), _select(frontier, frontier_ops == _UNION))), self.compiled.n_nodes))
+
+            saved = _concat((
+                _select(saved, ~(is_swapped | is_merged)),
+                _select(frontier, (frontier_ops == _PUSH) | (frontier_ops == _SWAP)),
+            ))
+            frontier = _concat(parts)
+
+        path_table.freeze()
+        return frontier, path_table
+
+    def __step(self, rows: _Rows, key_ids: np.ndarray, path_table: "_PathTable"):
+        """Advances each row by its key, as `get_dst_nodes` would"""
+
+        outline_indices, nodes, paths = rows
+        if len(self.__group_codes) == 0:
+            return _EMPTY_ROWS
+
+        codes = nodes * self.__n_keys + key_ids
+        groups = np.minimum(np.searchsorted(self.__group_codes, codes), len(self.__group_codes) - 1)
+        has_transitions = self.__group_codes[groups] == codes
+        outline_indices, paths, groups = outline_indices[has_transitions], paths[has_transitions], groups[has_transitions]
+
+        starts = self.__group_starts[groups]
+        counts = self.__group_starts[groups + 1] - starts
+        rows_taken = np.repeat(np.arange(len(groups)), counts)
+        transitions = np.repeat(starts, counts) + _offsets_within(counts)
+
+        new_paths = path_table.add(paths[rows_taken], transitions)
+        return _deduplicated((outline_indices[rows_taken], self.__dst_nodes[transitions], new_paths), self.compiled.n_nodes)
+
+    def __path_costs(self, path_table: "_PathTable", paths: np.ndarray, value_ids: np.ndarray):
+        """The cost of each path for the corresponding value, summed from the root in the same order as
+        `get_translations_and_costs_single` so that ties break the same way"""
+
+        label_costs = self.__weighted_label_costs()
+
+        costs_by_depth: list[np.ndarray] = []
+        current = paths
+        while len(label_costs) > 0:
+            is_active = current > 0
+            if not is_active.any(): break
+
+            codes = path_table.transitions[current] * self.__n_values + value_ids
+            labels = np.minimum(np.searchsorted(self.__label_codes, codes), len(self.__label_codes) - 1)
+            has_label = is_active & (self.__label_codes[labels] == codes)
+            costs_by_depth.append(np.where(has_label, label_costs[labels], 0.0))
+
+            current = np.where(is_active, path_table.parents[current], 0)
+
+        total = np.zeros(len(paths))
+        for costs in reversed(costs_by_depth):
+            total = total + costs
+        return total
+
+    def __weighted_label_costs(self):
+        weights = self.theory.transition_cost_weights()
+        if self.__label_costs is not None and self.__label_costs[0] == weights:
+            return self.__label_costs[1]
+
+        compiled = self.compiled
+
+        # Accumulated one category at a time, as `TransitionCategoryCounts.weighted` does
+        option_costs = np.zeros(compiled.label_option_starts[-1])
+        if compiled.n_categories > 0:
+            option_counts = np.frombuffer(compiled.option_counts, dtype=np.int64).reshape(-1, compiled.n_categories)
+            for category, weight in enumerate(weights[:compiled.n_categories]):
+                option_costs = option_costs + option_counts[:, category] * weight
+
+        label_option_starts = np.frombuffer(compiled.label_option_starts, dtype=np.int64)
+        label_costs = np.minimum.reduceat(option_costs, label_option_starts[:-1]) if len(compiled.label_codes) > 0 else np.zeros(0)
+
+        self.__label_costs = (weights, label_costs)
+        return label_costs
+
+    def __path_has_asterisk_in_last_stroke(self, transitions: tuple[int, ...]):
+        for transition in reversed(transitions):
+            group = int(np.searchsorted(self.__group_starts, transition, side="right")) - 1
+            key_id = int(self.__group_codes[group]) % self.__n_keys
+            if key_id == self.__boundary_key_id:
+                return False
+            if key_id == self.__asterisk_key_id:
+                return True
+        return False
+
+    def __compile_stroke(self, stroke_steno: str) -> tuple[int, tuple[int, ...], int]:
+        """The kind of a stroke, the operations that traverse it, and its asterisk"""
+
+        theory = self.theory
+
+        stroke = theory.steno_to_mask(stroke_steno)
+        if stroke == 0:
+            return _INVALID_STROKE, (), 0
+        if stroke == theory.cycler_mask:
+            return _CYCLER_STROKE, (), 0
+        if stroke & ~theory.all_keys_mask != 0 or stroke in theory.prohibited_masks:
+            return _INVALID_STROKE, (), 0
+
+        left_bank_consonants, vowels, right_bank_consonants, asterisk = theory.split_mask_parts(stroke)
+        asterisk_ops = tuple(self.__key_id(key) for key in theory.mask_keys(asterisk))
+
+        ops: list[int] = []
+        if left_bank_consonants != 0:
+            if asterisk != 0:
+                for key in theory.mask_keys(left_bank_consonants):
+                    ops.extend((self.__key_id(key), _PUSH, *asterisk_ops, _UNION))
+            elif left_bank_consonants == theory.linker_mask:
+                ops.extend((_PUSH, *(self.__key_id(key) for key in theory.mask_keys(left_bank_consonants)), _SWAP, self.__linker_key_id, _UNION))
+            else:
+                ops.extend(self.__key_id(key) for key in theory.mask_keys(left_bank_consonants))
+
+        if vowels != 0:
+            ops.append(self.__key_id(theory.mask_to_steno(vowels)))
+
+        if right_bank_consonants != 0:
+            if asterisk != 0:
+                for key in theory.mask_keys(right_bank_consonants):
+                    ops.extend((_PUSH, *asterisk_ops, _UNION, self.__key_id(key)))
+            else:
+                ops.extend(self.__key_id(key) for key in theory.mask_keys(right_bank_consonants))
+
+        return _KEYS_STROKE, (self.__boundary_key_id, *ops), asterisk
+
+    def __key_id(self, key: str):
+        return self.__key_ids.get(key, _MISSING_KEY)
+
+
+class _StrokeTable:
+    """The compiled operations of every stroke seen so far. Each stroke has two variants of its operations: as the
+    first stroke of an outline, and as a later stroke, which first crosses the stroke boundary."""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.__kinds: list[int] = []
+        self.__asterisks: list[int] = []
+        self.__op_starts: list[tuple[int, int]] = []
+        self.__op_lengths: list[tuple[int, int]] = []
+        self.__ops: list[int] = []
+        self.__arrays: "tuple[np.ndarray, ...] | None" = None
+
+    def add(self, stroke_steno: str, kind: int, ops_after_boundary: tuple[int, ...], asterisk: int):
+        """Adds a stroke given its operations as a later stroke"""
+
+        self.ids[stroke_steno] = len(self.__kinds)
+        self.__kinds.append(kind)
+        self.__asterisks.append(asterisk)
+
+        start = len(self.__ops)
+        self.__ops.extend(ops_after_boundary)
+        if len(ops_after_boundary) > 0:
+            self.__op_starts.append((start + 1, start))
+            self.__op_lengths.append((len(ops_after_boundary) - 1, len(ops_after_boundary)))
+        else:
+            self.__op_starts.append((start, start))
+            self.__op_lengths.append((0, 0))
+
+        self.__arrays = None
+
+    def arrays(self):
+        if self.__arrays is None:
+            self.__arrays = (
+                np.array(self.__kinds, dtype=np.int64),
+                np.array(self.__asterisks, dtype=np.int64),
+                np.array(self.__op_starts, dtype=np.int64).reshape(-1, 2),
+                np.array(self.__op_lengths, dtype=np.int64).reshape(-1, 2),
+                np.array(self.__ops, dtype=np.int64),
+            )
+        return self.__arrays
+
+
+class _PathTable:
+    """The paths that frontier rows were reached by, each as its last transition and a pointer to the path before it.
+    Path 0 is the empty path at the root."""
+
+    def __init__(self):
+        self.__parents = [np.array((-1,), dtype=np.int64)]
+        self.__transitions = [np.array((-1,), dtype=np.int64)]
+        self.__n_paths = 1
+
+    def add(self, parents: np.ndarray, transitions: np.ndarray):
+        new_paths = np.arange(self.__n_paths, self.__n_paths + len(transitions), dtype=np.int64)
+        self.__parents.append(parents)
+        self.__transitions.append(transitions)
+        self.__n_paths += len(transitions)
+        return new_paths
+
+    def freeze(self):
+        self.parents = np.concatenate(self.__parents)
+        self.transitions = np.concatenate(self.__transitions)
+
+    def path(self, path: int):
+        """The transitions of a path, from the root"""
+
+        transitions: list[int] = []
+        while path > 0:
+            transitions.append(int(self.transitions[path]))
+            path = int(self.parents[path])
+        return tuple(reversed(transitions))
+
+
+_EMPTY_ROWS: _Rows = (np.zeros(0, dtype=np.int64),) * 3
+
+
+def _select(rows: _Rows, mask: np.ndarray) -> _Rows:
+    return rows[0][mask], rows[1][mask], rows[2][mask]
+
+def _concat(parts: tuple[_Rows, ...]) -> _Rows:
+    return tuple(np.concatenate([part[i] for part in parts]) for i in range(3))
+
+def _offsets_within(counts: np.ndarray):
+    """`0, 1, …, count - 1` for each count, concatenated"""
+    ends = np.cumsum(counts)
+    return np.arange(ends[-1] if len(ends) > 0 else 0) - np.repeat(ends - counts, counts)
+
+def _cumsum_within(values: np.ndarray, counts: np.ndarray):
+    """The sum of the values before each value within its group, where the groups are consecutive runs of `counts`
+    values"""
+    exclusive_sums = np.cumsum(values) - values
+    group_firsts = np.cumsum(counts) - counts
+    return exclusive_sums - np.repeat(np.r_[exclusive_sums, 0][group_firsts], counts)
+
+def _deduplicated(rows: _Rows, n_nodes: int) -> _Rows:
+    """Keeps one row per outline and node, as building a dict of the rows would: at the position of the first row, but
+    with the path of the last"""
+
+    outline_indices, nodes, paths = rows
+    if len(nodes) == 0:
+        return rows
+
+    codes = outline_indices * n_nodes + nodes
+    order = np.argsort(codes, kind="stable")
+    sorted_codes = codes[order]
+    group_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    group_ends = np.r_[group_starts[1:], len(codes)]
+
+    firsts = order[group_starts]
+    lasts = order[group_ends - 1]
+    by_position = np.argsort(firsts)
+    firsts, lasts = firsts[by_position], lasts[by_position]
+
+    return outline_indices[firsts], nodes[firsts], paths[lasts]
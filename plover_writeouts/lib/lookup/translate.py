@@ -0,0 +1,166 @@
+"""Translates streams of strokes offline, e.g., from Plover's stroke logs, for analyzing writing sessions without running
+Plover's engine.
+
+Strokes are split into words greedily: starting from the first stroke not yet translated, the longest outline of at most
+`longest_key` strokes that has a translation becomes the next word, and a stroke that begins no such outline is left
+untranslated. Rather than looking up each of those outlines from scratch, the translator extends a single traversal one
+stroke at a time and stops as soon as the traversal can no longer reach the trie. The traversals are also kept in a tree
+of the prefixes they followed, so outlines that come up again, as most words in a session do, are not traversed again.
+"""
+
+from collections import deque
+from typing import Iterable, Iterator, NamedTuple, Optional
+import re
+
+from ..theory.service import TheoryService
+from ..util.Trie import NondeterministicTrie
+from .build_lookup import TraversalFrontier, start_frontier, advance, choose_translation_and_cost
+
+
+class TranslatedWord(NamedTuple):
+    stroke_stenos: tuple[str, ...]
+    translation: Optional[str]
+    """None if the stroke could not be translated"""
+    cost: Optional[float]
+    """Weighted cost of the cheapest path to the translation"""
+
+
+class _Prefix:
+    __slots__ = ("frontier", "choice", "children")
+
+    def __init__(self, frontier: "TraversalFrontier | None", choice: "tuple[str, float] | None"):
+        self.frontier = frontier
+        """Where the prefix reaches, or None if it cannot reach the trie"""
+        self.choice = choice
+        """Translation the prefix would look up to, with its cost"""
+        self.children: dict[str, _Prefix] = {}
+
+
+class StrokeTranslator:
+    def __init__(
+        self,
+        trie: NondeterministicTrie[str, str],
+        theory: TheoryService,
+        longest_key: int=12,
+        undo_depth: int=32,
+        max_cached_prefixes: int=1_000_000,
+    ):
+        self.trie = trie
+        self.theory = theory
+        self.longest_key = longest_key
+        """Most strokes in one word; the same as `HatcheryDictionary._longest_key` by default"""
+        self.undo_depth = undo_depth
+        """Words held back before being yielded, which is how far back undo strokes can reach"""
+        self.max_cached_prefixes = max_cached_prefixes
+        """Prefixes kept before the tree of prefixes is cleared"""
+
+        self.__root = _Prefix(start_frontier(trie), None)
+        self.__n_cached_prefixes = 0
+
+    def translate(self, stroke_stenos: Iterable[Optional[str]]) -> Iterator[TranslatedWord]:
+        """Translates a stream of strokes into words. None in place of a stroke undoes the previous stroke, as an undo
+        stroke in Plover would, so the words come out as if that stroke had never been written. The words it could have
+        affected are split again, which only follows prefixes already in the tree."""
+
+        pending: list[str] = []
+        """Strokes not yet split into words"""
+        held_words: deque[TranslatedWord] = deque()
+
+        for stroke_steno in stroke_stenos:
+            if stroke_steno is None:
+                if len(pending) == 0 and len(held_words) > 0:
+                    pending.extend(held_words.pop().stroke_stenos)
+                if len(pending) > 0:
+                    pending.pop()
+
+                # Words that were split off by looking ahead at the undone stroke could join the next strokes instead
+                while len(held_words) > 0 and len(held_words[-1].stroke_stenos) + len(pending) < self.longest_key:
+                    pending[:0] = held_words.pop().stroke_stenos
+
+            else:
+                pending.append(stroke_steno)
+                # Wait for enough strokes that the longest possible word can always be seen
+                if len(pending) < 2 * self.longest_key:
+                    continue
+                held_words.extend(self.__split(pending, False))
+
+            while len(held_words) > self.undo_depth:
+                yield held_words.popleft()
+
+        held_words.extend(self.__split(pending, True))
+        yield from held_words
+
+    def __split(self, pending: list[str], finish: bool):
+        """Splits words off the front of `pending`, leaving strokes that could still join a longer word unless
+        `finish`ing"""
+
+        words: list[TranslatedWord] = []
+
+        start = 0
+        while len(pending) - start >= (1 if finish else self.longest_key):
+            word = self.__next_word(pending, start)
+            words.append(word)
+            start += len(word.stroke_stenos)
+
+        del pending[:start]
+        return words
+
+    def __next_word(self, stroke_stenos: list[str], start: int):
+        prefix = self.__root
+
+        longest_length = 0
+        longest_choice: "tuple[str, float] | None" = None
+
+        for i in range(start, min(start + self.longest_key, len(stroke_stenos))):
+            stroke_steno = stroke_stenos[i]
+
+            next_prefix = prefix.children.get(stroke_steno)
+            if next_prefix is None:
+                next_prefix = self.__extend(prefix, stroke_steno)
+
+            if next_prefix.frontier is None:
+                break
+            prefix = next_prefix
+
+            if prefix.choice is not None:
+                longest_length = i - start + 1
+                longest_choice = prefix.choice
+
+        if longest_choice is None:
+            return TranslatedWord((stroke_stenos[start],), None, None)
+        return TranslatedWord(tuple(stroke_stenos[start:start + longest_length]), *longest_choice)
+
+    def __extend(self, prefix: _Prefix, stroke_steno: str):
+        assert prefix.frontier is not None
+
+        if self.__n_cached_prefixes >= self.max_cached_prefixes:
+            self.__root.children.clear()
+            self.__n_cached_prefixes = 0
+
+        try:
+            frontier = advance(self.trie, prefix.frontier, stroke_steno, self.theory)
+        except ValueError:
+            # Not a valid stroke in the current system
+            frontier = None
+
+        choice = None
+        if frontier is not None:
+            choice = choose_translation_and_cost(((self.trie, frontier.nodes),), frontier.n_variation, frontier.asterisk, self.theory, self.trie.value_id)
+
+        next_prefix = prefix.children[stroke_steno] = _Prefix(frontier, choice)
+        self.__n_cached_prefixes += 1
+        return next_prefix
+
+
+_STROKE_LOG_PATTERN = re.compile(r"(\*?)Stroke\((\S*) : ")
+
+def read_stroke_log(lines: Iterable[str]):
+    """Strokes from a Plover stroke log, with None for each undo stroke. Lines that are not strokes, such as logged
+    translations, are skipped."""
+
+    for line in lines:
+        match = _STROKE_LOG_PATTERN.search(line)
+        if match is None:
+            continue
+
+        yield None if match[1] == "*" else match[2]
@@ -1,11 +1,14 @@
 from dataclasses import dataclass
 import re
-from typing import Iterable
+from typing import Iterable, TYPE_CHECKING
 
 from plover.steno import Stroke
 
 from ..stenophoneme.Stenophoneme import Stenophoneme
 
+if TYPE_CHECKING:
+    from .intern import SophemeInternPool
+
 
 @dataclass(frozen=True)
 class Keysymbol:
@@ -98,7 +101,23 @@ class Sopheme:
         }
 
     @staticmethod
-    def parse_sopheme_dict(json: dict):
+    def parse_sopheme_dict(json: dict, pool: "SophemeInternPool | None"=None):
+        if pool is not None:
+            return pool.sopheme(
+                tuple(
+                    pool.orthokeysymbol(
+                        tuple(
+                            pool.keysymbol(keysymbol_json["symbol"], keysymbol_json["stress"], keysymbol_json["optional"])
+                            for keysymbol_json in orthokeysymbol_json["keysymbols"]
+                        ),
+                        orthokeysymbol_json["chars"],
+                    )
+                    for orthokeysymbol_json in json["orthokeysymbols"]
+                ),
+                pool.steno(json["steno"]),
+                Stenophoneme.__dict__.get(json["phono"], json["phono"]),
+            )
+
         return Sopheme(
             tuple(
                 Orthokeysymbol(
@@ -1,14 +1,25 @@
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
 from .Sopheme import Sopheme
-from ..stenophoneme.Stenophoneme import Stenophoneme
+from ..stenophoneme.Stenophoneme import Stenophoneme, STENOPHONEMES_BY_CODE, STENOPHONEME_CODES
+
+if TYPE_CHECKING:
+    from .intern import SophemeInternPool
 
 @dataclass
 class Sound:
-    phoneme: Stenophoneme
+    phoneme: int
+    """The integer code of this sound's phoneme (see `STENOPHONEME_CODES`)"""
     sopheme: "Sopheme | None"
 
+    @property
+    def stenophoneme(self) -> Stenophoneme:
+        return STENOPHONEMES_BY_CODE[self.phoneme]
+
     @staticmethod
-    def from_sopheme(sopheme: Sopheme):
+    def from_sopheme(sopheme: Sopheme, pool: "SophemeInternPool | None"=None):
         assert sopheme.phoneme is not None
-        return Sound(sopheme.phoneme, sopheme)
\ No newline at end of file
+        if pool is not None:
+            return pool.sound(STENOPHONEME_CODES[sopheme.phoneme], sopheme)
+        return Sound(STENOPHONEME_CODES[sopheme.phoneme], sopheme)
\ No newline at end of file
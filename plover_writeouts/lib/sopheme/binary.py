@@ -0,0 +1,313 @@
+"""Binary, columnar Hatchery dictionaries.
+
+Strings (orthography, keysymbols, phoneme names, and steno) and the distinct keysymbols, orthokeysymbols, and sophemes
+built from them are interned into tables stored as columns of small integer codes, with offset indexes for the
+variable-length levels. An entry is an offset range of sopheme codes. Reading memory-maps the file and decodes an entry
+only when it is accessed, and each distinct table row at most once.
+"""
+
+from array import array
+import mmap
+import struct
+import sys
+from typing import BinaryIO, Callable, Generic, Iterable, TypeVar
+
+from plover.steno import Stroke
+
+from .Sopheme import Sopheme, Orthokeysymbol, Keysymbol
+from ..stenophoneme.Stenophoneme import Stenophoneme
+
+T = TypeVar("T")
+
+
+_MAGIC = b"HATCHERY-BINARY\0"
+_FORMAT_VERSION = 1
+_BYTE_ORDER_MARK = 0x01020304
+_HEADER = struct.Struct("=16sII")
+_SECTION_HEADER = struct.Struct("=cxxxQQ")
+"""Type code of the section's items, offset of the section in the file, and number of items"""
+
+_SECTION_NAMES = (
+    "chars_offsets", "chars_blob",
+    "symbols_offsets", "symbols_blob",
+    "phonemes_offsets", "phonemes_blob",
+    "stenos_offsets", "stenos_blob",
+
+    "keysymbol_symbols", "keysymbol_stresses", "keysymbol_optionals",
+    "orthokeysymbol_chars", "orthokeysymbol_keysymbol_offsets", "orthokeysymbol_keysymbols",
+    "sopheme_phonemes", "sopheme_stenos", "sopheme_orthokeysymbol_offsets", "sopheme_orthokeysymbols",
+    "entry_sopheme_offsets", "entry_sophemes",
+)
+
+
+def is_hatchery_binary(file: BinaryIO):
+    """Checks whether `file` starts like a binary Hatchery dictionary, leaving it positioned at the start"""
+
+    is_binary = file.read(len(_MAGIC)) == _MAGIC
+    file.seek(0)
+    return is_binary
+
+
+class _InternTable(Generic[T]):
+    def __init__(self):
+        self.codes: dict[T, int] = {}
+        self.rows: list[T] = []
+
+    def code(self, row: T):
+        if row not in self.codes:
+            self.codes[row] = len(self.rows)
+            self.rows.append(row)
+        return self.codes[row]
+
+_MAX_OFFSET = (1 << 32) - 1
+"""Largest offset the `"I"` offset columns hold"""
+
+def _string_columns(strings: list[str], name: str):
+    offsets = array("I", [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode("utf-8")
+        if len(blob) > _MAX_OFFSET:
+            raise ValueError(f"{name} take up more than the {_MAX_OFFSET:,} bytes a binary Hatchery dictionary can hold")
+        offsets.append(len(blob))
+    return offsets, array("B", blob)
+
+def _byte_column(values: Iterable[int], name: str):
+    try:
+        return array("B", values)
+    except OverflowError as error:
+        raise ValueError(f"a {name} is outside the range 0–255 a binary Hatchery dictionary can hold") from error
+
+def _code_column(codes: Iterable[int], n_values: int):
+    """Stores codes in the narrowest unsigned type code that fits every one of `n_values` possible values"""
+
+    for typecode in "BHI":
+        if n_values <= 1 << (8 * array(typecode).itemsize):
+            return array(typecode, codes)
+    return array("Q", codes)
+
+def _nested_code_columns(rows: Iterable[tuple[int, ...]], n_values: int, name: str):
+    offsets = array("I", [0])
+    codes: list[int] = []
+    for row in rows:
+        codes.extend(row)
+        if len(codes) > _MAX_OFFSET:
+            raise ValueError(f"{name} number more than the {_MAX_OFFSET:,} a binary Hatchery dictionary can hold")
+        offsets.append(len(codes))
+    return offsets, _code_column(codes, n_values)
+
+
+def write_hatchery_binary(entries: Iterable[Iterable[Sopheme]], file: BinaryIO):
+    """Writes entries (each a sequence of sophemes) as a binary Hatchery dictionary"""
+
+    chars: _InternTable[str] = _InternTable()
+    symbols: _InternTable[str] = _InternTable()
+    phonemes: _InternTable[str] = _InternTable()
+    phonemes.code("") # code 0 is no phoneme
+    stenos: _InternTable[str] = _InternTable()
+    stenos.code("") # code 0 is no steno
+
+    keysymbols: _InternTable[tuple[int, int, bool]] = _InternTable()
+    orthokeysymbols: _InternTable[tuple[int, tuple[int, ...]]] = _InternTable()
+    sophemes: _InternTable[tuple[int, int, tuple[int, ...]]] = _InternTable()
+
+    entry_rows: list[tuple[int, ...]] = []
+
+    for entry in entries:
+        entry_row: list[int] = []
+
+        for sopheme in entry:
+            if sopheme.phoneme is None:
+                phoneme_code = 0
+            else:
+                phoneme_code = phonemes.code(sopheme.phoneme.name if isinstance(sopheme.phoneme, Stenophoneme) else sopheme.phoneme)
+
+            orthokeysymbol_codes = tuple(
+                orthokeysymbols.code((
+                    chars.code(orthokeysymbol.chars),
+                    tuple(
+                        keysymbols.code((symbols.code(keysymbol.symbol), keysymbol.stress, keysymbol.optional))
+                        for keysymbol in orthokeysymbol.keysymbols
+                    ),
+                ))
+                for orthokeysymbol in sopheme.orthokeysymbols
+            )
+
+            entry_row.append(sophemes.code((
+                phoneme_code,
+                stenos.code("/".join(stroke.rtfcre for stroke in sopheme.steno)),
+                orthokeysymbol_codes,
+            )))
+
+        entry_rows.append(tuple(entry_row))
+
+    sections = (
+        *_string_columns(chars.rows, "orthographies"),
+        *_string_columns(symbols.rows, "keysymbols"),
+        *_string_columns(phonemes.rows, "phoneme names"),
+        *_string_columns(stenos.rows, "outlines"),
+
+        _code_column((symbol for symbol, _, _ in keysymbols.rows), len(symbols.rows)),
+        _byte_column((stress for _, stress, _ in keysymbols.rows), "keysymbol's stress"),
+        array("B", (optional for _, _, optional in keysymbols.rows)),
+
+        _code_column((chars_code for chars_code, _ in orthokeysymbols.rows), len(chars.rows)),
+        *_nested_code_columns((keysymbol_codes for _, keysymbol_codes in orthokeysymbols.rows), len(keysymbols.rows), "keysymbols across all orthokeysymbols"),
+
+        _code_column((phoneme for phoneme, _, _ in sophemes.rows), len(phonemes.rows)),
+        _code_column((steno for _, steno, _ in sophemes.rows), len(stenos.rows)),
+        *_nested_code_columns((orthokeysymbol_codes for _, _, orthokeysymbol_codes in sophemes.rows), len(orthokeysymbols.rows), "orthokeysymbols across all sophemes"),
+
+        *_nested_code_columns(entry_rows, len(sophemes.rows), "sophemes across all entries"),
+    )
+
+    # Sections are 8-byte aligned so that they can be cast to typed views in place
+    offset = _HEADER.size + _SECTION_HEADER.size * len(sections)
+    section_headers = bytearray()
+    for section in sections:
+        offset = -(-offset // 8) * 8
+        section_headers += _SECTION_HEADER.pack(section.typecode.encode("ascii"), offset, len(section))
+        offset += len(section) * section.itemsize
+
+    file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, _BYTE_ORDER_MARK))
+    file.write(section_headers)
+    position = _HEADER.size + len(section_headers)
+    for section in sections:
+        padding = -position % 8
+        file.write(b"\0" * padding)
+        file.write(section.tobytes())
+        position += padding + len(section) * section.itemsize
+
+
+class _LazyTable(Generic[T]):
+    """Decodes each row of a table the first time it is accessed"""
+
+    def __init__(self, n_rows: int, decode: Callable[[int], T]):
+        self.__rows: "list[T | None]" = [None] * n_rows
+        self.__decode = decode
+
+    def __getitem__(self, code: int) -> T:
+        row = self.__rows[code]
+        if row is None:
+            row = self.__rows[code] = self.__decode(code)
+        return row
+
+    def __len__(self):
+        return len(self.__rows)
+
+
+class HatcheryBinaryReader:
+    """Memory-mapped view of a binary Hatchery dictionary, indexable by entry. Use as a context manager, or call `close`,
+    to release the mapping.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self.__mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__views: list[memoryview] = []
+
+        try:
+            if len(self.__mmap) < _HEADER.size:
+                raise ValueError(f"{path} is truncated")
+            magic, version, byte_order_mark = _HEADER.unpack_from(self.__mmap, 0)
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a binary Hatchery dictionary")
+            if version != _FORMAT_VERSION:
+                raise ValueError(f"{path} has format version {version}, expected {_FORMAT_VERSION}")
+            if byte_order_mark != _BYTE_ORDER_MARK:
+                raise ValueError(f"{path} was written on a machine with a different byte order than {sys.byteorder}")
+            if len(self.__mmap) < _HEADER.size + _SECTION_HEADER.size * len(_SECTION_NAMES):
+                raise ValueError(f"{path} is truncated")
+
+            self.__sections: dict[str, memoryview] = {}
+            for i, name in enumerate(_SECTION_NAMES):
+                typecode, offset, n_items = _SECTION_HEADER.unpack_from(self.__mmap, _HEADER.size + _SECTION_HEADER.size * i)
+                typecode = typecode.decode("ascii")
+                end = offset + n_items * array(typecode).itemsize
+                # Slicing past the end of the mapping would silently give a shorter section
+                if end > len(self.__mmap):
+                    raise ValueError(f"{path} is truncated: section {name} ends at byte {end:,} of {len(self.__mmap):,}")
+                byte_view = memoryview(self.__mmap)[offset:end]
+                self.__sections[name] = byte_view.cast(typecode)
+                self.__views.extend((byte_view, self.__sections[name]))
+        except BaseException:
+            self.close()
+            raise
+
+        self.__chars = self.__string_table("chars")
+        self.__symbols = self.__string_table("symbols")
+        phoneme_names = self.__string_table("phonemes")
+        steno_strings = self.__string_table("stenos")
+
+        self.__phonemes: _LazyTable["Stenophoneme | str | None"] = _LazyTable(
+            len(phoneme_names),
+            lambda code: Stenophoneme.__dict__.get(phoneme_names[code], phoneme_names[code]) if code != 0 else None,
+        )
+        self.__stenos: _LazyTable[tuple[Stroke, ...]] = _LazyTable(
+            len(steno_strings),
+            lambda code: tuple(Stroke.from_steno(steno) for steno in steno_strings[code].split("/")) if code != 0 else (),
+        )
+        self.__keysymbols = _LazyTable(len(self.__sections["keysymbol_symbols"]), self.__decode_keysymbol)
+        self.__orthokeysymbols = _LazyTable(len(self.__sections["orthokeysymbol_chars"]), self.__decode_orthokeysymbol)
+        self.__sophemes = _LazyTable(len(self.__sections["sopheme_phonemes"]), self.__decode_sopheme)
+
+        self.__entry_sopheme_offsets = self.__sections["entry_sopheme_offsets"]
+        self.__entry_sophemes = self.__sections["entry_sophemes"]
+
+    def close(self):
+        for view in reversed(self.__views):
+            view.release()
+        self.__views = []
+        self.__mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def __len__(self):
+        return len(self.__entry_sopheme_offsets) - 1
+
+    def __getitem__(self, index: int) -> tuple[Sopheme, ...]:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+
+        sophemes = self.__sophemes
+        return tuple(
+            sophemes[code]
+            for code in self.__entry_sophemes[self.__entry_sopheme_offsets[index]:self.__entry_sopheme_offsets[index + 1]]
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __string_table(self, name: str):
+        offsets = self.__sections[f"{name}_offsets"]
+        blob = self.__sections[f"{name}_blob"]
+        return _LazyTable(len(offsets) - 1, lambda code: str(blob[offsets[code]:offsets[code + 1]], "utf-8"))
+
+    def __decode_keysymbol(self, code: int):
+        symbol = self.__symbols[self.__sections["keysymbol_symbols"][code]]
+        return Keysymbol(
+            symbol,
+            Keysymbol.get_match_symbol(symbol),
+            self.__sections["keysymbol_stresses"][code],
+            bool(self.__sections["keysymbol_optionals"][code]),
+        )
+
+    def __decode_orthokeysymbol(self, code: int):
+        offsets = self.__sections["orthokeysymbol_keysymbol_offsets"]
+        return Orthokeysymbol(
+            tuple(self.__keysymbols[keysymbol_code] for keysymbol_code in self.__sections["orthokeysymbol_keysymbols"][offsets[code]:offsets[code + 1]]),
+            self.__chars[self.__sections["orthokeysymbol_chars"][code]],
+        )
+
+    def __decode_sopheme(self, code: int):
+        offsets = self.__sections["sopheme_orthokeysymbol_offsets"]
+        return Sopheme(
+            tuple(self.__orthokeysymbols[orthokeysymbol_code] for orthokeysymbol_code in self.__sections["sopheme_orthokeysymbols"][offsets[code]:offsets[code + 1]]),
+            self.__stenos[self.__sections["sopheme_stenos"][code]],
+            self.__phonemes[self.__sections["sopheme_phonemes"][code]],
+        )
@@ -0,0 +1,89 @@
+from typing import Any, Hashable
+
+from plover.steno import Stroke
+
+from .Sopheme import Sopheme, Orthokeysymbol, Keysymbol
+from .Sound import Sound
+from ..stenophoneme.Stenophoneme import Stenophoneme
+
+
+class SophemeInternPool:
+    """Shares identical immutable sopheme objects while a dictionary is loaded. A dictionary only has a few thousand
+    distinct keysymbols, orthokeysymbols, sophemes, and steno sequences, so most entries can reuse existing instances
+    instead of allocating their own.
+    """
+
+    def __init__(self):
+        self.__tables: dict[str, dict[Hashable, Any]] = {
+            "match symbols": {},
+            "keysymbols": {},
+            "orthokeysymbols": {},
+            "sophemes": {},
+            "steno": {},
+            "sounds": {},
+        }
+        self.__n_requests: dict[str, int] = {name: 0 for name in self.__tables}
+
+    def __get(self, table_name: str, key: Hashable):
+        self.__n_requests[table_name] += 1
+        return self.__tables[table_name].get(key)
+
+    def __put(self, table_name: str, key: Hashable, value: Any):
+        self.__tables[table_name][key] = value
+        return value
+
+    def match_symbol(self, symbol: str) -> str:
+        match_symbol = self.__get("match symbols", symbol)
+        if match_symbol is not None:
+            return match_symbol
+        return self.__put("match symbols", symbol, Keysymbol.get_match_symbol(symbol))
+
+    def keysymbol(self, symbol: str, stress: int=0, optional: bool=False) -> Keysymbol:
+        key = (symbol, stress, optional)
+        keysymbol = self.__get("keysymbols", key)
+        if keysymbol is not None:
+            return keysymbol
+        return self.__put("keysymbols", key, Keysymbol(symbol, self.match_symbol(symbol), stress, optional))
+
+    def orthokeysymbol(self, keysymbols: tuple[Keysymbol, ...], chars: str) -> Orthokeysymbol:
+        # Keysymbols are interned by this pool, so identity stands in for the (slower) structural hash
+        key = (tuple(id(keysymbol) for keysymbol in keysymbols), chars)
+        orthokeysymbol = self.__get("orthokeysymbols", key)
+        if orthokeysymbol is not None:
+            return orthokeysymbol
+        return self.__put("orthokeysymbols", key, Orthokeysymbol(keysymbols, chars))
+
+    def steno(self, steno: str) -> tuple[Stroke, ...]:
+        strokes = self.__get("steno", steno)
+        if strokes is not None:
+            return strokes
+        return self.__put("steno", steno, tuple(Stroke.from_steno(stroke_steno) for stroke_steno in steno.split("/")) if len(steno) > 0 else ())
+
+    def sopheme(self, orthokeysymbols: tuple[Orthokeysymbol, ...], steno: tuple[Stroke, ...], phoneme: "Stenophoneme | str | None") -> Sopheme:
+        key = (tuple(id(orthokeysymbol) for orthokeysymbol in orthokeysymbols), id(steno), phoneme)
+        sopheme = self.__get("sophemes", key)
+        if sopheme is not None:
+            return sopheme
+        return self.__put("sophemes", key, Sopheme(orthokeysymbols, steno, phoneme))
+
+    def sound(self, phoneme: int, sopheme: "Sopheme | None") -> Sound:
+        key = (phoneme, id(sopheme))
+        sound = self.__get("sounds", key)
+        if sound is not None:
+            return sound
+        return self.__put("sounds", key, Sound(phoneme, sopheme))
+
+    def stats(self):
+        """Mapping from each kind of interned object to the number of requests for it and the number of distinct instances"""
+
+        return {
+            name: (self.__n_requests[name], len(table))
+            for name, table in self.__tables.items()
+        }
+
+    def report(self):
+        return "interned " + ", ".join(
+            f"{n_distinct:,} {name} for {n_requests:,} uses ({n_requests / n_distinct:.1f}×)"
+            for name, (n_requests, n_distinct) in self.stats().items()
+            if n_distinct > 0
+        )
@@ -1,118 +1,199 @@
-from enum import Enum, auto
-from dataclasses import dataclass
+"""Compact, one-entry-per-line notation for sopheme sequences, e.g.,
 
-from .Sopheme import Sopheme, Orthokeysymbol, Keysymbol
-from ..stenophoneme import Stenophoneme
+    z.z[Z][[STKPW]] o.ou[OO][[OE]] (d.d e.)[D][[-D]]
 
+Each sopheme is its orthokeysymbols (parenthesized if there are several) followed by its phoneme in brackets and its
+steno in double brackets, both optional. Each orthokeysymbol is its characters and keysymbols separated by a `.`, with
+the keysymbols parenthesized if there are several; a keysymbol may be followed by `!` and its stress, and by `?` if it
+is optional. Reserved characters inside characters, keysymbols, and phonemes are escaped with a backslash.
 
-class _TokenType(Enum):
-    NONE = auto()
-    WHITESPACE = auto()
-    CHARS = auto()
-    PARENTHESIS = auto()
-    BRACKET = auto()
-    SYMBOL = auto()
+The shorthands produced by `Sopheme.shortest_form` (e.g., `l` for `l.l[L]`) are also accepted.
+"""
 
-@dataclass(frozen=True)
-class _Token:
-    type: _TokenType
-    ch: str
+import re
+from typing import Iterable, TYPE_CHECKING
 
-def _lex_seq(seq: str):
-    tokens: list[_Token] = []
+from plover.steno import Stroke
 
-    state = _TokenType.NONE
-    current_token = ""
+from .Sopheme import Sopheme, Orthokeysymbol, Keysymbol, _sopheme_shorthands
+from ..stenophoneme.Stenophoneme import Stenophoneme
 
-    def step(target_state: _TokenType):
-        nonlocal state
-        nonlocal current_token
+if TYPE_CHECKING:
+    from .intern import SophemeInternPool
 
-        if state == target_state:
-            current_token += ch
-        else:
-            tokens.append(_Token(state, current_token))
-            current_token = ch
-
-        state = target_state
-
-    for ch in seq:
-        if ch == " ":
-            step(_TokenType.WHITESPACE)
-        elif ch.isalnum() or ch in "-/@":
-            step(_TokenType.CHARS)
-        elif ch in "()":
-            step(_TokenType.PARENTHESIS)
-        elif ch in "[]":
-            step(_TokenType.BRACKET)
+
+_TOKEN_PATTERN = re.compile(r"\[\[|\]\]|[ .()\[\]!?]|(?:[^ .()\[\]!?\\]|\\.)+")
+_ESCAPE_PATTERN = re.compile(r"([ .()\[\]!?\\])")
+_UNESCAPE_PATTERN = re.compile(r"\\(.)")
+_PUNCTUATION = frozenset(("[[", "]]", " ", ".", "(", ")", "[", "]", "!", "?"))
+
+_SHORTHAND_SOPHEMES = {
+    ortho: Sopheme(
+        (Orthokeysymbol(tuple(Keysymbol(symbol, Keysymbol.get_match_symbol(symbol)) for symbol in symbols), ortho),),
+        (),
+        phoneme,
+    )
+    for (((symbols, ortho),), phoneme) in _sopheme_shorthands
+}
+
+
+def _escape(text: str):
+    return _ESCAPE_PATTERN.sub(r"\\\1", text)
+
+def _unescape(text: str):
+    return _UNESCAPE_PATTERN.sub(r"\1", text) if "\\" in text else text
+
+
+def format_sopheme_seq(sophemes: Iterable[Sopheme]):
+    """Writes a sequence of sophemes in the line notation. Unlike `str`, this keeps both the phoneme and the steno of
+    each sopheme, so `parse_sopheme_seq` recovers the sophemes exactly.
+    """
+
+    return " ".join(_format_sopheme(sopheme) for sopheme in sophemes)
+
+def _format_sopheme(sopheme: Sopheme):
+    out = " ".join(_format_orthokeysymbol(orthokeysymbol) for orthokeysymbol in sopheme.orthokeysymbols)
+    if len(sopheme.orthokeysymbols) > 1:
+        out = f"({out})"
+
+    if sopheme.phoneme is not None:
+        out += f"[{_escape(sopheme.phoneme.name if isinstance(sopheme.phoneme, Stenophoneme) else sopheme.phoneme)}]"
+    if len(sopheme.steno) > 0:
+        out += f"[[{'/'.join(stroke.rtfcre for stroke in sopheme.steno)}]]"
+
+    return out
+
+def _format_orthokeysymbol(orthokeysymbol: Orthokeysymbol):
+    keysymbols_string = " ".join(_format_keysymbol(keysymbol) for keysymbol in orthokeysymbol.keysymbols)
+    if len(orthokeysymbol.keysymbols) > 1:
+        keysymbols_string = f"({keysymbols_string})"
+
+    return f"{_escape(orthokeysymbol.chars)}.{keysymbols_string}"
+
+def _format_keysymbol(keysymbol: Keysymbol):
+    out = _escape(keysymbol.symbol)
+    if keysymbol.stress > 0:
+        out += f"!{keysymbol.stress}"
+    if keysymbol.optional:
+        out += "?"
+
+    return out
+
+
+class _Parser:
+    def __init__(self, seq: str, pool: "SophemeInternPool | None"):
+        self.seq = seq
+        self.pool = pool
+        self.tokens: list[str] = _TOKEN_PATTERN.findall(seq)
+        self.index = 0
+
+    def peek(self) -> "str | None":
+        return self.tokens[self.index] if self.index < len(self.tokens) else None
+
+    def take_if(self, token: str):
+        if self.peek() != token:
+            return False
+        self.index += 1
+        return True
+
+    def expect(self, token: str):
+        if not self.take_if(token):
+            raise ValueError(f"expected {token!r} at token {self.index} of {self.seq!r}")
+
+    def take_text(self):
+        token = self.peek()
+        if token is None or token in _PUNCTUATION:
+            return None
+        self.index += 1
+        return _unescape(token)
+
+    def expect_text(self):
+        text = self.take_text()
+        if text is None:
+            raise ValueError(f"expected text at token {self.index} of {self.seq!r}")
+        return text
+
+    def parse_seq(self):
+        sophemes: list[Sopheme] = []
+
+        while self.take_if(" "): pass
+        while self.peek() is not None:
+            sophemes.append(self.parse_sopheme())
+            while self.take_if(" "): pass
+
+        return tuple(sophemes)
+
+    def parse_sopheme(self):
+        orthokeysymbols: tuple[Orthokeysymbol, ...] = ()
+
+        if self.take_if("("):
+            orthokeysymbols = self.parse_group(self.parse_orthokeysymbol)
+        elif self.peek() not in ("[", "[["):
+            chars = self.take_text()
+            if chars is not None and self.peek() != ".":
+                if chars not in _SHORTHAND_SOPHEMES:
+                    raise ValueError(f"unknown sopheme shorthand {chars!r} in {self.seq!r}")
+                return _SHORTHAND_SOPHEMES[chars]
+
+            orthokeysymbols = (self.parse_orthokeysymbol(chars),)
+
+        phoneme = None
+        if self.take_if("["):
+            phoneme_name = self.expect_text()
+            phoneme = Stenophoneme.__dict__.get(phoneme_name, phoneme_name)
+            self.expect("]")
+
+        steno: tuple[Stroke, ...] = ()
+        if self.take_if("[["):
+            steno_text = self.expect_text()
+            steno = self.pool.steno(steno_text) if self.pool is not None else tuple(Stroke.from_steno(stroke_steno) for stroke_steno in steno_text.split("/"))
+            self.expect("]]")
+
+        if self.pool is not None:
+            return self.pool.sopheme(orthokeysymbols, steno, phoneme)
+        return Sopheme(orthokeysymbols, steno, phoneme)
+
+    def parse_orthokeysymbol(self, chars: "str | None"=None):
+        if chars is None:
+            chars = self.take_text() or ""
+        self.expect(".")
+
+        if self.take_if("("):
+            keysymbols = self.parse_group(self.parse_keysymbol)
+        elif self.peek() is not None and self.peek() not in _PUNCTUATION:
+            keysymbols = (self.parse_keysymbol(),)
         else:
-            step(_TokenType.SYMBOL)
-    
-    return tuple(tokens)
-
-
-class _ParserState(Enum):
-    NONE = auto()
-    ORTHO = auto()
-    POST_ORTHO = auto()
-    PHONO = auto()
-    STRESS = auto()
-    STENO = auto()
-    PHONEME = auto()
-    SYMBOL = auto()
-    GROUP = auto()
-
-
-def parse_sopheme_seq(seq: str):
-    tokens = _lex_seq(seq)
-    # state = _ParserState.NONE
-
-    # sophemes: list[Sopheme] = []
-
-    # def _parse_sopheme_tokens(sopheme_tokens: tuple[_Token, ...]):
-    #     nonlocal state
-
-    #     assert state == _ParserState.NONE
-
-    #     orthokeysymbols: list[Orthokeysymbol] = []
-    #     ortho: str
-    #     keysymbol: str
-    #     steno: str
-
-    #     for token in sopheme_tokens:
-    #         match state:
-    #             case _ParserState.NONE:
-    #                 match token.type:
-    #                     case _TokenType.CHARS:
-    #                         state = _ParserState.ORTHO
-    #                         ortho = token.ch
-    #                     case _TokenType.SYMBOL:
-    #                         state = _ParserState.POST_ORTHO
-    #                     case _:
-    #                         raise TypeError
-
-    #             case _ParserState.ORTHO:
-    #                 match token.type:
-    #                     case _TokenType.SYMBOL:
-    #                         state = _ParserState.POST_ORTHO
-    #                     case _:
-    #                         raise TypeError
-                        
-    #             case _ParserState.POST_ORTHO:
-    #                 match token.type:
-    #                     case _TokenType.CHARS:
-    #                         state = _ParserState.PHONO
-    #                         keysymbol = token.ch
-    #                     case _:
-    #                         raise TypeError
-        
-
-
-
-    # sopheme_start_index = 0
-    # for i in range(0, len(tokens)):
-    #     if tokens[i].type is _TokenType.WHITESPACE:
-    #         _parse_sopheme_tokens(tokens[sopheme_start_index:i + 1])
-    #         sopheme_start_index += 1
-    #         continue
-        
+            keysymbols = ()
+
+        if self.pool is not None:
+            return self.pool.orthokeysymbol(keysymbols, chars)
+        return Orthokeysymbol(keysymbols, chars)
+
+    def parse_keysymbol(self):
+        symbol = self.expect_text()
+
+        stress = 0
+        if self.take_if("!"):
+            stress = int(self.expect_text())
+
+        optional = self.take_if("?")
+
+        if self.pool is not None:
+            return self.pool.keysymbol(symbol, stress, optional)
+        return Keysymbol(symbol, Keysymbol.get_match_symbol(symbol), stress, optional)
+
+    def parse_group(self, parse_item):
+        items = [parse_item()]
+        while self.take_if(" "):
+            items.append(parse_item())
+        self.expect(")")
+
+        return tuple(items)
+
+
+def parse_sopheme_seq(seq: str, pool: "SophemeInternPool | None"=None) -> tuple[Sopheme, ...]:
+    """Reads a sequence of sophemes in the line notation, sharing identical objects through `pool` if given. Raises
+    `ValueError` if `seq` is malformed.
+    """
+
+    return _Parser(seq, pool).parse_seq()
@@ -70,4 +70,19 @@ vowel_phonemes = {
     Stenophoneme.OU,
     Stenophoneme.AE,
     Stenophoneme.AO,
-}
\ No newline at end of file
+}
+
+STENOPHONEMES_BY_CODE: tuple[Stenophoneme, ...] = tuple(Stenophoneme)
+"""Mapping from each phoneme's integer code to the phoneme. Codes are dense, so theory tables can be plain lists indexed by code."""
+STENOPHONEME_CODES: dict[Stenophoneme, int] = {
+    phoneme: code
+    for code, phoneme in enumerate(STENOPHONEMES_BY_CODE)
+}
+"""Mapping from each phoneme to its integer code"""
+N_STENOPHONEME_CODES = len(STENOPHONEMES_BY_CODE)
+
+ANY_VOWEL_CODE = STENOPHONEME_CODES[Stenophoneme.ANY_VOWEL]
+DUMMY_CODE = STENOPHONEME_CODES[Stenophoneme.DUMMY]
+
+IS_VOWEL_CODE: tuple[bool, ...] = tuple(phoneme in vowel_phonemes for phoneme in STENOPHONEMES_BY_CODE)
+"""Whether each phoneme code is a vowel, indexed by code"""
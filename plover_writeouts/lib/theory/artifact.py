@@ -0,0 +1,273 @@
+"""Compiled theory artifacts, which hold a theory's compiled tables so that later loads read them instead of building them.
+
+An artifact is a header followed by the tables as JSON made up only of ints, bools, nulls, and lists, so reading one
+never runs code from the file. Strokes are stored as their integer values, which is why the content hash covers the keys
+of the Plover system as well as the spec.
+"""
+
+from enum import Enum
+from pathlib import Path
+from typing import Any, BinaryIO
+import hashlib
+import json
+import os
+
+from plover.steno import Stroke
+import plover.log
+import plover.system
+
+from ..stenophoneme.Stenophoneme import STENOPHONEMES_BY_CODE, N_STENOPHONEME_CODES
+from ..util.Trie import ReadonlyTrie
+from .spec import TheorySpec
+from .service import TheoryService, CONSONANT_SPLIT_CHORDS
+
+_MAGIC = b"HATCHERY-THEORY\0"
+_FORMAT_VERSION = 2
+"""Bump whenever the compiled tables or the way they are built changes, so that stale artifacts are rejected"""
+
+_SUFFIX = ".hatchtheory"
+
+
+def theory_content_hash(spec: type[TheorySpec]) -> str:
+    """SHA-256 of every field declared by `TheorySpec`, in a canonical form, along with everything outside the spec that
+    the compiled tables depend on: the order of the phoneme codes, the consonant splitter's extra chords, and the keys of
+    the Plover system.
+
+    `TransitionCosts` is left out because its weights are applied at lookup time and do not affect any compiled table.
+    """
+
+    contents = {
+        field_name: _canonicalize(getattr(spec, field_name))
+        for field_name in sorted(TheorySpec.__annotations__)
+    }
+    contents["stenophonemes"] = [phoneme.name for phoneme in STENOPHONEMES_BY_CODE]
+    contents["consonant_split_chords"] = _canonicalize(CONSONANT_SPLIT_CHORDS)
+    contents["system_keys"] = list(plover.system.KEYS)
+    contents["format_version"] = _FORMAT_VERSION
+
+    return hashlib.sha256(json.dumps(contents, sort_keys=True).encode("utf-8")).hexdigest()
+
+def _canonicalize(value: Any) -> Any:
+    if isinstance(value, Stroke):
+        return f"stroke:{value.rtfcre}"
+    if isinstance(value, Enum):
+        return f"{type(value).__name__}.{value.name}"
+    if isinstance(value, dict):
+        return sorted(([_canonicalize(key), _canonicalize(item)] for key, item in value.items()), key=repr)
+    if isinstance(value, (set, frozenset)):
+        return sorted((_canonicalize(item) for item in value), key=repr)
+    if isinstance(value, (tuple, list)):
+        return [_canonicalize(item) for item in value]
+    return value
+
+
+def write_compiled_theory(theory: TheoryService, file: BinaryIO):
+    """Writes a theory's compiled tables, headed by its content hash"""
+
+    tables = theory.compiled_tables()
+    encoded = {
+        "left_chords": _encode_strokes(tables["left_chords"]),
+        "vowel_chords": _encode_strokes(tables["vowel_chords"]),
+        "right_chords": _encode_strokes(tables["right_chords"]),
+        "left_alt_chords": _encode_strokes(tables["left_alt_chords"]),
+        "right_alt_chords": _encode_strokes(tables["right_alt_chords"]),
+        "diphthong_transitions": tables["diphthong_transitions"],
+        "right_chord_masks": tables["right_chord_masks"],
+        "left_alt_chord_eligibility": _encode_eligibility(tables["_TheoryService__left_alt_chord_eligibility"]),
+        "right_alt_chord_eligibility": _encode_eligibility(tables["_TheoryService__right_alt_chord_eligibility"]),
+        "clusters_trie": _encode_trie(tables["clusters_trie"]),
+        "vowel_clusters_trie": _encode_trie(tables["vowel_clusters_trie"]),
+        "consonant_split_tables": tables["_TheoryService__consonant_split_tables"],
+        "chords_to_phonemes_vowels": list(tables["chords_to_phonemes_vowels"].items()),
+    }
+
+    file.write(_MAGIC)
+    file.write(theory.content_hash.encode("ascii"))
+    file.write(json.dumps(encoded, separators=(",", ":")).encode("utf-8"))
+
+def read_compiled_theory_hash(file: BinaryIO) -> str:
+    """Reads only the content hash of a compiled theory, leaving `file` positioned at its tables"""
+
+    if file.read(len(_MAGIC)) != _MAGIC:
+        raise ValueError("not a compiled theory file")
+    return file.read(64).decode("ascii")
+
+def load_compiled_theory(spec: type[TheorySpec], file: BinaryIO) -> TheoryService:
+    """Gets the shared service for `spec` with its tables read from a compiled theory file instead of built.
+    Raises `ValueError` if the file was compiled from a different version of the spec or is malformed, including when a
+    table does not have an entry for every phoneme code or substroke of the theory.
+    """
+
+    theory = TheoryService.for_spec(spec)
+
+    content_hash = read_compiled_theory_hash(file)
+    if content_hash != theory.content_hash:
+        raise ValueError(f"compiled theory is out of date (hash {content_hash}, expected {theory.content_hash})")
+
+    split_table_sizes = tuple(
+        (bank_mask >> theory.first_key_rank(bank_mask)) + 1
+        for bank_mask in (theory.left_bank_mask, theory.right_bank_mask | theory.asterisk_mask)
+    )
+
+    try:
+        encoded = json.loads(file.read().decode("utf-8"))
+        tables = {
+            "left_chords": _decode_strokes(encoded["left_chords"]),
+            "vowel_chords": _decode_strokes(encoded["vowel_chords"]),
+            "right_chords": _decode_strokes(encoded["right_chords"]),
+            "left_alt_chords": _decode_strokes(encoded["left_alt_chords"]),
+            "right_alt_chords": _decode_strokes(encoded["right_alt_chords"]),
+            "diphthong_transitions": [_optional_code(code) for code in _list(encoded["diphthong_transitions"], N_STENOPHONEME_CODES)],
+            "right_chord_masks": [_optional_mask(mask, theory) for mask in _list(encoded["right_chord_masks"], N_STENOPHONEME_CODES)],
+            "_TheoryService__left_alt_chord_eligibility": _decode_eligibility(encoded["left_alt_chord_eligibility"]),
+            "_TheoryService__right_alt_chord_eligibility": _decode_eligibility(encoded["right_alt_chord_eligibility"]),
+            "clusters_trie": _decode_trie(encoded["clusters_trie"]),
+            "vowel_clusters_trie": _decode_trie(encoded["vowel_clusters_trie"]),
+            "_TheoryService__consonant_split_tables": tuple(
+                _decode_split_table(table, size)
+                for table, size in zip(_list(encoded["consonant_split_tables"], len(split_table_sizes)), split_table_sizes)
+            ),
+            "chords_to_phonemes_vowels": {_mask(chord, theory): _code(code) for chord, code in encoded["chords_to_phonemes_vowels"]},
+        }
+    except (KeyError, IndexError, TypeError, UnicodeDecodeError, ValueError) as error:
+        raise ValueError(f"malformed compiled theory: {error!r}") from error
+
+    theory.load_compiled_tables(tables)
+    return theory
+
+
+def default_compiled_theory_dir():
+    return Path(plover.log.LOG_FILENAME).parent / "hatchery-theory"
+
+def load_or_compile_theory(theory: TheoryService, directory: Path):
+    """Loads the theory's tables from the artifact in `directory` matching its content hash if there is one, or else
+    compiles them and writes that artifact for later loads. Does nothing if the tables are already compiled."""
+
+    if theory.is_compiled:
+        return theory
+
+    path = directory / f"{theory.content_hash}{_SUFFIX}"
+    try:
+        with open(path, "rb") as file:
+            return load_compiled_theory(theory.spec, file)
+    except FileNotFoundError:
+        pass
+    except ValueError as error:
+        plover.log.warning(f"ignoring compiled theory {path}: {error}")
+
+    theory.compile()
+
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        directory.mkdir(parents=True, exist_ok=True)
+        with open(temp_path, "wb") as file:
+            write_compiled_theory(theory, file)
+        os.replace(temp_path, path)
+        plover.log.debug(f"wrote compiled theory {path}")
+    except OSError as error:
+        temp_path.unlink(missing_ok=True)
+        plover.log.warning(f"could not write compiled theory {path}: {error}")
+
+    return theory
+
+
+# Every value read from a file is checked to be of the type and in the range it should be, and every table to have as
+# many entries as the theory indexes into it with, so that a malformed file is rejected on load rather than failing later
+# in a lookup
+
+def _int(value: Any) -> int:
+    if type(value) is not int:
+        raise TypeError(f"expected an int, got {value!r}")
+    return value
+
+def _optional_int(value: Any) -> "int | None":
+    return None if value is None else _int(value)
+
+def _code(value: Any) -> int:
+    if not 0 <= _int(value) < N_STENOPHONEME_CODES:
+        raise ValueError(f"expected a phoneme code, got {value!r}")
+    return value
+
+def _optional_code(value: Any) -> "int | None":
+    return None if value is None else _code(value)
+
+def _mask(value: Any, theory: TheoryService) -> int:
+    if _int(value) < 0 or value & ~theory.all_keys_mask != 0:
+        raise ValueError(f"expected a mask of the theory's keys, got {value!r}")
+    return value
+
+def _optional_mask(value: Any, theory: TheoryService) -> "int | None":
+    return None if value is None else _mask(value, theory)
+
+def _list(value: Any, length: "int | None"=None) -> list:
+    if not isinstance(value, list):
+        raise TypeError(f"expected a list, got {type(value).__name__}")
+    if length is not None and len(value) != length:
+        raise ValueError(f"expected a list of {length} entries, got {len(value)}")
+    return value
+
+
+def _encode_strokes(strokes: "list[Stroke | None]"):
+    return [int(stroke) if stroke is not None else None for stroke in strokes]
+
+def _decode_strokes(masks: Any) -> "list[Stroke | None]":
+    return [Stroke.from_integer(mask) if mask is not None else None for mask in map(_optional_int, _list(masks, N_STENOPHONEME_CODES))]
+
+
+_ELIGIBILITY_PAIRS = ((False, False), (False, True), (True, False), (True, True))
+"""`(should_use_alt_from_prev, should_use_alt_from_next)` pairs, indexed by their encoding as 2-bit ints"""
+
+def _encode_eligibility(eligibility: "list[list[list[tuple[bool, bool]]] | None]"):
+    return [
+        [[from_prev * 2 + from_next for from_prev, from_next in row] for row in table] if table is not None else None
+        for table in eligibility
+    ]
+
+def _decode_eligibility(encoded: Any) -> "list[list[list[tuple[bool, bool]]] | None]":
+    # Each table has an extra row and column for when there is no previous or next consonant
+    n_neighbors = N_STENOPHONEME_CODES + 1
+    return [
+        [[_eligibility_pair(pair) for pair in _list(row, n_neighbors)] for row in _list(table, n_neighbors)] if table is not None else None
+        for table in _list(encoded, N_STENOPHONEME_CODES)
+    ]
+
+def _eligibility_pair(value: Any) -> tuple[bool, bool]:
+    if not 0 <= _int(value) < len(_ELIGIBILITY_PAIRS):
+        raise ValueError(f"expected an alt chord eligibility pair, got {value!r}")
+    return _ELIGIBILITY_PAIRS[value]
+
+
+def _encode_trie(trie: "ReadonlyTrie[int | Stroke, Stroke]"):
+    transitions, translations, keys = trie.parts()
+    return {
+        # Keys are phoneme codes or strokes, which are both ints otherwise
+        "keys": [["stroke" if isinstance(key, Stroke) else "code", int(key), key_id] for key, key_id in keys.items()],
+        "transitions": [[src_node, key_id, dst_node] for (src_node, key_id), dst_node in transitions.items()],
+        "translations": [[node, int(stroke)] for node, stroke in translations.items()],
+    }
+
+def _decode_trie(encoded: Any) -> "ReadonlyTrie[int | Stroke, Stroke]":
+    keys: "dict[int | Stroke, int]" = {}
+    for kind, value, key_id in _list(encoded["keys"]):
+        if kind == "stroke":
+            keys[Stroke.from_integer(_int(value))] = _int(key_id)
+        elif kind == "code":
+            keys[_int(value)] = _int(key_id)
+        else:
+            raise TypeError(f"unknown trie key kind {kind!r}")
+
+    return ReadonlyTrie.from_parts(
+        {(_int(src_node), _int(key_id)): _int(dst_node) for src_node, key_id, dst_node in _list(encoded["transitions"])},
+        {_int(node): Stroke.from_integer(_int(stroke)) for node, stroke in _list(encoded["translations"])},
+        keys,
+    )
+
+
+def _decode_split_table(encoded: Any, size: int) -> list[tuple[int, ...]]:
+    # Equal splits share one tuple, as they do when the tables are built
+    shared_splits: dict[tuple[int, ...], tuple[int, ...]] = {}
+    table: list[tuple[int, ...]] = []
+    for split in _list(encoded, size):
+        split = tuple(map(_code, _list(split)))
+        table.append(shared_splits.setdefault(split, split))
+    return table
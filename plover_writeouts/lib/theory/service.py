@@ -1,68 +1,262 @@
+from functools import cached_property
+from typing import TypeVar
 
 from plover.steno import Stroke
 
-from ..stenophoneme.Stenophoneme import Stenophoneme
+from ..stenophoneme.Stenophoneme import Stenophoneme, STENOPHONEMES_BY_CODE, STENOPHONEME_CODES, N_STENOPHONEME_CODES
 from ..sopheme.Sound import Sound
 from .spec import TheorySpec
 from ..util.Trie import Trie, ReadonlyTrie
 
+_T = TypeVar("_T")
+
+_NO_NEIGHBOR_CODE = N_STENOPHONEME_CODES
+"""Index into the alt chord eligibility tables used when there is no previous or next consonant"""
+
+CONSONANT_SPLIT_CHORDS: "dict[str, tuple[Stenophoneme, ...]]" = {
+    "PHR": (Stenophoneme.P, Stenophoneme.L),
+    "TPHR": (Stenophoneme.F, Stenophoneme.L),
+}
+"""Chords besides the theory's own consonant chords that the consonant splitter recognizes, for any theory"""
+
+_MAX_MEMOIZED_STROKES = 1 << 16
+"""Strokes each of the stroke conversion memos holds at most. Conversions past this are computed without being stored,
+since strokes can come from outside the dictionary, e.g., from clients of the lookup service."""
+
 class TheoryService:
     def __init__(self, spec: type[TheorySpec]):
         self.spec = spec
 
-        self.clusters_trie = self.__build_clusters_trie()
-        self.vowel_clusters_trie = self.__build_vowel_clusters_trie()
-        self.__split_consonant_phonemes = self.__build_consonants_splitter()
-        self.chords_to_phonemes_vowels = self.__build_chords_to_phonemes_vowels()
+        # Bitmask stroke algebra: strokes as plain ints, with one bit per key ranked in steno order
+        self.all_keys_mask = int(spec.ALL_KEYS)
+        self.left_bank_mask = int(spec.LEFT_BANK_CONSONANTS_SUBSTROKE)
+        self.vowels_mask = int(spec.VOWELS_SUBSTROKE)
+        self.right_bank_mask = int(spec.RIGHT_BANK_CONSONANTS_SUBSTROKE)
+        self.asterisk_mask = int(spec.ASTERISK_SUBSTROKE)
+        self.linker_mask = int(spec.LINKER_CHORD)
+        self.cycler_mask = int(spec.CYCLER_STROKE)
+        self.prohibited_masks = frozenset(int(stroke) for stroke in spec.PROHIBITED_STROKES)
+        self.__key_names_by_rank: tuple[str, ...] = tuple(
+            Stroke.from_integer(1 << rank).keys()[0]
+            for rank in range(self.all_keys_mask.bit_length())
+        )
+        self.__steno_masks: dict[str, int] = {
+            key: 1 << rank
+            for rank, key in enumerate(self.__key_names_by_rank)
+        }
+        self.__mask_keys: dict[int, tuple[str, ...]] = {}
+        self.__mask_stenos: dict[int, str] = {}
+        self.__left_bank_shift = self.first_key_rank(self.left_bank_mask)
+        self.__right_bank_shift = self.first_key_rank(self.right_bank_mask | self.asterisk_mask)
+
+    __services_by_spec: "dict[type[TheorySpec], TheoryService]" = {}
 
     @staticmethod
     def theory(spec: type[TheorySpec]) -> "TheoryService":
         assert not (spec.LINKER_CHORD & ~spec.LEFT_BANK_CONSONANTS_SUBSTROKE), "Linker chord must only consist of starter keys"
 
-        return TheoryService(spec)
+        return TheoryService.for_spec(spec)
+    
+    @staticmethod
+    def for_spec(spec: type[TheorySpec]) -> "TheoryService":
+        """The service for a theory spec, created once so that every dictionary using the same theory shares its compiled tables"""
+
+        service = TheoryService.__services_by_spec.get(spec)
+        if service is None:
+            service = TheoryService.__services_by_spec[spec] = TheoryService(spec)
+        return service
+    
+
+    # Compiled tables below are built on first use and then kept, so that importing a theory does not compile it
+
+    # Dense tables indexed by phoneme code; `None` where the theory has no mapping for a phoneme
+
+    @cached_property
+    def left_chords(self):
+        return self.__build_table_by_code(self.spec.PHONEMES_TO_CHORDS_LEFT)
+
+    @cached_property
+    def vowel_chords(self):
+        return self.__build_table_by_code(self.spec.PHONEMES_TO_CHORDS_VOWELS)
+
+    @cached_property
+    def right_chords(self):
+        return self.__build_table_by_code(self.spec.PHONEMES_TO_CHORDS_RIGHT)
+
+    @cached_property
+    def left_alt_chords(self):
+        return self.__build_table_by_code(self.spec.PHONEMES_TO_CHORDS_LEFT_ALT)
+
+    @cached_property
+    def right_alt_chords(self):
+        return self.__build_table_by_code(self.spec.PHONEMES_TO_CHORDS_RIGHT_ALT)
+
+    @cached_property
+    def diphthong_transitions(self):
+        return self.__build_table_by_code({
+            prev_vowel_phoneme: STENOPHONEME_CODES[phoneme]
+            for prev_vowel_phoneme, phoneme in self.spec.DIPHTHONG_TRANSITIONS_BY_FIRST_VOWEL.items()
+        })
+
+    @cached_property
+    def right_chord_masks(self):
+        return [int(chord) if chord is not None else None for chord in self.right_chords]
+
+    @cached_property
+    def __left_alt_chord_eligibility(self):
+        return self.__build_alt_chord_eligibility(self.left_chords, self.left_alt_chords)
+
+    @cached_property
+    def __right_alt_chord_eligibility(self):
+        return self.__build_alt_chord_eligibility(self.right_chords, self.right_alt_chords)
+
+    @cached_property
+    def clusters_trie(self):
+        return self.__build_clusters_trie()
+
+    @cached_property
+    def vowel_clusters_trie(self):
+        return self.__build_vowel_clusters_trie()
+
+    @cached_property
+    def __consonant_split_tables(self):
+        return self.__build_consonant_split_tables()
+
+    @cached_property
+    def __left_bank_splits(self):
+        return self.__consonant_split_tables[0]
+
+    @cached_property
+    def __right_bank_splits(self):
+        return self.__consonant_split_tables[1]
+
+    @cached_property
+    def chords_to_phonemes_vowels(self):
+        return self.__build_chords_to_phonemes_vowels()
+
+    COMPILED_TABLE_NAMES = (
+        "left_chords", "vowel_chords", "right_chords", "left_alt_chords", "right_alt_chords",
+        "diphthong_transitions", "right_chord_masks",
+        "_TheoryService__left_alt_chord_eligibility", "_TheoryService__right_alt_chord_eligibility",
+        "clusters_trie", "vowel_clusters_trie",
+        "_TheoryService__consonant_split_tables",
+        "chords_to_phonemes_vowels",
+    )
+    """Attribute names of the tables built on first use; these are what a compiled theory artifact stores"""
+
+    def compile(self):
+        """Builds every compiled table now rather than on first use"""
+
+        for table_name in self.COMPILED_TABLE_NAMES:
+            getattr(self, table_name)
+
+        return self
+    
+    def compiled_tables(self) -> dict[str, object]:
+        self.compile()
+        return {table_name: self.__dict__[table_name] for table_name in self.COMPILED_TABLE_NAMES}
+    
+    @property
+    def is_compiled(self):
+        return all(table_name in self.__dict__ for table_name in self.COMPILED_TABLE_NAMES)
+
+    def load_compiled_tables(self, tables: dict[str, object]):
+        """Uses previously compiled tables instead of building them"""
+
+        for table_name in self.COMPILED_TABLE_NAMES:
+            self.__dict__[table_name] = tables[table_name]
+
+    @cached_property
+    def content_hash(self) -> str:
+        """A hash of everything the compiled tables are built from. Equal hashes mean equal compiled tables, and together with a dictionary's contents, equal lookup tries"""
+        from .artifact import theory_content_hash
+        return theory_content_hash(self.spec)
+
+    @staticmethod
+    def __build_table_by_code(mapping: "dict[Stenophoneme, _T]") -> "list[_T | None]":
+        return [mapping.get(phoneme) for phoneme in STENOPHONEMES_BY_CODE]
+
+    def __build_alt_chord_eligibility(self, main_chords: "list[Stroke | None]", alt_chords: "list[Stroke | None]"):
+        """Precomputes, for each phoneme with an alt chord, the `(should_use_alt_from_prev, should_use_alt_from_next)` decision
+        for every pair of neighboring consonants, indexed `[phoneme][prev phoneme][next phoneme]`. Neighbors are compared
+        against their right-bank chords, since those are what can precede or follow the chord within the same stroke.
+        """
+
+        eligibility: "list[list[list[tuple[bool, bool]]] | None]" = []
+
+        for main_chord, alt_chord in zip(main_chords, alt_chords):
+            if main_chord is None or alt_chord is None:
+                eligibility.append(None)
+                continue
 
-    def __build_clusters_trie(self) -> ReadonlyTrie[Stenophoneme, Stroke]:
-        clusters_trie: Trie[Stenophoneme, Stroke] = Trie()
+            main_mask = int(main_chord)
+            alt_mask = int(alt_chord)
+
+            should_use_alt_from_prev = [
+                (prev_mask := self.right_chord_masks[prev_code]) is not None and (
+                    self.can_add_mask_on(prev_mask, main_mask)
+                    or not self.can_add_mask_on(prev_mask, alt_mask)
+                )
+                for prev_code in range(N_STENOPHONEME_CODES)
+            ] + [True]
+            should_use_alt_from_next = [
+                (next_mask := self.right_chord_masks[next_code]) is not None and (
+                    self.can_add_mask_on(main_mask, next_mask)
+                    or not self.can_add_mask_on(alt_mask, next_mask)
+                )
+                for next_code in range(N_STENOPHONEME_CODES)
+            ] + [True]
+
+            eligibility.append([
+                [(from_prev, from_next) for from_next in should_use_alt_from_next]
+                for from_prev in should_use_alt_from_prev
+            ])
+
+        return eligibility
+
+    def __build_clusters_trie(self) -> ReadonlyTrie[int, Stroke]:
+        clusters_trie: Trie[int, Stroke] = Trie()
         for phonemes, stroke in self.spec.CLUSTERS.items():
             current_head = clusters_trie.ROOT
             for key in phonemes:
-                current_head = clusters_trie.get_dst_node_else_create(current_head, key)
+                current_head = clusters_trie.get_dst_node_else_create(current_head, STENOPHONEME_CODES[key])
 
             clusters_trie.set_translation(current_head, stroke)
         return clusters_trie.frozen()
     
-    def __build_vowel_clusters_trie(self) -> ReadonlyTrie["Stenophoneme | Stroke", Stroke]:
-        clusters_trie: "Trie[Stenophoneme | Stroke, Stroke]" = Trie()
+    def __build_vowel_clusters_trie(self) -> ReadonlyTrie["int | Stroke", Stroke]:
+        clusters_trie: "Trie[int | Stroke, Stroke]" = Trie()
         for phonemes, stroke in self.spec.VOWEL_CONSCIOUS_CLUSTERS.items():
             current_head = clusters_trie.ROOT
             for key in phonemes:
-                current_head = clusters_trie.get_dst_node_else_create(current_head, key)
+                current_head = clusters_trie.get_dst_node_else_create(current_head, STENOPHONEME_CODES[key] if isinstance(key, Stenophoneme) else key)
 
             clusters_trie.set_translation(current_head, stroke)
         return clusters_trie.frozen()
     
-    def __build_consonants_splitter(self):
-        _CONSONANT_CHORDS: dict[Stroke, tuple[Stenophoneme, ...]] = {
+    def __build_consonant_split_tables(self):
+        """Splits every left-bank substroke and every right-bank (plus asterisk) substroke into consonant phonemes ahead of time.
+        Each table is indexed by a substroke's mask shifted down to its bank's lowest key.
+        """
+
+        _CONSONANT_CHORDS: dict[Stroke, tuple[int, ...]] = {
             **{
-                stroke: (phoneme,)
+                stroke: (STENOPHONEME_CODES[phoneme],)
                 for phoneme, stroke in self.spec.PHONEMES_TO_CHORDS_LEFT.items()
             },
             **{
-                stroke: (phoneme,)
+                stroke: (STENOPHONEME_CODES[phoneme],)
                 for phoneme, stroke in self.spec.PHONEMES_TO_CHORDS_RIGHT.items()
             },
 
             **{
-                Stroke.from_steno(steno): phonemes
-                for steno, phonemes in {
-                    "PHR": (Stenophoneme.P, Stenophoneme.L),
-                    "TPHR": (Stenophoneme.F, Stenophoneme.L),
-                }.items()
+                Stroke.from_steno(steno): tuple(STENOPHONEME_CODES[phoneme] for phoneme in phonemes)
+                for steno, phonemes in CONSONANT_SPLIT_CHORDS.items()
             },
         }
 
         def _build_consonants_trie():
-            consonants_trie: Trie[str, tuple[Stenophoneme, ...]] = Trie()
+            consonants_trie: Trie[str, tuple[int, ...]] = Trie()
             for stroke, _phoneme in _CONSONANT_CHORDS.items():
                 current_head = consonants_trie.get_dst_node_else_create_chain(consonants_trie.ROOT, stroke.keys())
                 consonants_trie.set_translation(current_head, _phoneme)
@@ -70,8 +264,8 @@ class TheoryService:
         _consonants_trie = _build_consonants_trie()
 
 
-        def split_consonant_phonemes(consonants_stroke: Stroke):
-            keys = consonants_stroke.keys()
+        def split_consonant_phonemes(keys: tuple[str, ...]):
+            phonemes: list[int] = []
             
             chord_start_index = 0
             while chord_start_index < len(keys):
@@ -79,7 +273,7 @@ class TheoryService:
 
                 longest_chord_end_index = chord_start_index
 
-                entry: tuple[Stenophoneme, ...] = ()
+                entry: tuple[int, ...] = ()
 
                 for seek_index in range(chord_start_index, len(keys)):
                     key = keys[seek_index]
@@ -95,33 +289,100 @@ class TheoryService:
                     entry = new_entry
                     longest_chord_end_index = seek_index
 
-                yield from entry
+                phonemes.extend(entry)
 
                 chord_start_index = longest_chord_end_index + 1
+
+            return tuple(phonemes)
         
-        return split_consonant_phonemes
+
+        shared_splits: dict[tuple[int, ...], tuple[int, ...]] = {}
+
+        def build_split_table(bank_mask: int):
+            table: list[tuple[int, ...]] = [()] * ((bank_mask >> self.first_key_rank(bank_mask)) + 1)
+
+            # Enumerate every submask of the bank
+            substroke_mask = bank_mask
+            while True:
+                split = split_consonant_phonemes(self.mask_keys(substroke_mask))
+                table[substroke_mask >> self.first_key_rank(bank_mask)] = shared_splits.setdefault(split, split)
+
+                if substroke_mask == 0: break
+                substroke_mask = (substroke_mask - 1) & bank_mask
+
+            return table
+        
+        return build_split_table(self.left_bank_mask), build_split_table(self.right_bank_mask | self.asterisk_mask)
     
     def __build_chords_to_phonemes_vowels(self):
         return {
-            stroke: phoneme
+            int(stroke): STENOPHONEME_CODES[phoneme]
             for phoneme, stroke in self.spec.PHONEMES_TO_CHORDS_VOWELS.items()
         }
     
     def left_consonant_chord(self, sound: Sound) -> Stroke:
-        return self.spec.PHONEMES_TO_CHORDS_LEFT[sound.phoneme]
+        chord = self.left_chords[sound.phoneme]
+        if chord is None:
+            raise KeyError(sound.stenophoneme)
+        return chord
     
     def right_consonant_chord(self, sound: Sound) -> Stroke:
-        return self.spec.PHONEMES_TO_CHORDS_RIGHT[sound.phoneme]
+        chord = self.right_chords[sound.phoneme]
+        if chord is None:
+            raise KeyError(sound.stenophoneme)
+        return chord
+    
+    def left_alt_chord_eligibility(self, sound: Sound, last_sound: "Sound | None", next_sound: "Sound | None") -> "tuple[bool, bool] | None":
+        """`(should_use_alt_from_prev, should_use_alt_from_next)` for the left alt chord of `sound`, or `None` if it has none"""
+        return self.__alt_chord_eligibility(self.__left_alt_chord_eligibility, sound, last_sound, next_sound)
+    
+    def right_alt_chord_eligibility(self, sound: Sound, last_sound: "Sound | None", next_sound: "Sound | None") -> "tuple[bool, bool] | None":
+        """`(should_use_alt_from_prev, should_use_alt_from_next)` for the right alt chord of `sound`, or `None` if it has none"""
+        return self.__alt_chord_eligibility(self.__right_alt_chord_eligibility, sound, last_sound, next_sound)
+
+    @staticmethod
+    def __alt_chord_eligibility(eligibility: "list[list[list[tuple[bool, bool]]] | None]", sound: Sound, last_sound: "Sound | None", next_sound: "Sound | None"):
+        phoneme_eligibility = eligibility[sound.phoneme]
+        if phoneme_eligibility is None:
+            return None
+
+        return phoneme_eligibility[
+            last_sound.phoneme if last_sound is not None else _NO_NEIGHBOR_CODE
+        ][
+            next_sound.phoneme if next_sound is not None else _NO_NEIGHBOR_CODE
+        ]
     
     def split_consonant_phonemes(self, stroke: Stroke):
-        return self.__split_consonant_phonemes(stroke)
+        mask = int(stroke)
+        left_bank_split = self.split_left_bank_mask(mask & self.left_bank_mask)
+        right_bank_split = self.split_right_bank_mask(mask & (self.right_bank_mask | self.asterisk_mask))
+
+        if len(left_bank_split) == 0:
+            return right_bank_split
+        if len(right_bank_split) == 0:
+            return left_bank_split
+        return left_bank_split + right_bank_split
     
-    def can_add_stroke_on(self, src_stroke: Stroke, addon_stroke: Stroke):
+    def split_left_bank_mask(self, left_bank_mask: int) -> tuple[int, ...]:
+        """Consonant phoneme codes for a mask containing only left-bank keys"""
+        return self.__left_bank_splits[left_bank_mask >> self.__left_bank_shift]
+    
+    def split_right_bank_mask(self, right_bank_mask: int) -> tuple[int, ...]:
+        """Consonant phoneme codes for a mask containing only right-bank keys and the asterisk"""
+        return self.__right_bank_splits[right_bank_mask >> self.__right_bank_shift]
+    
+    def transition_cost_weights(self) -> tuple[float, ...]:
+        """The current weights of each abbreviation category, in the order of `TheorySpec.TransitionCategories`.
+        Read from `TransitionCosts` on each call so that changes to it apply to already-built tries.
+        """
         return (
-            len(src_stroke - self.spec.ASTERISK_SUBSTROKE) == 0
-            or len(addon_stroke - self.spec.ASTERISK_SUBSTROKE) == 0
-            or Stroke.from_keys(((src_stroke - self.spec.ASTERISK_SUBSTROKE).keys()[-1],)) < Stroke.from_keys(((addon_stroke - self.spec.ASTERISK_SUBSTROKE).keys()[0],))
+            self.spec.TransitionCosts.VOWEL_ELISION,
+            self.spec.TransitionCosts.CLUSTER,
+            self.spec.TransitionCosts.ALT_CONSONANT,
         )
+    
+    def can_add_stroke_on(self, src_stroke: Stroke, addon_stroke: Stroke):
+        return self.can_add_mask_on(int(src_stroke), int(addon_stroke))
 
     def split_stroke_parts(self, stroke: Stroke):
         left_bank_consonants = stroke & self.spec.LEFT_BANK_CONSONANTS_SUBSTROKE
@@ -129,4 +390,66 @@ class TheoryService:
         right_bank_consonants = stroke & self.spec.RIGHT_BANK_CONSONANTS_SUBSTROKE
         asterisk = stroke & self.spec.ASTERISK_SUBSTROKE
 
-        return left_bank_consonants, vowels, right_bank_consonants, asterisk
\ No newline at end of file
+        return left_bank_consonants, vowels, right_bank_consonants, asterisk
+    
+
+    @staticmethod
+    def first_key_rank(mask: int):
+        return (mask & -mask).bit_length() - 1
+    
+    @staticmethod
+    def last_key_rank(mask: int):
+        return mask.bit_length() - 1
+
+    def can_add_mask_on(self, src_mask: int, addon_mask: int):
+        """Whether the keys of `addon_mask` can follow the keys of `src_mask` in steno order, ignoring the asterisk"""
+
+        src_mask &= ~self.asterisk_mask
+        addon_mask &= ~self.asterisk_mask
+        return (
+            src_mask == 0
+            or addon_mask == 0
+            or self.last_key_rank(src_mask) < self.first_key_rank(addon_mask)
+        )
+
+    def split_mask_parts(self, mask: int):
+        return mask & self.left_bank_mask, mask & self.vowels_mask, mask & self.right_bank_mask, mask & self.asterisk_mask
+    
+    def steno_to_mask(self, steno: str):
+        """Converts a steno string (a stroke or a single key name) to its bitmask, memoizing the result"""
+
+        mask = self.__steno_masks.get(steno)
+        if mask is None:
+            mask = int(Stroke.from_steno(steno))
+            if len(self.__steno_masks) < _MAX_MEMOIZED_STROKES:
+                self.__steno_masks[steno] = mask
+        return mask
+    
+    def mask_keys(self, mask: int):
+        """The names of the keys in `mask` in steno order, equivalent to `Stroke.keys`"""
+
+        keys = self.__mask_keys.get(mask)
+        if keys is not None:
+            return keys
+        
+        key_names: list[str] = []
+        remaining_mask = mask
+        while remaining_mask != 0:
+            lowest_key_mask = remaining_mask & -remaining_mask
+            key_names.append(self.__key_names_by_rank[self.first_key_rank(lowest_key_mask)])
+            remaining_mask ^= lowest_key_mask
+
+        keys = tuple(key_names)
+        if len(self.__mask_keys) < _MAX_MEMOIZED_STROKES:
+            self.__mask_keys[mask] = keys
+        return keys
+    
+    def mask_to_steno(self, mask: int):
+        """The RTF/CRE steno of `mask`, equivalent to `Stroke.rtfcre`"""
+
+        steno = self.__mask_stenos.get(mask)
+        if steno is None:
+            steno = Stroke.from_integer(mask).rtfcre
+            if len(self.__mask_stenos) < _MAX_MEMOIZED_STROKES:
+                self.__mask_stenos[mask] = steno
+        return steno
\ No newline at end of file
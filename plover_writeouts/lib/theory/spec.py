@@ -3,6 +3,7 @@ from abc import ABC
 from plover.steno import Stroke
 
 from ..stenophoneme.Stenophoneme import Stenophoneme
+from ..util.Trie import TransitionCategoryCounts, NO_TRANSITION_COST
 
 class TheorySpec(ABC):
     ALL_KEYS: Stroke
@@ -39,3 +40,13 @@ class TheorySpec(ABC):
         VOWEL_ELISION: int
         CLUSTER: int
         ALT_CONSONANT: int
+
+    class TransitionCategories:
+        """The abbreviation category counts that a single use of each kind of abbreviation adds to a transition. Counts
+        are weighted by `TransitionCosts` in this order (see `TheoryService.transition_cost_weights`).
+        """
+
+        NONE = NO_TRANSITION_COST
+        VOWEL_ELISION = TransitionCategoryCounts((1,))
+        CLUSTER = TransitionCategoryCounts((0, 1))
+        ALT_CONSONANT = TransitionCategoryCounts((0, 0, 1))
@@ -1,4 +1,5 @@
 from collections import defaultdict
+from functools import cache
 from typing import Generic, Iterable, Optional, TypeVar, NamedTuple
 from dataclasses import dataclass
 
@@ -16,10 +17,52 @@ class TransitionCostKey(NamedTuple):
     transition: Transition
     value_id: int
 
+@dataclass(frozen=True)
+class TransitionCategoryCounts:
+    """How many abbreviations of each category (e.g., vowel elisions) a transition or path uses. Costs are computed from
+    these counts with the weights current at lookup time, so the weights can change without rebuilding the trie.
+    """
+
+    counts: tuple[int, ...] = ()
+
+    def __add__(self, other: "TransitionCategoryCounts"):
+        return _add_category_counts(self, other)
+    
+    def weighted(self, weights: tuple[float, ...]) -> float:
+        return sum(count * weight for count, weight in zip(self.counts, weights))
+    
+    def is_at_most(self, other: "TransitionCategoryCounts"):
+        """Whether every count in this is less than or equal to the corresponding count in `other`"""
+        return all(
+            count <= (other.counts[i] if i < len(other.counts) else 0)
+            for i, count in enumerate(self.counts)
+        )
+    
+    @property
+    def n_steps(self):
+        return sum(self.counts)
+
+NO_TRANSITION_COST = TransitionCategoryCounts()
+
+@cache
+def _add_category_counts(a: TransitionCategoryCounts, b: TransitionCategoryCounts):
+    # Cached so that equal sums are shared rather than stored once per transition
+    if len(a.counts) < len(b.counts):
+        a, b = b, a
+    return TransitionCategoryCounts(tuple(
+        count + (b.counts[i] if i < len(b.counts) else 0)
+        for i, count in enumerate(a.counts)
+    ))
+
+@cache
+def _cost_options(*costs: TransitionCategoryCounts):
+    return costs
+
 @dataclass(frozen=True)
 class TransitionCostInfo(Generic[V]):
-    cost: float
-    value: V
+    cost: TransitionCategoryCounts
+    values: tuple[V, ...]
+    """The values which this cost is assigned to; entries that share a path are labeled together"""
 
 class Trie(Generic[K, V]):
     ROOT = 0
@@ -130,6 +173,18 @@ class ReadonlyTrie(Generic[K, V]):
     def get_translation(self, node: int):
         return self.__translations.get(node)
 
+    def parts(self):
+        """The trie's transitions as `(src node, key id) -> dst node`, its translations, and its key ids, for serializing"""
+        return self.__nodes, self.__translations, self.__keys
+
+    @classmethod
+    def from_parts(cls, transitions: dict[tuple[int, int], int], translations: dict[int, V], keys: dict[K, int]) -> "ReadonlyTrie[K, V]":
+        trie = cls.__new__(cls)
+        trie.__nodes = transitions
+        trie.__translations = translations
+        trie.__keys = keys
+        return trie
+
 
 class NondeterministicTrie(Generic[K, V]):
     """A trie that can be in multiple states at once."""
@@ -147,7 +202,22 @@ class NondeterministicTrie(Generic[K, V]):
         """Mapping from each value to its id"""
         self.__values_list: list[V] = []
         """Mapping from each value's id to the value"""
-        self.__transition_costs: dict[TransitionCostKey, float] = {}
+        self.__transition_costs: dict[TransitionCostKey, tuple[TransitionCategoryCounts, ...]] = {}
+        """Mapping from each (transition, value) pair to the category counts it can be reached with; counts that can never be
+        cheaper than another option under nonnegative weights are dropped"""
+        self.__n_transitions = 0
+
+    @property
+    def n_nodes(self):
+        return len(self.__nodes)
+    
+    @property
+    def n_transitions(self):
+        return self.__n_transitions
+    
+    @property
+    def n_cost_labels(self):
+        return len(self.__transition_costs)
 
     def get_first_dst_node_else_create(self, src_node: int, key: K, cost_info: TransitionCostInfo[V]) -> int:
         key_id = self.__get_key_id_else_create(key)
@@ -160,6 +230,7 @@ class NondeterministicTrie(Generic[K, V]):
         
         new_node_id = self.__create_new_node()
         transitions[key_id] = [new_node_id]
+        self.__n_transitions += 1
         return new_node_id
     
 
@@ -169,7 +240,7 @@ class NondeterministicTrie(Generic[K, V]):
             if i == len(keys) - 1:
                 current_node = self.get_first_dst_node_else_create(current_node, key, cost_info)
             else:
-                current_node = self.get_first_dst_node_else_create(current_node, key, TransitionCostInfo(0, cost_info.value))
+                current_node = self.get_first_dst_node_else_create(current_node, key, TransitionCostInfo(NO_TRANSITION_COST, cost_info.values))
         return current_node
 
     def get_dst_nodes(self, src_nodes: dict[int, tuple[Transition, ...]], key: K):
@@ -192,6 +263,11 @@ class NondeterministicTrie(Generic[K, V]):
                 return current_nodes
         return current_nodes
     
+    def get_keys_from(self, node: int) -> tuple[K, ...]:
+        """The keys of the transitions out of `node`"""
+        key_ids = self.__nodes[node].keys()
+        return tuple(key for key, key_id in self.__keys.items() if key_id in key_ids)
+
     def link(self, src_node: int, dst_node: int, key: K, cost_info: TransitionCostInfo[V]):
         key_id = self.__get_key_id_else_create(key)
         
@@ -201,6 +277,7 @@ class NondeterministicTrie(Generic[K, V]):
         else:
             new_transition_index = 0
             self.__nodes[src_node][key_id] = [dst_node]
+        self.__n_transitions += 1
 
         self.__assign_cost(src_node, key_id, new_transition_index, cost_info)
 
@@ -208,7 +285,7 @@ class NondeterministicTrie(Generic[K, V]):
     def link_chain(self, src_node: int, dst_node: int, keys: tuple[K, ...], cost_info: TransitionCostInfo[V]):
         current_node = src_node
         for key in keys[:-1]:
-            current_node = self.get_first_dst_node_else_create(current_node, key, TransitionCostInfo(0, cost_info.value))
+            current_node = self.get_first_dst_node_else_create(current_node, key, TransitionCostInfo(NO_TRANSITION_COST, cost_info.values))
 
         self.link(current_node, dst_node, keys[-1], cost_info)
     
@@ -221,7 +298,7 @@ class NondeterministicTrie(Generic[K, V]):
             self.__translations[node] = [translation_id]
         
     
-    def get_translations_and_costs_single(self, node: int, transitions: Iterable[Transition]) -> tuple[tuple[V, float], ...]:
+    def get_translations_and_costs_single(self, node: int, transitions: Iterable[Transition], weights: tuple[float, ...]) -> tuple[tuple[V, float], ...]:
         if node not in self.__translations:
             return ()
         
@@ -234,17 +311,20 @@ class NondeterministicTrie(Generic[K, V]):
                 if key not in self.__transition_costs:
                     continue
                 
-                cumsum_cost += self.__transition_costs[key]
+                cumsum_cost += min(cost.weighted(weights) for cost in self.__transition_costs[key])
 
             translation_cost_pairs.append((self.__values_list[translation_id], cumsum_cost))
 
         return tuple(translation_cost_pairs)
 
 
-    def get_translations_and_costs(self, nodes: dict[int, tuple[Transition, ...]]):
+    def get_translations_and_costs(self, nodes: dict[int, tuple[Transition, ...]], weights: tuple[float, ...]):
+        """Finds the translations at the given nodes and the cheapest cost of reaching each, weighting each abbreviation
+        category's count by the corresponding entry in `weights`"""
+
         results: dict[V, tuple[float, tuple[Transition, ...]]] = {}
         for node, transitions in nodes.items():
-            for translation, cost in self.get_translations_and_costs_single(node, transitions):
+            for translation, cost in self.get_translations_and_costs_single(node, transitions, weights):
                 if cost >= results.get(translation, (float("inf"), -1))[0]: continue
                 results[translation] = (cost, transitions)
         return results
@@ -257,7 +337,7 @@ class NondeterministicTrie(Generic[K, V]):
 
         key_ids_to_keys = self.__key_ids_to_keys()
 
-        transition_costs: dict[Transition, dict[int, float]] = {}
+        transition_costs: dict[Transition, dict[int, tuple[TransitionCategoryCounts, ...]]] = {}
         for (transition, value_id), cost in self.__transition_costs.items():
             if transition in transition_costs:
                 transition_costs[transition][value_id] = cost
@@ -291,11 +371,29 @@ class NondeterministicTrie(Generic[K, V]):
 #         return new_trie
     
 
-    # def profile(self):
-    #     from pympler.asizeof import asizeof
-    #     n_transitions = sum(sum(len(dst_nodes) for dst_nodes in transitions.values()) for transitions in self.__nodes)
-    #     return f"{len(self.__nodes):,} nodes, {n_transitions:,} transitions, {len(self.__translations):,} translations ({asizeof(self):,} bytes)"
+    def memory_sections(self, seen: "set[int] | None"=None):
+        """Counts of each of the trie's structures and estimates of the bytes they use, per `deep_sizeof`"""
+
+        from .memory import MemorySection, deep_sizeof
+
+        if seen is None:
+            seen = set()
+
+        return (
+            MemorySection("nodes", len(self.__nodes), deep_sizeof(self.__nodes, seen)),
+            MemorySection("translation nodes", len(self.__translations), deep_sizeof(self.__translations, seen)),
+            MemorySection("keys", len(self.__keys), deep_sizeof(self.__keys, seen)),
+            MemorySection("values", len(self.__values_list), deep_sizeof(self.__values, seen) + deep_sizeof(self.__values_list, seen)),
+            MemorySection("cost labels", len(self.__transition_costs), deep_sizeof(self.__transition_costs, seen)),
+        )
     
+    def compiled(self: "NondeterministicTrie[str, str]"):
+        """Flattens the trie into arrays; see `CompiledTrie`"""
+
+        from .compiled_trie import compile_trie
+
+        return compile_trie(self.__nodes, self.__translations, self.__keys, self.__values_list, self.__transition_costs)
+
     # def frozen(self):
     #     return ReadonlyNondeterministicTrie(self.__nodes, self.__translations, self.__keys)
     
@@ -307,6 +405,15 @@ class NondeterministicTrie(Generic[K, V]):
         self.__keys[key] = new_key_id
         return new_key_id
     
+    def add_values(self, values: Iterable[V]):
+        """Gives ids to values ahead of adding them, so that value ids follow the order of `values`"""
+
+        for value in values:
+            self.__get_value_id_else_create(value)
+
+    def value_id(self, value: V):
+        return self.__values.get(value)
+
     def __get_value_id_else_create(self, value: V):
         if value in self.__values:
             return self.__values[value]
@@ -323,10 +430,24 @@ class NondeterministicTrie(Generic[K, V]):
     
     def __assign_cost(self, src_node: int, key_id: int, new_transition_index: int, cost_info: Optional[TransitionCostInfo[V]]):
         if cost_info is None: return
-        cost_key = TransitionCostKey(Transition(src_node, key_id, new_transition_index), self.__get_value_id_else_create(cost_info.value))
-        self.__transition_costs[cost_key] = min(cost_info.cost, self.__transition_costs.get(cost_key, float("inf")))
+        transition = Transition(src_node, key_id, new_transition_index)
+        for value in cost_info.values:
+            cost_key = TransitionCostKey(transition, self.__get_value_id_else_create(value))
+
+            existing_costs = self.__transition_costs.get(cost_key)
+            if existing_costs is None:
+                self.__transition_costs[cost_key] = _cost_options(cost_info.cost)
+            elif not any(existing_cost.is_at_most(cost_info.cost) for existing_cost in existing_costs):
+                self.__transition_costs[cost_key] = _cost_options(
+                    *(existing_cost for existing_cost in existing_costs if not cost_info.cost.is_at_most(existing_cost)),
+                    cost_info.cost,
+                )
 
     def build_reverse_lookup(self):
+        """Returns a search for the key sequences that reach a value. If the search is given `pause_every`, it also yields
+        None after visiting every that many nodes, so that a caller can stop or do other work in the middle of a search
+        that runs long without finding anything."""
+
         reverse_nodes: dict[int, dict[int, list[tuple[int, int]]]] = defaultdict(lambda: defaultdict(list))
         for src_node, transitions in enumerate(self.__nodes):
             for key_id, dst_nodes in transitions.items():
@@ -340,7 +461,13 @@ class NondeterministicTrie(Generic[K, V]):
 
         key_ids_to_keys = self.__key_ids_to_keys()
 
-        def dfs(node: int, key_ids_reversed: tuple[int, ...], visited_nodes: set[int], translation: V):
+        def dfs(node: int, key_ids_reversed: tuple[int, ...], visited_nodes: set[int], translation: V, pause: "list[int] | None"):
+            if pause is not None:
+                pause[0] -= 1
+                if pause[0] <= 0:
+                    pause[0] = pause[1]
+                    yield None
+
             if node == self.ROOT:
                 yield tuple(key_ids_to_keys[key_id] for key_id in reversed(key_ids_reversed))
                 return
@@ -352,13 +479,15 @@ class NondeterministicTrie(Generic[K, V]):
                     cost_key = TransitionCostKey(Transition(src_node, key_id, transition_index), self.__get_value_id_else_create(translation))
                     if cost_key not in self.__transition_costs: continue
 
-                    yield from dfs(src_node, key_ids_reversed + (key_id,), visited_nodes | {src_node}, translation)
+                    yield from dfs(src_node, key_ids_reversed + (key_id,), visited_nodes | {src_node}, translation, pause)
 
-        def get_sequences(translation: V):
+        def get_sequences(translation: V, pause_every: "int | None"=None):
             if translation not in reverse_translations: return
-            
+
+            # Nodes left to visit before the next pause, and the number to reset it to
+            pause = [pause_every, pause_every] if pause_every is not None else None
             for node in reverse_translations[translation]:
-                yield from dfs(node, (), {node}, translation)
+                yield from dfs(node, (), {node}, translation, pause)
         
         return get_sequences
 
@@ -456,10 +585,3 @@ class NondeterministicTrie(Generic[K, V]):
 #             if translation is not None:
 #                 return translation
 #         return None
-
-    def profile(self):
-#         from pympler.asizeof import asizeof
-        n_nodes = len(self.__nodes)
-        n_transitions = sum(len(dst_nodes) for dst_nodes in self.__nodes)
-#         return f"{n_nodes:,} nodes, {n_transitions:,} transitions, {len(self.__translations):,} translations ({asizeof(self):,} bytes)"
-        return f"{n_nodes:,} nodes, {n_transitions:,} transitions, {len(self.__translations):,} translations"
\ No newline at end of file
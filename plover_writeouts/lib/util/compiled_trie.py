@@ -0,0 +1,417 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, fields
+from functools import cached_property
+from typing import BinaryIO, Iterable, Sequence
+import struct
+
+from .Trie import Transition, TransitionCostKey, TransitionCategoryCounts
+
+
+@dataclass(frozen=True)
+class CompiledTrie:
+    """A `NondeterministicTrie` flattened into arrays of ids, with the same node, key, and value ids as the trie it was
+    compiled from. It answers the same queries as the trie it was compiled from and can be written out and mapped back in
+    without copying, so several processes can share one; see `SharedTrieRegistry`.
+
+    Transitions are grouped by source node and key, in order of `group_codes`. The destination nodes of group `g` are
+    `dst_nodes[group_starts[g]:group_starts[g + 1]]`, in the order of their transition indices, and each transition is
+    identified by its position in `dst_nodes`.
+    """
+
+    ROOT = 0
+
+    n_nodes: int
+    n_categories: int
+    keys: Sequence[str]
+    """Each key, by id"""
+    values: Sequence[str]
+    """Each value, by id"""
+
+    group_codes: Sequence[int]
+    """`src_node * len(keys) + key_id` of each group of transitions, in ascending order"""
+    group_starts: Sequence[int]
+    dst_nodes: Sequence[int]
+    transition_groups: Sequence[int]
+    """The group of each transition"""
+
+    reverse_starts: Sequence[int]
+    """Where each node's incoming transitions start in `reverse_transitions`, plus the end of the last node's"""
+    reverse_transitions: Sequence[int]
+
+    translation_starts: Sequence[int]
+    """Where each node's value ids start in `translation_value_ids`, plus the end of the last node's"""
+    translation_value_ids: Sequence[int]
+    value_node_starts: Sequence[int]
+    """Where each value's nodes start in `value_nodes`, plus the end of the last value's"""
+    value_nodes: Sequence[int]
+    value_order: Sequence[int]
+    """Value ids, sorted by value"""
+
+    label_codes: Sequence[int]
+    """`transition * len(values) + value_id` of each cost label, in ascending order"""
+    label_option_starts: Sequence[int]
+    """Where each cost label's options start, plus the end of the last label's"""
+    option_counts: Sequence[int]
+    """The category counts of each option, `n_categories` per option, padded with zeros"""
+
+    @property
+    def n_transitions(self):
+        return len(self.dst_nodes)
+
+    @property
+    def n_cost_labels(self):
+        return len(self.label_codes)
+
+    @cached_property
+    def key_ids(self):
+        return {key: key_id for key_id, key in enumerate(self.keys)}
+
+    def compiled(self):
+        return self
+
+    def get_dst_nodes(self, src_nodes: dict[int, tuple[Transition, ...]], key: str):
+        key_id = self.key_ids.get(key)
+        if key_id is None:
+            return {}
+
+        dst_nodes: dict[int, tuple[Transition, ...]] = {}
+        for src_node, node_transitions in src_nodes.items():
+            group = self.__group(src_node, key_id)
+            if group is None: continue
+
+            for transition_index, transition in enumerate(range(self.group_starts[group], self.group_starts[group + 1])):
+                dst_nodes[self.dst_nodes[transition]] = node_transitions + (Transition(src_node, key_id, transition_index),)
+        return dst_nodes
+
+    def get_dst_nodes_chain(self, src_nodes: dict[int, tuple[Transition, ...]], keys: tuple[str, ...]):
+        current_nodes = src_nodes
+        for key in keys:
+            current_nodes = self.get_dst_nodes(current_nodes, key)
+            if len(current_nodes) == 0:
+                return current_nodes
+        return current_nodes
+
+    def get_keys_from(self, node: int) -> tuple[str, ...]:
+        n_keys = len(self.keys)
+        first_group = bisect_left(self.group_codes, node * n_keys)
+        end_group = bisect_left(self.group_codes, (node + 1) * n_keys)
+        return tuple(self.keys[self.group_codes[group] % n_keys] for group in range(first_group, end_group))
+
+    def get_translations_and_costs_single(self, node: int, transitions: Iterable[Transition], weights: tuple[float, ...]) -> tuple[tuple[str, float], ...]:
+        transition_ids = [self.group_starts[self.__group(transition.node_index, transition.key_id)] + transition.transition_index for transition in transitions]
+
+        translation_cost_pairs: list[tuple[str, float]] = []
+        for translation_id in self.translation_value_ids[self.translation_starts[node]:self.translation_starts[node + 1]]:
+            cumsum_cost = 0
+            for transition_id in transition_ids:
+                label = self.__label(transition_id, translation_id)
+                if label is None:
+                    continue
+
+                cumsum_cost += min(cost.weighted(weights) for cost in self.__label_costs(label))
+
+            translation_cost_pairs.append((self.values[translation_id], cumsum_cost))
+
+        return tuple(translation_cost_pairs)
+
+    def get_translations_and_costs(self, nodes: dict[int, tuple[Transition, ...]], weights: tuple[float, ...]):
+        """See `NondeterministicTrie.get_translations_and_costs`"""
+
+        results: dict[str, tuple[float, tuple[Transition, ...]]] = {}
+        for node, transitions in nodes.items():
+            for translation, cost in self.get_translations_and_costs_single(node, transitions, weights):
+                if cost >= results.get(translation, (float("inf"), -1))[0]: continue
+                results[translation] = (cost, transitions)
+        return results
+
+    def transition_has_key(self, transition: Transition, key: str):
+        return self.key_ids.get(key) == transition.key_id
+
+    def build_reverse_lookup(self):
+        """See `NondeterministicTrie.build_reverse_lookup`. Outlines are found in the order of their nodes' ids rather than
+        the order the trie was built in."""
+
+        n_keys = len(self.keys)
+
+        def dfs(node: int, key_ids_reversed: tuple[int, ...], visited_nodes: set[int], translation_id: int, pause: "list[int] | None"):
+            if pause is not None:
+                pause[0] -= 1
+                if pause[0] <= 0:
+                    pause[0] = pause[1]
+                    yield None
+
+            if node == self.ROOT:
+                yield tuple(self.keys[key_id] for key_id in reversed(key_ids_reversed))
+                return
+
+            for transition in self.reverse_transitions[self.reverse_starts[node]:self.reverse_starts[node + 1]]:
+                group_code = self.group_codes[self.transition_groups[transition]]
+                src_node, key_id = divmod(group_code, n_keys)
+                if src_node in visited_nodes: continue
+
+                if self.__label(transition, translation_id) is None: continue
+
+                yield from dfs(src_node, key_ids_reversed + (key_id,), visited_nodes | {src_node}, translation_id, pause)
+
+        def get_sequences(translation: str, pause_every: "int | None"=None):
+            translation_id = self.value_id(translation)
+            if translation_id is None: return
+
+            pause = [pause_every, pause_every] if pause_every is not None else None
+            for node in self.value_nodes[self.value_node_starts[translation_id]:self.value_node_starts[translation_id + 1]]:
+                yield from dfs(node, (), {node}, translation_id, pause)
+
+        return get_sequences
+
+    def memory_sections(self, seen: "set[int] | None"=None):
+        """Counts of each of the trie's structures and the bytes their arrays use"""
+
+        from .memory import MemorySection
+
+        def n_bytes(*sequences: Sequence):
+            return sum(_n_bytes(sequence) for sequence in sequences)
+
+        return (
+            MemorySection("nodes", self.n_nodes, n_bytes(self.translation_starts, self.reverse_starts)),
+            MemorySection("transitions", self.n_transitions, n_bytes(self.group_codes, self.group_starts, self.dst_nodes, self.transition_groups, self.reverse_transitions)),
+            MemorySection("translations", len(self.translation_value_ids), n_bytes(self.translation_value_ids, self.value_node_starts, self.value_nodes, self.value_order)),
+            MemorySection("strings", len(self.keys) + len(self.values), n_bytes(self.keys, self.values)),
+            MemorySection("cost labels", self.n_cost_labels, n_bytes(self.label_codes, self.label_option_starts, self.option_counts)),
+        )
+
+    def write(self, file: BinaryIO, source_hash: str):
+        """Writes the trie in the format `from_buffer` reads, tagged with the hash of what it was built from"""
+
+        sections: list[bytes] = []
+        for field in _ARRAY_FIELDS:
+            sections.append(_as_int_array(getattr(self, field)).tobytes())
+        for strings in (self.keys, self.values):
+            encoded = [string.encode("utf-8") for string in strings]
+            offsets = array("q", (0,))
+            for string_bytes in encoded:
+                offsets.append(offsets[-1] + len(string_bytes))
+            sections.append(offsets.tobytes())
+            sections.append(b"".join(encoded))
+
+        source_hash_bytes = source_hash.encode("ascii")
+        header_size = _HEADER.size + len(source_hash_bytes) + _SECTION.size * len(sections)
+
+        file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, len(source_hash_bytes), len(sections), self.n_nodes, self.n_categories))
+        file.write(source_hash_bytes)
+
+        offset = _aligned(header_size)
+        for section in sections:
+            file.write(_SECTION.pack(offset, len(section)))
+            offset = _aligned(offset + len(section))
+
+        position = header_size
+        for section in sections:
+            file.write(bytes(_aligned(position) - position))
+            file.write(section)
+            position = _aligned(position) + len(section)
+
+    @staticmethod
+    def from_buffer(buffer) -> "tuple[CompiledTrie, str]":
+        """Reads a trie written by `write` along with its source hash, without copying its arrays or strings out of
+        `buffer`. Raises `ValueError` if the buffer does not hold a trie in the current format."""
+
+        view = memoryview(buffer)
+        if len(view) < _HEADER.size:
+            raise ValueError("not a compiled trie")
+
+        magic, version, source_hash_size, n_sections, n_nodes, n_categories = _HEADER.unpack_from(view)
+        if magic != _MAGIC or version != _FORMAT_VERSION or n_sections != len(_ARRAY_FIELDS) + 4:
+            raise ValueError("not a compiled trie in the current format")
+
+        source_hash = bytes(view[_HEADER.size:_HEADER.size + source_hash_size]).decode("ascii")
+
+        sections: list[memoryview] = []
+        for i in range(n_sections):
+            offset, size = _SECTION.unpack_from(view, _HEADER.size + source_hash_size + i * _SECTION.size)
+            if offset + size > len(view):
+                raise ValueError("compiled trie is truncated")
+            # Every section but the bytes of the keys and of the values holds 8-byte ints
+            if size % 8 != 0 and i not in (n_sections - 3, n_sections - 1):
+                raise ValueError(f"section {i} of the compiled trie is not a whole number of ints")
+            sections.append(view[offset:offset + size])
+
+        arrays = {field: section.cast("q") for field, section in zip(_ARRAY_FIELDS, sections)}
+        keys = _StringTable(sections[-4].cast("q"), sections[-3])
+        values = _StringTable(sections[-2].cast("q"), sections[-1])
+
+        return CompiledTrie(n_nodes=n_nodes, n_categories=n_categories, keys=keys, values=values, **arrays), source_hash
+
+    def __group(self, src_node: int, key_id: int):
+        code = src_node * len(self.keys) + key_id
+        group = bisect_left(self.group_codes, code)
+        if group == len(self.group_codes) or self.group_codes[group] != code:
+            return None
+        return group
+
+    def __label(self, transition: int, value_id: int):
+        code = transition * len(self.values) + value_id
+        label = bisect_left(self.label_codes, code)
+        if label == len(self.label_codes) or self.label_codes[label] != code:
+            return None
+        return label
+
+    def __label_costs(self, label: int):
+        n_categories = self.n_categories
+        return tuple(
+            TransitionCategoryCounts(tuple(self.option_counts[option * n_categories:(option + 1) * n_categories]))
+            for option in range(self.label_option_starts[label], self.label_option_starts[label + 1])
+        )
+
+    def value_id(self, value: str):
+        index = bisect_left(self.value_order, value, key=self.values.__getitem__)
+        if index == len(self.value_order) or self.values[self.value_order[index]] != value:
+            return None
+        return self.value_order[index]
+
+
+class _StringTable(Sequence[str]):
+    """Strings stored back to back as UTF-8, decoded only when read"""
+
+    def __init__(self, offsets: Sequence[int], data: memoryview):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+
+def compile_trie(
+    nodes: list[dict[int, list[int]]],
+    translations: dict[int, list[int]],
+    keys: dict[str, int],
+    values: list[str],
+    transition_costs: dict[TransitionCostKey, tuple[TransitionCategoryCounts, ...]],
+):
+    """Flattens the structures of a `NondeterministicTrie`; see `NondeterministicTrie.compiled`"""
+
+    n_nodes = len(nodes)
+    n_keys = len(keys)
+    n_values = len(values)
+
+    group_codes = array("q")
+    group_starts = array("q", (0,))
+    dst_nodes = array("q")
+    transition_groups = array("q")
+    group_indices: dict[tuple[int, int], int] = {}
+    for src_node, transitions in enumerate(nodes):
+        for key_id in sorted(transitions):
+            group = group_indices[src_node, key_id] = len(group_codes)
+            group_codes.append(src_node * n_keys + key_id)
+            dst_nodes.extend(transitions[key_id])
+            transition_groups.extend((group,) * len(transitions[key_id]))
+            group_starts.append(len(dst_nodes))
+
+    reverse_starts, reverse_transitions = _csr(n_nodes, ((dst_node, transition) for transition, dst_node in enumerate(dst_nodes)))
+
+    translation_starts = array("q", (0,))
+    translation_value_ids = array("q")
+    for node in range(n_nodes):
+        translation_value_ids.extend(translations.get(node, ()))
+        translation_starts.append(len(translation_value_ids))
+
+    value_node_starts, value_nodes = _csr(n_values, (
+        (value_id, node)
+        for node in range(n_nodes)
+        for value_id in translations.get(node, ())
+    ))
+
+    n_categories = max((len(cost.counts) for costs in transition_costs.values() for cost in costs), default=0)
+    labels = sorted(
+        (
+            (group_starts[group_indices[transition.node_index, transition.key_id]] + transition.transition_index) * n_values + value_id,
+            costs,
+        )
+        for (transition, value_id), costs in transition_costs.items()
+    )
+
+    label_codes = array("q")
+    label_option_starts = array("q", (0,))
+    option_counts = array("q")
+    n_options = 0
+    for code, costs in labels:
+        label_codes.append(code)
+        for cost in costs:
+            option_counts.extend(cost.counts)
+            option_counts.extend((0,) * (n_categories - len(cost.counts)))
+        n_options += len(costs)
+        label_option_starts.append(n_options)
+
+    key_list = [""] * n_keys
+    for key, key_id in keys.items():
+        key_list[key_id] = key
+
+    return CompiledTrie(
+        n_nodes=n_nodes,
+        n_categories=n_categories,
+        keys=tuple(key_list),
+        values=tuple(values),
+        group_codes=group_codes,
+        group_starts=group_starts,
+        dst_nodes=dst_nodes,
+        transition_groups=transition_groups,
+        reverse_starts=reverse_starts,
+        reverse_transitions=reverse_transitions,
+        translation_starts=translation_starts,
+        translation_value_ids=translation_value_ids,
+        value_node_starts=value_node_starts,
+        value_nodes=value_nodes,
+        value_order=array("q", sorted(range(n_values), key=values.__getitem__)),
+        label_codes=label_codes,
+        label_option_starts=label_option_starts,
+        option_counts=option_counts,
+    )
+
+
+def _csr(n_rows: int, pairs: Iterable[tuple[int, int]]):
+    """Groups `(row, item)` pairs by row, keeping their order within each row"""
+
+    rows: list[list[int]] = [[] for _ in range(n_rows)]
+    for row, item in pairs:
+        rows[row].append(item)
+
+    starts = array("q", (0,))
+    items = array("q")
+    for row_items in rows:
+        items.extend(row_items)
+        starts.append(len(items))
+    return starts, items
+
+def _as_int_array(sequence: Sequence[int]):
+    return sequence if isinstance(sequence, array) else array("q", sequence)
+
+def _n_bytes(sequence: Sequence):
+    if isinstance(sequence, (array, memoryview)):
+        return sequence.itemsize * len(sequence)
+    if isinstance(sequence, _StringTable):
+        return _n_bytes(sequence.offsets) + len(sequence.data)
+    return sum(len(string.encode("utf-8")) for string in sequence)
+
+def _aligned(offset: int):
+    return (offset + 7) // 8 * 8
+
+
+_MAGIC = b"HATCHTRI"
+_FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<8sIIIQQ")
+"""Magic bytes, format version, source hash size, number of sections, number of nodes, and number of categories"""
+_SECTION = struct.Struct("<QQ")
+"""Offset and size of a section"""
+
+_ARRAY_FIELDS = tuple(
+    field.name
+    for field in fields(CompiledTrie)
+    if field.name not in ("n_nodes", "n_categories", "keys", "values")
+)
+"""Fields written as sections of integers, followed by the offsets and bytes of the keys and then of the values"""
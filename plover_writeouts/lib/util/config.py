@@ -2,3 +2,47 @@ TRIE_STROKE_BOUNDARY_KEY = ""
 TRIE_LINKER_KEY = "-"
 
 OPTIMIZE_TRIE_SPACE = False
+
+PROFILE_BUILD = False
+"""Whether to time each theory rule and measure how much it grows the lookup trie while building, logging a report afterward"""
+
+PROFILE_RUNTIME = False
+"""Whether to profile dictionary loads and a sample of lookups with `cProfile`, writing the results to Plover's log
+directory. Setting the `HATCHERY_PROFILE` environment variable does the same."""
+PROFILE_LOOKUP_SAMPLE_RATE = 0.01
+"""Fraction of lookups profiled while runtime profiling is enabled. The `HATCHERY_PROFILE_LOOKUP_RATE` environment variable
+overrides this."""
+PROFILE_LOOKUP_SAMPLES_PER_FILE = 1000
+"""Number of sampled lookups collected into each profile written out"""
+
+ENTRY_MAX_COST: "float | None" = None
+"""If set, paths for an entry whose accumulated transition cost would exceed this are not added to the lookup trie"""
+ENTRY_MAX_ABBREVIATION_STEPS: "int | None" = None
+"""If set, paths for an entry that take more than this many elisions, clusters, or alternate chords are not added to the lookup trie"""
+
+LOOKUP_ENGINE: "str | None" = None
+"""If set, the name of the engine in `LOOKUP_ENGINES` that dictionaries are built with, instead of the one `LAZY_SHARDS`
+chooses"""
+SHARED_TRIES = False
+"""Whether Hatchery dictionaries are built into single tries kept in memory-mapped files in Plover's config folder, which
+other local processes using the same dictionary attach to instead of building their own, and which later loads of an
+unchanged dictionary reuse. Takes precedence over `LAZY_SHARDS`."""
+LAZY_SHARDS = True
+"""Whether dictionary entries are split into shards by how they start, each built the first time a lookup could reach it"""
+WARM_UP_SHARDS = True
+"""Whether shards not yet reached by a lookup are built on a worker thread after loading"""
+MAX_SHARD_SIZE = 200
+"""The most phoneme groups a shard is split off with, which bounds how long the first lookup that reaches it takes to
+build it"""
+
+TRACE_LOAD_MEMORY = False
+"""Whether to trace allocations with `tracemalloc` while Hatchery dictionaries load, for `HatcheryDictionary.memory_report`.
+Tracing slows loading down several times over."""
+
+COMPILED_THEORY_CACHE = True
+"""Whether the theory's compiled tables are read from a file in Plover's config folder written by an earlier load, rather
+than built again"""
+
+LOAD_IN_BACKGROUND = True
+"""Whether Hatchery dictionaries are built on a worker thread. Until the first build finishes, lookups find nothing; on
+reload, the previous lookups keep serving until the new build finishes."""
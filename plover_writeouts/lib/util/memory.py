@@ -0,0 +1,133 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import sys
+import tracemalloc
+from types import FunctionType, MethodType, ModuleType
+from typing import Any, Iterable
+
+
+_UNWALKED_TYPES = (str, bytes, int, float, bool, type(None))
+_UNCOUNTED_TYPES = (type, ModuleType, FunctionType, MethodType)
+
+
+def deep_sizeof(root: Any, seen: "set[int] | None"=None):
+    """Estimates the bytes used by `root` and everything it contains, per `sys.getsizeof`. Objects whose ids are in
+    `seen` are not counted, and the ids of counted objects are added to it, so objects shared between several structures
+    measured with the same set are only counted once.
+    """
+
+    if seen is None:
+        seen = set()
+
+    n_bytes = 0
+    stack = [root]
+    while len(stack) > 0:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, _UNCOUNTED_TYPES): continue
+        seen.add(id(obj))
+
+        n_bytes += sys.getsizeof(obj)
+        if isinstance(obj, _UNWALKED_TYPES): continue
+
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        else:
+            if hasattr(obj, "__dict__"):
+                stack.append(obj.__dict__)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    stack.append(getattr(obj, slot))
+
+    return n_bytes
+
+
+@dataclass
+class MemorySection:
+    name: str
+    count: int
+    """How many items of this kind there are, e.g., nodes"""
+    n_bytes: int
+
+
+@dataclass
+class MemoryReport:
+    title: str
+    sections: list[MemorySection] = field(default_factory=list)
+    notes: list[str] = field(default_factory=list)
+
+    def add(self, name: str, count: int, n_bytes: int):
+        self.sections.append(MemorySection(name, count, n_bytes))
+
+    def add_all(self, sections: Iterable[MemorySection], prefix: str=""):
+        for section in sections:
+            self.add(f"{prefix}{section.name}", section.count, section.n_bytes)
+
+    @property
+    def n_bytes(self):
+        return sum(section.n_bytes for section in self.sections)
+
+    def __str__(self):
+        name_width = max((len(section.name) for section in self.sections), default=0)
+
+        lines = [self.title]
+        for section in self.sections:
+            lines.append(f"\t{section.name:<{name_width}}  {section.count:>12,}  {section.n_bytes:>14,} B")
+        lines.append(f"\t{'total':<{name_width}}  {'':>12}  {self.n_bytes:>14,} B")
+        lines.extend(f"\t{note}" for note in self.notes)
+
+        return "\n".join(lines)
+
+
+@dataclass
+class TracedMemory:
+    """Memory allocated while a block ran, according to `tracemalloc`. Allocations from other threads during the block
+    are included."""
+
+    retained_bytes: int = 0
+    """Bytes allocated in the block that were still allocated after it"""
+    peak_bytes: int = 0
+    """Most bytes allocated at once during the block, above what was allocated before it"""
+    top_sites: list[tuple[str, int]] = field(default_factory=list)
+    """The source lines responsible for the most retained bytes"""
+
+    def __str__(self):
+        lines = [f"traced {self.retained_bytes:,} B retained, {self.peak_bytes:,} B peak"]
+        lines.extend(f"\t{n_bytes:>14,} B  {site}" for site, n_bytes in self.top_sites)
+        return "\n".join(lines)
+
+
+@contextmanager
+def traced_memory(n_top_sites: int=10):
+    """Measures the memory allocated in the block with `tracemalloc`, starting and stopping it if it is not already
+    tracing. The result is filled in once the block exits.
+    """
+
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    result = TracedMemory()
+
+    try:
+        tracemalloc.reset_peak()
+        before_snapshot = tracemalloc.take_snapshot()
+        before_size, _ = tracemalloc.get_traced_memory()
+
+        yield result
+
+        after_size, peak_size = tracemalloc.get_traced_memory()
+        after_snapshot = tracemalloc.take_snapshot()
+
+        result.retained_bytes = after_size - before_size
+        result.peak_bytes = peak_size - before_size
+        filters = (tracemalloc.Filter(False, tracemalloc.__file__),)
+        result.top_sites = [
+            (str(stat.traceback), stat.size_diff)
+            for stat in after_snapshot.filter_traces(filters).compare_to(before_snapshot.filter_traces(filters), "lineno")[:n_top_sites]
+        ]
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
@@ -0,0 +1,187 @@
+"""`cProfile` hooks around dictionary loads and a sampled fraction of lookups, for diagnosing slow dictionaries without
+changing code. They are enabled by `PROFILE_RUNTIME` or by setting the `HATCHERY_PROFILE` environment variable, and write
+`.pstats` files along with a text summary of each to a folder in Plover's log directory.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from threading import Lock, Thread
+from typing import Callable, Optional, TypeVar
+import atexit
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+
+import plover.log
+
+from .config import PROFILE_RUNTIME, PROFILE_LOOKUP_SAMPLE_RATE, PROFILE_LOOKUP_SAMPLES_PER_FILE
+
+_T = TypeVar("_T")
+
+PROFILE_ENV_VAR = "HATCHERY_PROFILE"
+"""Enables profiling if set to anything other than an empty string or `0`"""
+LOOKUP_SAMPLE_RATE_ENV_VAR = "HATCHERY_PROFILE_LOOKUP_RATE"
+"""Overrides `PROFILE_LOOKUP_SAMPLE_RATE`"""
+
+_N_SUMMARY_ROWS = 40
+
+
+def is_profiling_enabled():
+    return PROFILE_RUNTIME or os.environ.get(PROFILE_ENV_VAR, "") not in ("", "0")
+
+def lookup_sample_rate():
+    rate = os.environ.get(LOOKUP_SAMPLE_RATE_ENV_VAR)
+    if rate is None:
+        return PROFILE_LOOKUP_SAMPLE_RATE
+
+    try:
+        return float(rate)
+    except ValueError:
+        plover.log.warning(f"ignoring {LOOKUP_SAMPLE_RATE_ENV_VAR}={rate!r}, which is not a number")
+        return PROFILE_LOOKUP_SAMPLE_RATE
+
+def profile_dir():
+    return Path(plover.log.LOG_FILENAME).parent / "hatchery-profiles"
+
+
+@contextmanager
+def profiled(name: str):
+    """Profiles the block on the current thread if profiling is enabled"""
+
+    if not is_profiling_enabled():
+        yield
+        return
+
+    profile = _start_profile(name)
+    try:
+        yield
+    finally:
+        if profile is not None:
+            profile.disable()
+            write_profile(profile, name)
+
+
+class SampledLookupProfiler:
+    """Profiles a random fraction of lookups into one profile, which is written out on a worker thread after every
+    `PROFILE_LOOKUP_SAMPLES_PER_FILE` sampled lookups, and on the calling thread when flushed or when Plover exits
+    """
+
+    def __init__(self, name: str, sample_rate: float):
+        self.name = name
+        self.sample_rate = sample_rate
+
+        self.__profile = cProfile.Profile()
+        self.__n_samples = 0
+        self.__lock = Lock()
+        """Held while profiling a lookup or swapping out the profile, since only one lookup can be profiled at a time"""
+        self.__writers: list[Thread] = []
+        """Threads writing out full profiles"""
+
+        atexit.register(self.flush)
+
+    def lookup(self, lookup: Callable[[tuple[str, ...]], _T], stroke_stenos: tuple[str, ...]) -> _T:
+        if random.random() >= self.sample_rate or not self.__lock.acquire(blocking=False):
+            return lookup(stroke_stenos)
+
+        try:
+            try:
+                self.__profile.enable()
+            except ValueError:
+                # Another profiler is already active
+                return lookup(stroke_stenos)
+
+            try:
+                return lookup(stroke_stenos)
+            finally:
+                self.__profile.disable()
+                self.__n_samples += 1
+
+                if self.__n_samples >= PROFILE_LOOKUP_SAMPLES_PER_FILE:
+                    # Writing takes far longer than a lookup, so it is kept off the lookup's thread
+                    writer = Thread(target=write_profile, args=self.__take_samples(), name="hatchery-profile-writer", daemon=True)
+                    self.__writers = [thread for thread in self.__writers if thread.is_alive()]
+                    self.__writers.append(writer)
+                    writer.start()
+        finally:
+            self.__lock.release()
+
+    def flush(self):
+        """Writes out the lookups sampled since the last flush, if any, and waits for profiles still being written"""
+
+        with self.__lock:
+            samples = self.__take_samples() if self.__n_samples > 0 else None
+            writers = self.__writers
+            self.__writers = []
+
+        if samples is not None:
+            write_profile(*samples)
+        for writer in writers:
+            writer.join()
+
+    def __take_samples(self):
+        samples = self.__profile, f"{self.name} {self.__n_samples} lookups"
+        self.__profile = cProfile.Profile()
+        self.__n_samples = 0
+        return samples
+
+
+def create_lookup_profiler(name: str) -> Optional[SampledLookupProfiler]:
+    """The lookup profiler for `name`, shared by every reload of the same dictionary so that reloading does not create a
+    new profiler each time"""
+
+    if not is_profiling_enabled():
+        return None
+
+    sample_rate = lookup_sample_rate()
+    if sample_rate <= 0:
+        return None
+
+    with _lookup_profilers_lock:
+        profiler = _lookup_profilers.get(name)
+        if profiler is None:
+            profiler = _lookup_profilers[name] = SampledLookupProfiler(name, sample_rate)
+        profiler.sample_rate = sample_rate
+        return profiler
+
+_lookup_profilers: dict[str, SampledLookupProfiler] = {}
+_lookup_profilers_lock = Lock()
+
+
+def write_profile(profile: cProfile.Profile, name: str):
+    """Writes the profile's stats and a summary of its most expensive calls to the profile directory"""
+
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+
+    base_name = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}-{_SAFE_NAME_PATTERN.sub('_', name)}"
+    stats_path = directory / f"{base_name}.pstats"
+    summary_path = directory / f"{base_name}.txt"
+
+    profile.dump_stats(stats_path)
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    summary.write(f"{name}: {stats.total_calls:,} calls in {stats.total_tt:.3f} s\n")
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(_N_SUMMARY_ROWS)
+    stats.sort_stats(pstats.SortKey.TIME).print_stats(_N_SUMMARY_ROWS)
+    with open(summary_path, "w", encoding="utf-8") as file:
+        file.write(summary.getvalue())
+
+    plover.log.info(f"profiled {name} ({stats.total_tt:.3f} s); wrote {stats_path} and {summary_path.name}")
+    return stats_path
+
+
+def _start_profile(name: str):
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        plover.log.warning(f"not profiling {name}, since another profiler is already active")
+        return None
+    return profile
+
+_SAFE_NAME_PATTERN = re.compile(r"[^\w.-]+")
@@ -0,0 +1,79 @@
+def test__BackgroundLookupLoader__swaps_after_newest_build():
+    import threading
+
+    from plover_writeouts.lib.lookup.background import BackgroundLookupLoader
+    from plover_writeouts.lib.lookup.build_trie.add_entry import BuildCancelledError
+
+    loader = BackgroundLookupLoader("test")
+    assert not loader.is_ready
+
+    first_cancel_events: list[threading.Event] = []
+    def first_build(cancel_event: threading.Event):
+        first_cancel_events.append(cancel_event)
+        return lambda outline: "first", lambda translation: []
+
+    loader.load(first_build)
+    assert loader.lookups is not None and loader.lookups[0](("KAT",)) == "first"
+    assert not loader.is_loading
+
+    slow_build_started = threading.Event()
+    slow_build_cancelled = threading.Event()
+
+    def slow_build(cancel_event: threading.Event):
+        slow_build_started.set()
+        cancel_event.wait()
+        slow_build_cancelled.set()
+        raise BuildCancelledError
+
+    loader.start(slow_build)
+    slow_build_started.wait()
+    assert loader.is_loading
+    # Background work left by a completed build, e.g. warming up shards, stops once a newer build starts
+    assert first_cancel_events[0].is_set()
+    assert loader.lookups[0](("KAT",)) == "first"
+
+    loader.start(lambda cancel_event: (lambda outline: "second", lambda translation: []))
+    assert loader.wait()
+    assert slow_build_cancelled.wait(5)
+    assert loader.lookups[0](("KAT",)) == "second"
+    assert not loader.is_loading
+
+def test__HatcheryDictionary__reload_keeps_serving(tmp_path, monkeypatch):
+    import sys
+    import threading
+    import types
+
+    from plover_writeouts.HatcheryDictionary import HatcheryDictionary
+    from plover_writeouts.lib import lookup
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.util import config
+
+    # The dictionary builds with amphitheory, whose keys are not in the test system
+    theory_module = types.ModuleType("plover_writeouts.lib.theory.theory")
+    theory_module.amphitheory = lapwing
+    monkeypatch.setitem(sys.modules, "plover_writeouts.lib.theory.theory", theory_module)
+    monkeypatch.setattr(config, "COMPILED_THEORY_CACHE", False)
+    monkeypatch.setattr(HatcheryDictionary, "_loaders", {})
+    monkeypatch.setattr(HatcheryDictionary, "_build_caches", {})
+
+    path = tmp_path / "dictionary.hatchery"
+    path.write_text("c.k[K][[K]] a.a!1[A][[A]] t.t[T][[-T]]\n", encoding="utf-8")
+
+    first = HatcheryDictionary.load(str(path))
+    assert first.wait_until_ready(10)
+    assert first.get(("KAT",)) == "cat"
+
+    build_lookup_hatchery = lookup.build_lookup_hatchery
+    release_build = threading.Event()
+    def slow_build_lookup_hatchery(*args, **kwargs):
+        release_build.wait(10)
+        return build_lookup_hatchery(*args, **kwargs)
+    monkeypatch.setattr(lookup, "build_lookup_hatchery", slow_build_lookup_hatchery)
+
+    second = HatcheryDictionary.load(str(path))
+    assert second.get(("KAT",)) == "cat"
+    assert second.reverse_lookup("cat") == [("KAT",)]
+
+    release_build.set()
+    assert second.wait_until_ready(10)
+    assert second.get(("KAT",)) == "cat"
@@ -0,0 +1,97 @@
+def test__BatchLookupEngine__matches_trie():
+    import random
+
+    import pytest
+    pytest.importorskip("numpy")
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.batch import BatchLookupEngine
+    from plover_writeouts.lib.lookup.differential import compare_engines, sample_outlines
+
+    mappings = {
+        "KAT": "cat",
+        "KA/TA/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "SAPBD/WEUFP": "sandwich",
+        "AEUPBLG": "age",
+        "EBG/SPEBGT": "expect",
+    }
+    entries = [
+        (phonemes, translation)
+        for outline_steno, translation in mappings.items()
+        if (phonemes := get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing)) is not None
+    ]
+
+    reference = TrieLookupEngine.build(entries, lapwing)
+    candidate = BatchLookupEngine.build(entries, lapwing)
+
+    outlines = sample_outlines(reference, mappings.values(), lapwing, random.Random(0), 300)
+    outlines.extend(((), ("KAT", ""), (lapwing.mask_to_steno(lapwing.cycler_mask), "KAT")))
+    comparison = compare_engines(reference, candidate, outlines)
+
+    assert comparison.mismatches == []
+    assert candidate.lookup_batch([("KAT",), ("TKE", "STROEU"), ("STKPWHR",)]) == ["cat", "destroy", None]
+    assert candidate.lookup_batch([]) == []
+    assert candidate.lookup_batch(outline for outline in [("KAT",), ("TKE", "STROEU")]) == ["cat", "destroy"]
+
+def test__BatchLookupEngine__clears_stroke_table_at_limit(monkeypatch):
+    import pytest
+    pytest.importorskip("numpy")
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.batch import BatchLookupEngine
+    from plover_writeouts.lib.lookup import sparse_traversal
+
+    monkeypatch.setattr(sparse_traversal, "_MAX_COMPILED_STROKES", 3)
+
+    entries = [(get_outline_phonemes((Stroke.from_steno("TKE"), Stroke.from_steno("STROEU")), lapwing), "destroy")]
+    engine = BatchLookupEngine.build(entries, lapwing)
+
+    assert engine.lookup_batch([("TKE", "STROEU"), ("KAT",)]) == ["destroy", None]
+    # Past the limit, the table starts over with only this batch's strokes
+    assert engine.lookup_batch([("TKE", "STROEU"), ("HROG",)]) == ["destroy", None]
+    assert engine.lookup_batch([("TKE", "STROEU")]) == ["destroy"]
+
+def test__SparseBatchTraversal__ranked_translations__matches_trie():
+    import random
+
+    import pytest
+    pytest.importorskip("numpy")
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.sparse_traversal import SparseBatchTraversal
+    from plover_writeouts.lib.lookup.differential import sample_outlines
+
+    # TPHAT and TP/HAT both reach TPHAT at the same cost
+    mappings = {
+        "TPHAT": "nat",
+        "TP/HAT": "fhat",
+        "KAT": "cat",
+        "KA/TA/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+    }
+    entries = [
+        (get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation)
+        for outline_steno, translation in mappings.items()
+    ]
+
+    reference = TrieLookupEngine.build(entries, lapwing)
+    traversal = SparseBatchTraversal(reference.trie.compiled(), lapwing)
+
+    outlines = sample_outlines(reference, mappings.values(), lapwing, random.Random(0), 100)
+    outlines.extend((("TPHAT",), ("STKPWHR",), ()))
+    assert traversal.ranked_translations(outlines) == [reference.ranked_translations(outline) for outline in outlines]
+    assert traversal.ranked_translations([("TPHAT",)]) == [["nat", "fhat"]]
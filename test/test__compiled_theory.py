@@ -0,0 +1,99 @@
+def test__compiled_theory__round_trip():
+    import io
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.theory.artifact import write_compiled_theory, read_compiled_theory_hash, load_compiled_theory
+    from plover_writeouts.lib.stenophoneme.Stenophoneme import STENOPHONEME_CODES
+
+    expected_tables = lapwing.compiled_tables()
+
+    file = io.BytesIO()
+    write_compiled_theory(lapwing, file)
+
+    file.seek(0)
+    assert read_compiled_theory_hash(file) == lapwing.content_hash
+
+    file.seek(0)
+    theory = load_compiled_theory(lapwing.spec, file)
+    assert theory is lapwing
+    assert theory.left_chords == expected_tables["left_chords"]
+    assert theory.chords_to_phonemes_vowels == expected_tables["chords_to_phonemes_vowels"]
+    assert theory.split_consonant_phonemes(lapwing.spec.ALL_KEYS) == theory.split_left_bank_mask(lapwing.left_bank_mask) + theory.split_right_bank_mask(lapwing.right_bank_mask | lapwing.asterisk_mask)
+    for phonemes, stroke in lapwing.spec.CLUSTERS.items():
+        node = theory.clusters_trie.get_dst_node_chain(theory.clusters_trie.ROOT, tuple(STENOPHONEME_CODES[phoneme] for phoneme in phonemes))
+        assert node is not None and theory.clusters_trie.get_translation(node) == stroke
+
+def test__compiled_theory__rejects_other_spec():
+    import io
+
+    import pytest
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.theory.artifact import load_compiled_theory
+
+    file = io.BytesIO(b"HATCHERY-THEORY\0" + b"0" * 64)
+    with pytest.raises(ValueError):
+        load_compiled_theory(lapwing.spec, file)
+
+def test__compiled_theory__rejects_tables_out_of_range():
+    import io
+    import json
+
+    import pytest
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.theory.artifact import write_compiled_theory, load_compiled_theory
+
+    file = io.BytesIO()
+    write_compiled_theory(lapwing, file)
+    header_length = len(b"HATCHERY-THEORY\0") + 64
+    header, encoded = file.getvalue()[:header_length], json.loads(file.getvalue()[header_length:])
+
+    def load_with(change):
+        changed = json.loads(json.dumps(encoded))
+        change(changed)
+        return load_compiled_theory(lapwing.spec, io.BytesIO(header + json.dumps(changed).encode("utf-8")))
+
+    def set_eligibility_pair(changed, pair):
+        table = next(table for table in changed["left_alt_chord_eligibility"] if table is not None)
+        table[0][0] = pair
+
+    with pytest.raises(ValueError):
+        load_with(lambda changed: set_eligibility_pair(changed, -1))
+    with pytest.raises(ValueError):
+        load_with(lambda changed: set_eligibility_pair(changed, 4))
+    with pytest.raises(ValueError):
+        load_with(lambda changed: changed["left_chords"].pop())
+    with pytest.raises(ValueError):
+        load_with(lambda changed: changed["consonant_split_tables"][0].pop())
+    with pytest.raises(ValueError):
+        load_with(lambda changed: changed["diphthong_transitions"].__setitem__(0, len(changed["left_chords"])))
+
+    assert load_with(lambda changed: None) is lapwing
+
+def test__load_or_compile_theory__reuses_artifact(tmp_path):
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.theory.artifact import load_or_compile_theory
+
+    expected_left_chords = lapwing.compiled_tables()["left_chords"]
+
+    def forget_tables():
+        for table_name in lapwing.COMPILED_TABLE_NAMES:
+            del lapwing.__dict__[table_name]
+        assert not lapwing.is_compiled
+
+    forget_tables()
+    assert load_or_compile_theory(lapwing, tmp_path) is lapwing
+    assert lapwing.is_compiled
+    (artifact_path,) = tmp_path.iterdir()
+
+    forget_tables()
+    load_or_compile_theory(lapwing, tmp_path)
+    assert lapwing.left_chords == expected_left_chords
+
+    # A damaged artifact is compiled again and replaced
+    artifact_path.write_bytes(artifact_path.read_bytes()[:-10])
+    forget_tables()
+    load_or_compile_theory(lapwing, tmp_path)
+    assert lapwing.left_chords == expected_left_chords
+    assert artifact_path.stat().st_size > 0
@@ -0,0 +1,37 @@
+def test__add_entries__budget_caps_abbreviations():
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.util.Trie import NondeterministicTrie
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.build_trie.add_entry import add_entries
+    from plover_writeouts.lib.lookup.build_trie.budget import ExpansionBudget
+    from plover_writeouts.lib.lookup.build_lookup import create_lookup_for
+
+    mappings = {
+        "KAT": "cat",
+        "TKE/STROEU": "destroy",
+        "KA/TA/HROG": "catalog",
+    }
+    entries = [
+        (get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation)
+        for outline_steno, translation in mappings.items()
+    ]
+
+    trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+    stats = add_entries(trie, entries, lapwing)
+    assert stats.n_budget_capped == 0
+
+    capped_trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+    capped_stats = add_entries(capped_trie, entries, lapwing, budget=ExpansionBudget(max_abbreviation_steps=0))
+    # "cat" has no abbreviations to cap
+    assert capped_stats.n_budget_capped == 2
+    assert capped_trie.n_transitions < trie.n_transitions
+
+    lookup = create_lookup_for(trie, lapwing)
+    capped_lookup = create_lookup_for(capped_trie, lapwing)
+    assert capped_lookup(("KAT",)) == "cat"
+    assert capped_lookup(("KA", "TA", "HROG")) == lookup(("KA", "TA", "HROG")) == "catalog"
+    # Elides the vowel of the second syllable
+    assert lookup(("KA", "THROG")) == "catalog"
+    assert capped_lookup(("KA", "THROG")) is None
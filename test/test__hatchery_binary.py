@@ -0,0 +1,53 @@
+def test__hatchery_binary__round_trip(tmp_path):
+    from plover_writeouts.lib.sopheme.Sopheme import Sopheme
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.sopheme.binary import write_hatchery_binary, HatcheryBinaryReader, is_hatchery_binary
+
+    entries = [
+        parse_sopheme_seq(r"z.z[Z][[STKPW]] y.ae!1[II][[AOEU]] g.g[G][[-G]] o.ou[OO][[OE]] t.t[T][[-T]] e."),
+        parse_sopheme_seq(r"(x.(k s) t.)[K][[KP]] a.a!2? .m\![[-PL]] [[KWR]]"),
+        (),
+        parse_sopheme_seq(r"z.z[Z][[STKPW]] o.ou[OO][[OE]]"),
+    ]
+
+    path = tmp_path / "test.hatchery"
+    with open(path, "wb") as file:
+        write_hatchery_binary(entries, file)
+
+    with open(path, "rb") as file:
+        assert is_hatchery_binary(file)
+
+    with HatcheryBinaryReader(str(path)) as reader:
+        assert len(reader) == len(entries)
+        for entry, expected_entry in zip(reader, entries):
+            assert entry == tuple(Sopheme.parse_sopheme_dict(sopheme.to_dict()) for sopheme in expected_entry)
+
+        assert reader[3][0] is reader[0][0]
+
+def test__hatchery_binary__rejects_values_that_do_not_fit():
+    import io
+
+    import pytest
+
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.sopheme.binary import write_hatchery_binary
+
+    with pytest.raises(ValueError, match="stress"):
+        write_hatchery_binary([parse_sopheme_seq(r"a.a!300[A][[A]]")], io.BytesIO())
+
+def test__hatchery_binary__rejects_truncated_file(tmp_path):
+    import pytest
+
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.sopheme.binary import write_hatchery_binary, HatcheryBinaryReader
+
+    path = tmp_path / "test.hatchery"
+    with open(path, "wb") as file:
+        write_hatchery_binary([parse_sopheme_seq(r"z.z[Z][[STKPW]] o.ou[OO][[OE]]")], file)
+    contents = path.read_bytes()
+
+    # Cut off within the last section, within the section headers, and within the header
+    for length in (len(contents) - 1, 40, 10):
+        path.write_bytes(contents[:length])
+        with pytest.raises(ValueError, match="truncated"):
+            HatcheryBinaryReader(str(path))
@@ -0,0 +1,71 @@
+def test__compare_engines__sharded_matches_trie():
+    import random
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+    from plover_writeouts.lib.lookup.differential import compare_engines, sample_outlines
+
+    mappings = {
+        "KAT": "cat",
+        "KAT/A/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "SAPBD/WEUFP": "sandwich",
+        "AEUPBLG": "age",
+        "EBG/SPEBGT": "expect",
+    }
+    entries = [
+        (phonemes, translation)
+        for outline_steno, translation in mappings.items()
+        if (phonemes := get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing)) is not None
+    ]
+
+    reference = TrieLookupEngine.build(entries, lapwing)
+    candidate = ShardedLookup.build(entries, lapwing, max_shard_size=1)
+
+    outlines = sample_outlines(reference, mappings.values(), lapwing, random.Random(0), 200)
+    comparison = compare_engines(reference, candidate, outlines, mappings.values())
+
+    assert comparison.n_outlines > len(mappings)
+    assert comparison.mismatches == []
+    assert reference.ranked_translations(("KAT",))[0] == "cat"
+
+def test__ranked_translations__ties_follow_entry_order_in_every_engine(monkeypatch):
+    from importlib.util import find_spec
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup import sharded
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    # Both reach TPHAT at the same cost along the same main chords, so split them by their phonemes instead to land them
+    # in different shards
+    monkeypatch.setattr(sharded, "_main_path_keys", lambda phonemes, theory: (repr(phonemes.signature()),))
+    mappings = {
+        "TPHAT": "nat",
+        "TP/HAT": "fhat",
+    }
+    entries = [
+        (get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation)
+        for outline_steno, translation in mappings.items()
+    ]
+    for ordered_entries in (entries, entries[::-1]):
+        expected = [translation for _, translation in ordered_entries]
+        sharded_lookup = ShardedLookup.build(ordered_entries, lapwing, max_shard_size=1)
+        assert sharded_lookup.n_shards == 2
+        for engine in (TrieLookupEngine.build(ordered_entries, lapwing), sharded_lookup):
+            assert engine.ranked_translations(("TPHAT",)) == expected
+
+        if find_spec("numpy") is not None:
+            from plover_writeouts.lib.lookup.batch import BatchLookupEngine
+
+            cycler_steno = lapwing.mask_to_steno(lapwing.cycler_mask)
+            engine = BatchLookupEngine.build(ordered_entries, lapwing)
+            assert engine.lookup_batch([("TPHAT",), ("TPHAT", cycler_steno)]) == expected
@@ -0,0 +1,63 @@
+def test__LookupService__answers_pipelined_requests(tmp_path):
+    import asyncio
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.service import LookupService, ServiceLimits
+    from plover_writeouts.lib.lookup.client import LookupClient, BlockingLookupClient, LookupServiceError
+
+    mappings = {
+        "KAT": "cat",
+        "KA/TA/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "SAPBD/WEUFP": "sandwich",
+    }
+    entries = [
+        (phonemes, translation)
+        for outline_steno, translation in mappings.items()
+        if (phonemes := get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing)) is not None
+    ]
+    engine = TrieLookupEngine.build(entries, lapwing)
+
+    outlines = [tuple(outline_steno.split("/")) for outline_steno in mappings] + [("STKPWHR",), ()]
+    socket_path = tmp_path / "lookup.sock"
+
+    async def run():
+        server = await LookupService(engine, ServiceLimits(max_in_flight=2, max_reverse_outlines=1, max_batch_outlines=10)).start(socket_path)
+
+        async with server, await LookupClient.connect(socket_path) as client:
+            translations, batch, reverse, stats = await asyncio.gather(
+                asyncio.gather(*(client.lookup(outline) for outline in outlines)),
+                client.lookup_batch(outlines),
+                client.reverse_lookup("cat"),
+                client.stats(),
+            )
+
+            assert translations == [engine.lookup(outline) for outline in outlines]
+            assert batch == translations
+            assert len(reverse.outlines) == 1
+            assert reverse.outlines[0] in engine.reverse_lookup("cat")
+            assert reverse.truncated == (len(engine.reverse_lookup("cat")) > 1)
+            assert stats["nodes"] == engine.stats()["nodes"]
+
+            try:
+                await client.lookup_batch([("KAT",)] * 11)
+                assert False
+            except LookupServiceError:
+                pass
+
+            # The connection survives a failed request
+            assert await client.lookup(("KAT",)) == "cat"
+
+            await asyncio.to_thread(check_blocking_client)
+
+    def check_blocking_client():
+        with BlockingLookupClient(socket_path, timeout=10) as client:
+            assert client.lookup(("KAT",)) == "cat"
+            assert client.lookup_batch(outlines) == [engine.lookup(outline) for outline in outlines]
+            assert client.reverse_lookup("unknown") == ([], False)
+
+    asyncio.run(run())
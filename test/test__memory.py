@@ -0,0 +1,24 @@
+def test__deep_sizeof__counts_shared_objects_once():
+    import sys
+
+    from plover_writeouts.lib.util.memory import deep_sizeof
+
+    shared = ["x" * 1000]
+    container = [shared, shared]
+
+    assert deep_sizeof(container) == sys.getsizeof(container) + sys.getsizeof(shared) + sys.getsizeof(shared[0])
+
+    seen: set[int] = set()
+    deep_sizeof(shared, seen)
+    assert deep_sizeof(container, seen) == sys.getsizeof(container)
+
+
+def test__traced_memory__measures_retained_allocations():
+    from plover_writeouts.lib.util.memory import traced_memory
+
+    with traced_memory() as load_memory:
+        retained = [bytearray(1_000_000)]
+
+    assert load_memory.retained_bytes >= 1_000_000
+    assert load_memory.peak_bytes >= load_memory.retained_bytes
+    assert len(retained) == 1
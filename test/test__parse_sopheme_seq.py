@@ -1,40 +1,45 @@
-import json
-
 def test__Sopheme__parse_sopheme_seq():
-    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq, format_sopheme_seq
     from plover_writeouts.lib.sopheme.Sopheme import Sopheme, Orthokeysymbol, Keysymbol
     from plover_writeouts.lib.stenophoneme.Stenophoneme import Stenophoneme
-            
-
-    # sophemes = (
-    #     Sopheme(
-    #         (
-    #             Orthokeysymbol(
-    #                 (Keysymbol("z", "z"),), "z"
-    #             ),
-    #         ),
-    #         (),
-    #         Stenophoneme.Z,
-    #     ),
-
-    #     Sopheme(
-    #         (
-    #             Orthokeysymbol(
-    #                 (Keysymbol("ou", "ou"),), "o"
-    #             ),
-    #         ),
-    #         (),
-    #         Stenophoneme.OO,
-    #     ),
-    # )
-
-    # seq = " ".join(str(sopheme) for sopheme in sophemes)
-
-    # print(parse_sopheme_seq("z.z[Z] o.ou[OO] d.d[D] i.ae!1[II] [[KWR]] a.@[A] c.k[K] [[KWR]] a.A5[A] l"))
-    
-    # assert (
-    #     parse_sopheme_seq("z.z[Z] o.ou[OO] d.d[D] i.ae!1[II] [[KWR]] a.@[A] c.k[K] [[KWR]] a.A5[A] l")
-    #     == (
-            
-    #     )
-    # )
\ No newline at end of file
+
+
+    sophemes = parse_sopheme_seq("z.z[Z] o.ou[OO] d.d[D] i.ae!1[II] [[KWR]] a.@[A] c.k[K] [[KWR]] a.A5[A] l")
+
+    assert sophemes[0] == Sopheme((Orthokeysymbol((Keysymbol("z", "z"),), "z"),), (), Stenophoneme.Z)
+    assert sophemes[3] == Sopheme((Orthokeysymbol((Keysymbol("ae", "ae", 1),), "i"),), (), Stenophoneme.II)
+    assert sophemes[4].orthokeysymbols == () and sophemes[4].phoneme is None and len(sophemes[4].steno) == 1
+    assert sophemes[8].orthokeysymbols[0].keysymbols[0].match_symbol == "a"
+    assert sophemes[9] == Sopheme((Orthokeysymbol((Keysymbol("l", "l"),), "l"),), (), Stenophoneme.L)
+    assert Sopheme.get_translation(sophemes) == "zodiacal"
+
+    seq = r"(x.(k s) t.)[K][[KP]] a.a!2? e. .m\![[-PL]] (o.@ n.n)"
+    assert format_sopheme_seq(parse_sopheme_seq(seq)) == seq
+
+def test__Sopheme__parse_sopheme_seq__interned():
+    from plover_writeouts.lib.sopheme.parse import parse_sopheme_seq
+    from plover_writeouts.lib.sopheme.Sopheme import Sopheme
+    from plover_writeouts.lib.sopheme.intern import SophemeInternPool
+
+    pool = SophemeInternPool()
+
+    seq = "c.k[K][[K]] a.a!1[A][[A]] t.t[T][[-T]]"
+    first = parse_sopheme_seq(seq, pool)
+    second = parse_sopheme_seq(seq, pool)
+    assert first == parse_sopheme_seq(seq)
+    assert all(a is b for a, b in zip(first, second))
+
+    assert Sopheme.parse_sopheme_dict(first[0].to_dict(), pool) is first[0]
+    assert pool.stats()["sophemes"] == (7, 3)
+
+def test__build_lookup_hatchery__reports_line_of_parse_error():
+    import io
+
+    import pytest
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup import build_lookup_hatchery
+
+    text = "z.z[Z][[STKPW]] o.ou[OO][[OE]]\n\nz.z[Z][[STKPW]] o.ou[OO\n"
+    with pytest.raises(ValueError, match="^line 3: "):
+        build_lookup_hatchery(io.StringIO(text), lapwing)
@@ -0,0 +1,39 @@
+def test__profiling__writes_stats_and_summaries(tmp_path, monkeypatch):
+    import plover.log
+
+    from plover_writeouts.lib.util import profiling
+
+    monkeypatch.setattr(plover.log, "LOG_FILENAME", str(tmp_path / "plover.log"))
+
+    monkeypatch.delenv(profiling.PROFILE_ENV_VAR, raising=False)
+    with profiling.profiled("load disabled"):
+        pass
+    assert profiling.create_lookup_profiler("lookups disabled") is None
+    assert not profiling.profile_dir().exists()
+
+    monkeypatch.setenv(profiling.PROFILE_ENV_VAR, "1")
+    monkeypatch.setenv(profiling.LOOKUP_SAMPLE_RATE_ENV_VAR, "1")
+
+    with profiling.profiled("load test.hatchery"):
+        sum(range(1000))
+
+    lookup_profiler = profiling.create_lookup_profiler("lookups test.hatchery")
+    assert lookup_profiler is not None
+    # Reloading the same dictionary reuses its profiler
+    assert profiling.create_lookup_profiler("lookups test.hatchery") is lookup_profiler
+    assert lookup_profiler.lookup(lambda stroke_stenos: "/".join(stroke_stenos), ("KAT", "HROG")) == "KAT/HROG"
+    lookup_profiler.flush()
+
+    file_names = sorted(path.name for path in profiling.profile_dir().iterdir())
+    assert sum(1 for name in file_names if name.endswith("load_test.hatchery.pstats")) == 1
+    assert sum(1 for name in file_names if name.endswith("lookups_test.hatchery_1_lookups.pstats")) == 1
+    assert sum(1 for name in file_names if name.endswith(".txt")) == 2
+
+    # Full profiles are written out on a worker thread, which flushing waits for
+    monkeypatch.setattr(profiling, "PROFILE_LOOKUP_SAMPLES_PER_FILE", 2)
+    busy_profiler = profiling.create_lookup_profiler("lookups busy.hatchery")
+    assert busy_profiler is not None
+    for _ in range(2):
+        busy_profiler.lookup(lambda stroke_stenos: None, ("KAT",))
+    busy_profiler.flush()
+    assert sum(1 for path in profiling.profile_dir().iterdir() if path.name.endswith("lookups_busy.hatchery_2_lookups.pstats")) == 1
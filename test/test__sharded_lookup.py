@@ -0,0 +1,162 @@
+def test__ShardedLookup__matches_eager_build():
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.util.Trie import NondeterministicTrie
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.build_trie.add_entry import add_entries, group_entries
+    from plover_writeouts.lib.lookup.build_lookup import create_lookup_for
+    from plover_writeouts.lib.lookup.build_reverse_lookup import create_reverse_lookup_for
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    mappings = {
+        "KAT": "cat",
+        "KAT/A/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "SAPBD/WEUFP": "sandwich",
+        "AEUPBLG": "age",
+        "EBG/SPEBGT": "expect",
+        "KOPL/PAOUT": "compute",
+    }
+    entries = [
+        (get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation)
+        for outline_steno, translation in mappings.items()
+    ]
+
+    trie: NondeterministicTrie[str, str] = NondeterministicTrie()
+    add_entries(trie, entries, lapwing)
+    lookup = create_lookup_for(trie, lapwing)
+    reverse_lookup = create_reverse_lookup_for(trie, lapwing)
+
+    groups = group_entries(entries)
+    sharded_lookup = ShardedLookup(groups.groups.values(), groups.translation_order, lapwing, max_shard_size=1)
+    assert sharded_lookup.n_built_shards == 0
+
+    assert sharded_lookup.lookup(("KAT",)) == lookup(("KAT",))
+    assert 0 < sharded_lookup.n_built_shards < sharded_lookup.n_shards
+
+    for translation in mappings.values():
+        for outline in reverse_lookup(translation):
+            assert sharded_lookup.lookup(outline) == lookup(outline)
+
+    sharded_lookup.build_all()
+    for translation in mappings.values():
+        assert sorted(sharded_lookup.reverse_lookup(translation)) == sorted(reverse_lookup(translation))
+
+def test__build_incrementally__matches_full_build():
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.build_trie.add_entry import group_entries
+    from plover_writeouts.lib.lookup.incremental import build_incrementally, entry_hash
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    def build(mappings: dict[str, str], previous=None):
+        decoded_outlines: list[str] = []
+
+        def decode(outline_steno: str):
+            decoded_outlines.append(outline_steno)
+            return get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), mappings[outline_steno]
+
+        state = build_incrementally(
+            ((entry_hash(f"{outline_steno} {translation}"), outline_steno) for outline_steno, translation in mappings.items()),
+            decode,
+            lapwing,
+            previous,
+            lambda entries: ShardedLookup.build(entries, lapwing),
+        )
+        return state, decoded_outlines
+
+    mappings = {
+        "KAT": "cat",
+        "KAT/A/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "SAPBD/WEUFP": "sandwich",
+    }
+    state, _ = build(mappings)
+    for translation in mappings.values():
+        state.lookups[1](translation)
+
+    edited_mappings = {
+        "KAT": "cat",
+        "KAT/A/HROG": "catalogue",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "AEUPBLG": "age",
+    }
+    edited_state, decoded_outlines = build(edited_mappings, state)
+    assert sorted(decoded_outlines) == ["AEUPBLG", "KAT/A/HROG"]
+    assert edited_state.sharded_lookup.n_built_shards < state.sharded_lookup.n_built_shards
+
+    full_state, _ = build(edited_mappings)
+    for translation in (*mappings.values(), *edited_mappings.values()):
+        outlines = sorted(full_state.lookups[1](translation))
+        assert sorted(edited_state.lookups[1](translation)) == outlines
+        for outline in outlines:
+            assert edited_state.lookups[0](outline) == full_state.lookups[0](outline)
+
+    assert state.lookups[0](("KA", "TA", "HROG")) == "catalog"
+    assert edited_state.lookups[0](("SAPBD", "WEUFP")) is None
+
+def test__ShardedLookup__with_changes__shares_key_prefixes_of_shards_built_later(monkeypatch):
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup import sharded
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    # Predict no key prefixes, so that a shard can only be reached through the prefixes found once it is built
+    monkeypatch.setattr(sharded, "_predicted_key_prefixes", lambda phonemes, theory: frozenset())
+
+    def entry(outline_steno: str, translation: str):
+        return get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation
+
+    lookup = ShardedLookup.build([entry("KAT", "cat"), entry("TKE/STROEU", "destroy")], lapwing, max_shard_size=1)
+    changed_lookup = lookup.with_changes([entry("SAPBD/WEUFP", "sandwich")], [], {"cat": 0, "destroy": 1, "sandwich": 2})
+
+    # Built through the first lookup, then shared with the second
+    assert lookup.reverse_lookup("cat") == [("KAT",)]
+    assert lookup.lookup(("KAT",)) == "cat"
+
+    assert changed_lookup.reverse_lookup("cat") == [("KAT",)]
+    assert changed_lookup.lookup(("KAT",)) == "cat"
+
+def test__ShardedLookup__splits_shards_past_max_size():
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.sharded import ShardedLookup
+
+    # Entries that all start with K-, which only longer key prefixes tell apart
+    mappings = {
+        "KAT": "cat",
+        "KAT/A/HROG": "catalog",
+        "KAPB": "can",
+        "KAP": "cap",
+        "KOT": "cot",
+        "KOPL/PAOUT": "compute",
+        "KAOEP": "keep",
+        "KAOUT": "cute",
+    }
+    entries = [
+        (get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing), translation)
+        for outline_steno, translation in mappings.items()
+    ]
+
+    reference = TrieLookupEngine.build(entries, lapwing)
+    sharded_lookup = ShardedLookup.build(entries, lapwing, max_shard_size=2)
+    assert ShardedLookup.build(entries, lapwing).n_shards == 1
+    assert sharded_lookup.stats()["largest shard"] <= 2
+
+    assert sharded_lookup.lookup(("KAT",)) == "cat"
+    assert sharded_lookup.n_built_shards < sharded_lookup.n_shards
+
+    for translation in mappings.values():
+        for outline in reference.reverse_lookup(translation):
+            assert sharded_lookup.lookup(outline) == reference.lookup(outline)
@@ -0,0 +1,88 @@
+def test__SharedTrieRegistry__attached_trie_matches_built_trie(tmp_path):
+    import random
+
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.shared import SharedTrieRegistry
+    from plover_writeouts.lib.lookup.differential import compare_engines, sample_outlines
+
+    mappings = {
+        "KAT": "cat",
+        "KA/TA/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "EUPB/STAPBT": "instant",
+        "SAPBD/WEUFP": "sandwich",
+        "AEUPBLG": "age",
+        "EBG/SPEBGT": "expect",
+    }
+    entries = [
+        (phonemes, translation)
+        for outline_steno, translation in mappings.items()
+        if (phonemes := get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing)) is not None
+    ]
+
+    reference = TrieLookupEngine.build(entries, lapwing)
+
+    assert SharedTrieRegistry(tmp_path).attach("abc") is None
+    SharedTrieRegistry(tmp_path).publish("abc", reference.trie.compiled())
+
+    # Attach from a separate registry, as another process would
+    registry = SharedTrieRegistry(tmp_path)
+    compiled = registry.attach("abc")
+    assert compiled is not None
+    assert registry.attach("abc") is compiled
+    assert isinstance(compiled.dst_nodes, memoryview)
+    assert [info.source_hash for info in registry.entries()] == ["abc"]
+
+    candidate = TrieLookupEngine(compiled, lapwing)
+    outlines = sample_outlines(reference, mappings.values(), lapwing, random.Random(0), 300)
+    comparison = compare_engines(reference, candidate, outlines, mappings.values())
+
+    assert comparison.mismatches == []
+    assert candidate.lookup(("KAT",)) == "cat"
+
+    assert registry.remove("abc")
+    assert SharedTrieRegistry(tmp_path).attach("abc") is None
+
+def test__SharedTrieRegistry__publishing_removes_outdated_tries(tmp_path):
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.shared import SharedTrieRegistry, file_source_hash
+
+    entries = [(get_outline_phonemes((Stroke.from_steno("KAT"),), lapwing), "cat")]
+    compiled = TrieLookupEngine.build(entries, lapwing).trie.compiled()
+
+    dictionary_path = tmp_path / "dictionary.hatchery"
+    other_dictionary_path = tmp_path / "other.hatchery"
+    dictionary_path.write_text("first")
+    other_dictionary_path.write_text("first")
+
+    first_hash = file_source_hash(dictionary_path, lapwing)
+    other_hash = file_source_hash(other_dictionary_path, lapwing)
+    assert first_hash != other_hash
+    assert first_hash.split("-")[1] == other_hash.split("-")[1]
+
+    dictionary_path.write_text("second")
+    second_hash = file_source_hash(dictionary_path, lapwing)
+    assert second_hash.split("-")[0] == first_hash.split("-")[0]
+    assert second_hash != first_hash
+
+    registry = SharedTrieRegistry(tmp_path / "shared")
+    registry.publish(first_hash, compiled)
+    registry.publish(other_hash, compiled)
+    registry.publish(second_hash, compiled)
+    assert sorted(info.source_hash for info in registry.entries()) == sorted((other_hash, second_hash))
+
+    # A section whose length is not a whole number of ints is rejected rather than failing to cast
+    path = registry.path_for(other_hash)
+    data = bytearray(path.read_bytes())
+    n_header_bytes = 8 + 4 * 3 + 8 * 2 + len(other_hash)
+    data[n_header_bytes + 8:n_header_bytes + 16] = (int.from_bytes(data[n_header_bytes + 8:n_header_bytes + 16], "little") - 1).to_bytes(8, "little")
+    path.write_bytes(bytes(data))
+    assert SharedTrieRegistry(tmp_path / "shared").attach(other_hash) is None
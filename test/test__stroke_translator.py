@@ -0,0 +1,52 @@
+def test__StrokeTranslator__splits_greedily():
+    from plover.steno import Stroke
+
+    from plover_writeouts.lib.theory.default import lapwing
+    from plover_writeouts.lib.lookup.get_sophemes import get_outline_phonemes
+    from plover_writeouts.lib.lookup.engine import TrieLookupEngine
+    from plover_writeouts.lib.lookup.translate import StrokeTranslator, read_stroke_log
+
+    mappings = {
+        "KAT": "cat",
+        "KA/TA": "cata",
+        "KA/TA/HROG": "catalog",
+        "TKE/STROEU": "destroy",
+        "SAPBD/WEUFP": "sandwich",
+    }
+    entries = [
+        (phonemes, translation)
+        for outline_steno, translation in mappings.items()
+        if (phonemes := get_outline_phonemes((Stroke.from_steno(steno) for steno in outline_steno.split("/")), lapwing)) is not None
+    ]
+    engine = TrieLookupEngine.build(entries, lapwing)
+
+    strokes = ["KAT", "KA", "TA", "HROG", "TKE", "STROEU", "STKPWHR", "SAPBD", "WEUFP", "KAT"]
+    words = list(StrokeTranslator(engine.trie, lapwing, undo_depth=1).translate(strokes))
+
+    assert [(word.stroke_stenos, word.translation) for word in words] == [
+        (("KAT",), "cat"),
+        (("KA", "TA", "HROG"), "catalog"),
+        (("TKE", "STROEU"), "destroy"),
+        (("STKPWHR",), None),
+        (("SAPBD", "WEUFP"), "sandwich"),
+        (("KAT",), "cat"),
+    ]
+    assert all(word.cost is not None for word in words if word.translation is not None)
+
+    # Undo strokes remove one stroke at a time, even from the middle of a word
+    translator = StrokeTranslator(engine.trie, lapwing, longest_key=2)
+    words = list(translator.translate(["KA", "TA", "HROG", None]))
+    assert [(word.stroke_stenos, word.translation) for word in words] == [(("KA", "TA"), "cata")]
+    # "KA" was split off as its own word while the next stroke was the "KA" that is later undone
+    words = list(translator.translate(["SAPBD", "WEUFP", "KA", "KA", "SAPBD", None, None, "TA"]))
+    assert [word.translation for word in words] == ["sandwich", "cata"]
+
+    log = [
+        "2024-01-01 00:00:00,000 Stroke(KAT : ['K-', 'A-', '-T'])",
+        "2024-01-01 00:00:00,001 Translation(...)",
+        "2024-01-01 00:00:00,002 Stroke(TKE : ['T-', 'K-', '-E'])",
+        "2024-01-01 00:00:00,003 *Stroke(* : ['*'])",
+        "2024-01-01 00:00:00,004 Stroke(KAT : ['K-', 'A-', '-T'])",
+    ]
+    assert list(read_stroke_log(log)) == ["KAT", "TKE", None, "KAT"]
+    assert [word.translation for word in StrokeTranslator(engine.trie, lapwing).translate(read_stroke_log(log))] == ["cat", "cat"]